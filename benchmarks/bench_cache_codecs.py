@@ -0,0 +1,68 @@
+# Reports save/load time and on-disk size of GeneralCache for every cache codec on a
+# synthetic dashboard corpus.
+#
+#   python -m benchmarks.bench_cache_codecs [--dashboards 2000] [--panels 20]
+import contextlib
+import io
+import random
+import string
+import tempfile
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+
+from benchmarks.fake_grafana import make_dashboard
+from common.cache_codecs import available_codecs
+from importer.cache import GeneralCache
+
+
+def corpus(dashboards: int, panels: int) -> list:
+    rnd = random.Random(0)
+
+    def word():
+        return "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(3, 10)))
+
+    result = []
+    for i in range(dashboards):
+        dashboard = make_dashboard(f"uid-{i:06d}", panels=panels)
+        for panel in dashboard["dashboard"]["panels"]:
+            panel["title"] = " ".join(word() for _ in range(3))
+            panel["description"] = " ".join(word() for _ in range(12))
+            for target in panel["targets"]:
+                target["query"] = (
+                    f'SELECT mean("{word()}") FROM "{word()}" WHERE "host" =~ /^{word()}$/'
+                    " AND $timeFilter GROUP BY time($__interval)"
+                )
+        result.append(dashboard)
+    return result
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--dashboards", type=int, default=2000)
+    parser.add_argument("--panels", type=int, default=20)
+    parser.add_argument("--codecs", nargs="+", default=available_codecs())
+    args = parser.parse_args()
+
+    dashboards = corpus(args.dashboards, args.panels)
+    print(f"{'codec':<14}{'save':>9}{'load':>9}{'size':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for codec in args.codecs:
+            path = Path(tmp) / codec
+            cache = GeneralCache(lambda x: bool(x), path, codec=codec)
+
+            start = time.perf_counter()
+            cache.save(dashboards)
+            save_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            with contextlib.redirect_stderr(io.StringIO()):
+                GeneralCache(lambda x: bool(x), path).load()
+            load_time = time.perf_counter() - start
+
+            size = path.stat().st_size / 2**20
+            print(f"{codec:<14}{save_time:>8.2f}s{load_time:>8.2f}s{size:>9.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
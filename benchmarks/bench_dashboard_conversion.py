@@ -0,0 +1,68 @@
+# Compares serial dashboard conversion with the `--workers` process pool on synthetic
+# dashboards with distinct queries, so every query goes through the parser.
+#
+#   python -m benchmarks.bench_dashboard_conversion [--dashboards 10000] [--workers 1 2 4 8]
+import logging
+import time
+from argparse import ArgumentParser
+
+from benchmarks.bench_query_translation import queries
+from benchmarks.fake_grafana import make_dashboard
+from common.error_manager import ErrorManager, ProcessingContext
+import main as cli
+
+RUN_CONFIG = {
+    "converter": {"influxql": {"enabled": True}},
+    "datasource": {"uid": "bench", "type": "prometheus"},
+}
+
+
+def dashboards(count: int, panels: int) -> list:
+    corpus = iter(queries(count * panels))
+    result = []
+    for i in range(count):
+        dashboard = make_dashboard(f"uid-{i:06d}", panels)
+        for panel in dashboard["dashboard"]["panels"]:
+            panel["targets"][0]["query"] = next(corpus)
+        result.append(dashboard)
+    return result
+
+
+def run(count: int, panels: int, workers: int) -> tuple[float, int]:
+    error_manager = ErrorManager(logging.getLogger(__name__), ProcessingContext())
+    converter = cli.get_converter_from_config(RUN_CONFIG, error_manager, {})
+    converted = []
+    corpus = dashboards(count, panels)
+    start = time.perf_counter()
+    cli.convert_dashboards(
+        converter,
+        corpus,
+        converted,
+        [],
+        error_manager,
+        workers=workers,
+        run_config=RUN_CONFIG,
+    )
+    return time.perf_counter() - start, len(converted)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--dashboards", type=int, default=10000)
+    parser.add_argument("--panels", type=int, default=4)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    baseline = None
+    for workers in args.workers:
+        elapsed, count = run(args.dashboards, args.panels, workers)
+        baseline = baseline or elapsed
+        print(
+            f"workers={workers:<3} dashboards={count} "
+            f"time={elapsed:.2f}s speedup={baseline / elapsed:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Exports converted dashboards with the Grafana exporters to a local fake Grafana and
+# counts the requests they send.
+#
+#   python -m benchmarks.bench_grafana_exporters [--dashboards 500] [--folders 20]
+#       [--latency 0.005] [--concurrency 1 4 8] [--max-in-flight 0] [--rerun]
+#
+# With --rerun every export runs twice with deterministic uids and an export ledger,
+# the second run only lists folders and posts nothing.
+import logging
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.fake_grafana import FakeGrafana, make_dashboard
+from exporter.grafana.grafana_exporter import GrafanaExporter
+from exporter.grafana_raw.grafana_raw_exporter import GrafanaRawExporter
+
+EXPORTERS = {"grafana": GrafanaExporter, "grafana_raw": GrafanaRawExporter}
+
+
+def dashboards(count: int, folders: int) -> list:
+    result = []
+    for i in range(count):
+        dashboard = make_dashboard(f"uid-{i:06d}")
+        dashboard["meta"]["folderTitle"] = f"Folder {i % folders}"
+        result.append(dashboard)
+    return result
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--dashboards", type=int, default=500)
+    parser.add_argument("--folders", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    # Makes the fake Grafana answer 429 above this many concurrent requests
+    parser.add_argument("--max-in-flight", type=int, default=0)
+    parser.add_argument("--rerun", action="store_true")
+    args = parser.parse_args()
+
+    for name, exporter_class in EXPORTERS.items():
+        for concurrency in args.concurrency:
+            with FakeGrafana(
+                dashboards=0, latency=args.latency, max_in_flight=args.max_in_flight
+            ) as grafana, tempfile.TemporaryDirectory() as tmp_dir:
+                params = {
+                    "endpoint": f"{grafana.endpoint}/api",
+                    "auth_header": {"key": "Authorization", "value": "Bearer b"},
+                    "folder_suffix": "",
+                    "concurrency": concurrency,
+                }
+                if args.rerun:
+                    params["deterministic_uids"] = True
+                    params["export_ledger_file"] = os.path.join(tmp_dir, "ledger")
+                for run in range(2 if args.rerun else 1):
+                    grafana.requests_by_path.clear()
+                    exporter = exporter_class(params, {}, logging.WARNING)
+                    start = time.perf_counter()
+                    exporter.export_dashboards(
+                        dashboards(args.dashboards, args.folders), {}
+                    )
+                    elapsed = time.perf_counter() - start
+                    requests = ", ".join(
+                        f"{path}: {count}"
+                        for path, count in sorted(grafana.requests_by_path.items())
+                    )
+                    print(
+                        f"{name:<11} concurrency={concurrency:<3} run={run + 1} "
+                        f"dashboards={len(grafana.saved_dashboards)} "
+                        f"time={elapsed:.2f}s throttled={grafana.throttled} "
+                        f"({requests})"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+# Creates a nested folder structure with GrafanaFoldersExporter in a local fake Grafana,
+# then runs it again when every folder exists, and counts the requests sent.
+#
+#   python -m benchmarks.bench_grafana_folders [--fanout 8 7 6] [--latency 0.005]
+#       [--concurrency 1 8]
+import logging
+import time
+from argparse import ArgumentParser
+
+from benchmarks.fake_grafana import FakeGrafana
+from exporter.grafana_folders.grafana_folders_exporter import GrafanaFoldersExporter
+
+
+def folder_structure(fanout: list, prefix: str = "Folder") -> dict:
+    """fanout[0] folders, each with fanout[1] children, and so on"""
+    if not fanout:
+        return None
+    return {
+        f"{prefix} {i}": folder_structure(fanout[1:], f"{prefix} {i}.")
+        for i in range(fanout[0])
+    }
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--fanout", type=int, nargs="+", default=[8, 7, 6])
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8])
+    args = parser.parse_args()
+
+    structure = folder_structure(args.fanout)
+    for concurrency in args.concurrency:
+        with FakeGrafana(dashboards=0, latency=args.latency) as grafana:
+            for run in range(2):
+                grafana.requests_by_path.clear()
+                exporter = GrafanaFoldersExporter(
+                    {
+                        "endpoint": f"{grafana.endpoint}/api",
+                        "auth_header": {"key": "Authorization", "value": "Bearer b"},
+                        "folder_structure": structure,
+                        "concurrency": concurrency,
+                    },
+                    {},
+                    logging.WARNING,
+                )
+                start = time.perf_counter()
+                exporter.export_dashboards([], {})
+                elapsed = time.perf_counter() - start
+                requests = ", ".join(
+                    f"{path}: {count}"
+                    for path, count in sorted(grafana.requests_by_path.items())
+                )
+                print(
+                    f"concurrency={concurrency:<3} run={run + 1} "
+                    f"folders={len(grafana.folders)} time={elapsed:.2f}s ({requests})"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Compares GrafanaImporter dashboard fetching with different `concurrency`
+# settings against a local fake Grafana.
+#
+#   python -m benchmarks.bench_grafana_importer [--dashboards 300] [--latency 0.02]
+import logging
+import time
+from argparse import ArgumentParser
+
+from benchmarks.fake_grafana import FakeGrafana
+from importer.grafana.grafana_importer import GrafanaImporter
+
+
+def run(endpoint: str, concurrency: int) -> tuple[float, int]:
+    importer = GrafanaImporter(
+        {
+            "endpoint": endpoint,
+            "api_token": "bench",
+            "orgId": 1,
+            "concurrency": concurrency,
+        },
+        {},
+        logging.WARNING,
+    )
+    start = time.perf_counter()
+    dashboards = importer._build_dashboards_list()
+    return time.perf_counter() - start, len(dashboards)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--dashboards", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    with FakeGrafana(dashboards=args.dashboards, latency=args.latency) as grafana:
+        baseline = None
+        for concurrency in args.concurrency:
+            elapsed, count = run(grafana.endpoint, concurrency)
+            baseline = baseline or elapsed
+            print(
+                f"concurrency={concurrency:<3} dashboards={count} "
+                f"time={elapsed:.2f}s speedup={baseline / elapsed:.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# Shows how the time to convert a dashboard develops over a long run. Every dashboard
+# brings its own metrics and label_values() template variables, so metric_to_objects
+# keeps growing while the dashboards stay the same size.
+#
+#   python -m benchmarks.bench_label_values_scaling [--dashboards 10000]
+import logging
+import time
+from argparse import ArgumentParser
+
+from benchmarks.fake_grafana import make_dashboard
+from common.error_manager import ErrorManager, ProcessingContext
+from converter.influxql_to_promql.influxql_to_promql_dashboard_converter import (
+    InfluxQLToM3DashboardConverter,
+)
+
+PANELS = 4
+BUCKETS = 5
+
+
+def dashboard(index: int) -> dict:
+    result = make_dashboard(f"uid-{index:06d}", PANELS)
+    for panel in result["dashboard"]["panels"]:
+        panel["targets"][0][
+            "query"
+        ] = f'SELECT mean("used") FROM "m{index}_{panel["id"]}" WHERE "host" =~ /^$host$/ AND $timeFilter GROUP BY time($__interval)'
+    result["dashboard"]["templating"]["list"] = [
+        {
+            "type": "query",
+            "name": f"host{i}",
+            "query": f'SHOW TAG VALUES FROM "m{index}_{i}" WITH KEY = "host"',
+        }
+        for i in range(PANELS)
+    ]
+    return result
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--dashboards", type=int, default=10000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    converter = InfluxQLToM3DashboardConverter(
+        error_manager=ErrorManager(logging.getLogger(__name__), ProcessingContext()),
+        global_shared_state={},
+        replacement_datasource={"uid": "bench", "type": "prometheus"},
+    )
+    dashboards = [dashboard(i) for i in range(args.dashboards)]
+    bucket = max(1, args.dashboards // BUCKETS)
+    for first in range(0, args.dashboards, bucket):
+        start = time.perf_counter()
+        for item in dashboards[first : first + bucket]:
+            converter.convert_dashboard(item["dashboard"], item["meta"])
+        elapsed = time.perf_counter() - start
+        print(
+            f"dashboards {first:>6}-{first + bucket - 1:<6} "
+            f"{elapsed / bucket * 1e6:.0f}us per dashboard"
+        )
+
+
+if __name__ == "__main__":
+    main()
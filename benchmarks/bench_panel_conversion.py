@@ -0,0 +1,78 @@
+# Measures the time to convert one panel, including recording its targets in
+# metric_to_objects. Panels repeat across dashboards, as copied panels do, so the
+# translation cache answers most queries and the per-target overhead dominates.
+#
+#   python -m benchmarks.bench_panel_conversion [--dashboards 2000] [--targets 8]
+import logging
+import time
+from argparse import ArgumentParser
+
+from benchmarks.bench_query_translation import queries
+from benchmarks.fake_grafana import make_dashboard
+from common.error_manager import ErrorManager, ProcessingContext
+from converter.influxql_to_promql.influxql_to_promql_dashboard_converter import (
+    InfluxQLToM3DashboardConverter,
+)
+
+PANELS = 6
+
+
+def targets(count: int, offset: int) -> list:
+    result = []
+    for i, query in enumerate(queries(count + offset)[offset:]):
+        ref_id = chr(ord("A") + i)
+        if i % 2:
+            result.append(
+                {
+                    "refId": ref_id,
+                    "resultFormat": "time_series",
+                    "measurement": f"measurement{offset}",
+                    "select": [[{"type": "field", "params": [f"field{i}"]}]],
+                    "groupBy": [{"type": "time", "params": ["$__interval"]}],
+                    "tags": [],
+                }
+            )
+        else:
+            result.append(
+                {
+                    "refId": ref_id,
+                    "rawQuery": True,
+                    "resultFormat": "time_series",
+                    "query": query,
+                }
+            )
+    return result
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--dashboards", type=int, default=2000)
+    parser.add_argument("--targets", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    converter = InfluxQLToM3DashboardConverter(
+        error_manager=ErrorManager(logging.getLogger(__name__), ProcessingContext()),
+        global_shared_state={},
+        replacement_datasource={"uid": "bench", "type": "prometheus"},
+    )
+    dashboards = []
+    for i in range(args.dashboards):
+        dashboard = make_dashboard(f"uid-{i:06d}", PANELS)
+        for j, panel in enumerate(dashboard["dashboard"]["panels"]):
+            panel["targets"] = targets(args.targets, j * args.targets)
+        dashboards.append(dashboard)
+
+    start = time.perf_counter()
+    for dashboard in dashboards:
+        converter.convert_dashboard(dashboard["dashboard"], dashboard["meta"])
+    elapsed = time.perf_counter() - start
+    panels = args.dashboards * PANELS
+    print(
+        f"{panels} panels of {args.targets} targets in {elapsed:.2f}s, "
+        f"{elapsed / panels * 1e6:.0f}us per panel"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# Measures InfluxQL -> PromQL translation throughput on distinct synthetic queries,
+# with the translation cache disabled so every query goes through the parser.
+#
+#   python -m benchmarks.bench_query_translation [--queries 20000]
+import logging
+import random
+import string
+import time
+from argparse import ArgumentParser
+
+from common.error_manager import ErrorManager, ProcessingContext
+from converter.influxql_to_promql.influxql_to_promql_dashboard_converter import (
+    InfluxQLToM3DashboardConverter,
+)
+
+TEMPLATES = [
+    'SELECT mean("{f}") FROM "{m}" WHERE ("host" =~ /^$host$/) AND $timeFilter GROUP BY time($__interval), "host" fill(null)',
+    'SELECT non_negative_derivative(mean("{f}"), 1s) FROM "{m}" WHERE "host" = \'{w}\' AND $timeFilter GROUP BY time(1m)',
+    'SELECT count("{f}") FROM "autogen"."{m}" WHERE $timeFilter GROUP BY time(5m), "region"',
+    'SELECT mean("{f}") * 100 FROM "{m}" WHERE "host" =~ /{w}.*/ AND "dc" != \'x\' AND $timeFilter GROUP BY time(1h) fill(0)',
+    'SELECT sum("{f}") FROM "{m}" WHERE ("code" = \'500\' OR "code" = \'502\') AND $timeFilter GROUP BY time(auto),"service"',
+    'SELECT mean("{f}") FROM "{m}" WHERE "{f}" > 10 AND $timeFilter GROUP BY time(30s)',
+    'SELECT max("{f}") / max("{f}") FROM "{m}" WHERE $timeFilter GROUP BY time($interval)',
+]
+
+
+def queries(count: int) -> list:
+    rnd = random.Random(0)
+
+    def word():
+        return "".join(rnd.choices(string.ascii_lowercase, k=rnd.randint(3, 10)))
+
+    return [
+        rnd.choice(TEMPLATES).format(f=word(), m=word(), w=word()) for _ in range(count)
+    ]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    converter = InfluxQLToM3DashboardConverter(
+        error_manager=ErrorManager(logging.getLogger(__name__), ProcessingContext()),
+        global_shared_state={},
+        replacement_datasource={"uid": "bench", "type": "prometheus"},
+        translation_cache_size=0,
+    )
+    corpus = queries(args.queries)
+    start = time.perf_counter()
+    for query in corpus:
+        converter.translate_query(query)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{len(corpus)} queries in {elapsed:.2f}s, {elapsed / len(corpus) * 1e6:.0f}us per query"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# Measures the statistic replace strategies of the find_metrics_names processor,
+# matching the metrics left after the exact and permutation strategies against the
+# dashboard metrics nothing was found for. The vectorized strategy needs numpy and scipy.
+#
+#   python -m benchmarks.bench_statistic_combination [--sent 2000] [--dashboard 2000]
+#       [--strategy statistic_combination|vectorized]
+import logging
+import random
+import time
+from argparse import ArgumentParser
+
+from processor.find_metrics_names.find_metrics_names_processor import (
+    FindMetricsNamesProcessor,
+)
+
+WORDS = (
+    "cpu usage idle iowait mem free used cached disk io read write bytes ops net rx tx "
+    "errors drops http requests duration seconds node system user load latency queue "
+    "kafka consumer lag jvm heap gc pause redis keys evicted nginx connections active"
+).split()
+
+
+def names(rnd: random.Random, count: int) -> list:
+    result = set()
+    while len(result) < count:
+        words = rnd.sample(WORDS, rnd.randint(2, 5))
+        result.add("_".join(words) + rnd.choice(["", "_total", "_count", "_sum"]))
+    return sorted(result)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--sent", type=int, default=2000)
+    parser.add_argument("--dashboard", type=int, default=2000)
+    parser.add_argument("--percent", type=int, default=90)
+    parser.add_argument(
+        "--strategy",
+        choices=["statistic_combination", "vectorized"],
+        default="statistic_combination",
+    )
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    processor = FindMetricsNamesProcessor(
+        {
+            "metrics_auth": {"metrics_db_endpoint": "http://localhost/api/v1"},
+            "replace_strategy": {
+                "strategies": [args.strategy],
+                "min_match_percent": args.percent,
+                "min_filter_percent": args.percent,
+            },
+        },
+        {},
+        logging.CRITICAL,
+    )
+    rnd = random.Random(0)
+    sent_metrics = names(rnd, args.sent)
+    dashboard_metrics = names(rnd, args.dashboard)
+    metric_to_objects = {
+        metric: {"Dashboard": [{"expr": f"sum(rate({metric}[5m]))"}]}
+        for metric in dashboard_metrics
+    }
+
+    start = time.perf_counter()
+    remaining, _ = getattr(processor, f"{args.strategy}_replace")(
+        sent_metrics, dashboard_metrics, metric_to_objects
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"{args.strategy}: {args.sent} x {args.dashboard} metrics in {elapsed:.2f}s, "
+        f"{args.sent - len(remaining)} replaced"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# Minimal in-process Grafana API used by the benchmarks. Every request sleeps
+# for `latency` seconds to simulate the network round trip.
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def make_dashboard(uid: str, panels: int = 4) -> dict:
+    return {
+        "dashboard": {
+            "uid": uid,
+            "title": f"Dashboard {uid}",
+            "version": 1,
+            "templating": {"list": []},
+            "panels": [
+                {
+                    "id": i,
+                    "title": f"Panel {i}",
+                    "type": "graph",
+                    "targets": [
+                        {
+                            "refId": "A",
+                            "rawQuery": True,
+                            "resultFormat": "time_series",
+                            "query": f'SELECT mean("usage_idle") FROM "cpu{i}" WHERE $timeFilter GROUP BY time($__interval)',
+                        }
+                    ],
+                }
+                for i in range(panels)
+            ],
+        },
+        "meta": {
+            "folderTitle": "General",
+            "updatedBy": "bench",
+            "updated": "2024-01-01T00:00:00Z",
+        },
+    }
+
+
+class FakeGrafana:
+    def __init__(
+        self,
+        dashboards: int = 100,
+        latency: float = 0.02,
+        org_id: int = 1,
+        max_in_flight: int = 0,
+    ):
+        self.latency = latency
+        # Requests above max_in_flight are answered 429, like a rate limited Grafana
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.throttled = 0
+        self.org_id = org_id
+        self.dashboards = {
+            f"uid-{i:06d}": make_dashboard(f"uid-{i:06d}") for i in range(dashboards)
+        }
+        # Dashboards whose fetch, or save, fails with 500
+        self.failing_uids = set()
+        self.requests_count = 0
+        self.requests_by_path = Counter()
+        # Folders and dashboards written through the API
+        self.folders = []
+        self.saved_dashboards = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def handle(self, method: str, path: str, query: dict, body=None):
+        with self._lock:
+            self.requests_count += 1
+            self.requests_by_path[f"{method} {path}"] += 1
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                self.throttled += 1
+                return 429, {"message": "Too many requests"}
+            self.in_flight += 1
+        try:
+            time.sleep(self.latency)
+            return self._handle(method, path, query, body)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def _handle(self, method: str, path: str, query: dict, body=None):
+        if path == "/api/folders":
+            with self._lock:
+                return self._folders(method, query, body)
+        if method == "GET" and path.startswith("/api/folders/"):
+            uid = path.rsplit("/", 1)[-1]
+            with self._lock:
+                for folder in self.folders:
+                    if folder["uid"] == uid:
+                        return 200, folder
+            return 404, {"message": "folder not found"}
+        if method == "POST" and path == "/api/dashboards/db":
+            if body["dashboard"]["uid"] in self.failing_uids:
+                return 500, {"message": "Internal server error"}
+            with self._lock:
+                self.saved_dashboards[body["dashboard"]["uid"]] = body
+            return 200, {"uid": body["dashboard"]["uid"], "status": "success"}
+        if method == "POST" and path.startswith("/api/user/using/"):
+            return 200, {"message": "Active organization changed"}
+        if path == "/api/org":
+            return 200, {"id": self.org_id}
+        if path == "/api/search":
+            if query.get("type", ["dash-db"])[0] != "dash-db":
+                return 200, [
+                    {"uid": "folder-1", "title": "General", "type": "dash-folder"}
+                ]
+            limit = int(query.get("limit", ["1000"])[0])
+            page = int(query.get("page", ["1"])[0])
+            uids = list(self.dashboards)[(page - 1) * limit : page * limit]
+            return 200, [
+                {
+                    "uid": uid,
+                    "type": "dash-db",
+                    "title": self.dashboards[uid]["dashboard"]["title"],
+                    "version": self.dashboards[uid]["dashboard"]["version"],
+                }
+                for uid in uids
+            ]
+        if path.startswith("/api/dashboards/uid/"):
+            uid = path.rsplit("/", 1)[-1]
+            if uid in self.failing_uids:
+                return 500, {"message": "Internal server error"}
+            if uid in self.dashboards:
+                return 200, self.dashboards[uid]
+            return 404, {"message": "Dashboard not found"}
+        if path == "/api/datasources":
+            return 200, [{"uid": "influx", "name": "InfluxDB", "type": "influxdb"}]
+        return 404, {"message": "Not found"}
+
+    def _folders(self, method: str, query: dict, body):
+        if method == "POST":
+            parent_uid = body.get("parentUid")
+            for folder in self.folders:
+                if folder["uid"] == body["uid"] or (
+                    folder["title"] == body["title"]
+                    and folder["parentUid"] == parent_uid
+                ):
+                    return 409, {
+                        "message": "a folder with the same name already exists"
+                    }
+            folder = {
+                "id": len(self.folders) + 1,
+                "uid": body["uid"],
+                "title": body["title"],
+                "parentUid": parent_uid,
+            }
+            self.folders.append(folder)
+            return 200, folder
+        parent_uid = query.get("parentUid", [None])[0]
+        limit = int(query.get("limit", ["1000"])[0])
+        page = int(query.get("page", ["1"])[0])
+        children = [f for f in self.folders if f["parentUid"] == parent_uid]
+        return 200, children[(page - 1) * limit : page * limit]
+
+    def _handler(self):
+        grafana = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Headers and body are written separately, Nagle would hold the body
+            # back until the client acknowledges the headers on kept alive connections
+            disable_nagle_algorithm = True
+
+            def _respond(self, method):
+                url = urlparse(self.path)
+                body = None
+                if length := int(self.headers.get("Content-Length") or 0):
+                    body = json.loads(self.rfile.read(length))
+                status, payload = grafana.handle(
+                    method, url.path, parse_qs(url.query), body
+                )
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,58 @@
+# Serialization formats for on-disk caches. A codec name is a serializer optionally
+# followed by a compression, e.g. "pickle", "json+zlib" or "pickle+lzma".
+import bz2
+import json
+import lzma
+import pickle
+import zlib
+from typing import Any, Callable, NamedTuple
+
+SERIALIZERS = {
+    "pickle": (
+        lambda obj: pickle.dumps(obj, protocol=5),
+        pickle.loads,
+    ),
+    # Only plain dicts/lists/str/numbers - which is all Grafana API responses contain
+    "json": (
+        lambda obj: json.dumps(obj, separators=(",", ":")).encode(),
+        json.loads,
+    ),
+}
+
+COMPRESSIONS = {
+    "zlib": (zlib.compress, zlib.decompress),
+    "lzma": (lzma.compress, lzma.decompress),
+    "bz2": (bz2.compress, bz2.decompress),
+}
+
+
+class Codec(NamedTuple):
+    name: str
+    encode: Callable[[Any], bytes]
+    decode: Callable[[bytes], Any]
+
+
+def get_codec(name: str) -> Codec:
+    serializer, _, compression = name.partition("+")
+    try:
+        dumps, loads = SERIALIZERS[serializer]
+        if not compression:
+            return Codec(name, dumps, loads)
+        compress, decompress = COMPRESSIONS[compression]
+    except KeyError:
+        raise ValueError(
+            f"Unknown cache codec {name!r}, expected one of {', '.join(available_codecs())}"
+        )
+    return Codec(
+        name,
+        lambda obj: compress(dumps(obj)),
+        lambda data: loads(decompress(data)),
+    )
+
+
+def available_codecs() -> list:
+    return [
+        f"{serializer}{'+' + compression if compression else ''}"
+        for serializer in SERIALIZERS
+        for compression in ["", *COMPRESSIONS]
+    ]
@@ -0,0 +1,31 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, Optional, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def ordered_map(
+    fn: Callable[[T], R],
+    iterable: Iterable[T],
+    workers: int,
+    window: Optional[int] = None,
+) -> Iterator[R]:
+    """Like map(), but runs fn in up to `workers` threads.
+
+    Results are yielded in input order. At most `window` items are in flight,
+    so `iterable` is consumed lazily and may itself be a generator."""
+    if workers <= 1:
+        yield from map(fn, iterable)
+        return
+
+    window = max(window or workers * 2, workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
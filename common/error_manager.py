@@ -1,8 +1,10 @@
+from contextlib import contextmanager
+from copy import copy
 from dataclasses import dataclass
 from contextvars import ContextVar
 from pathlib import Path
 import sys
-from typing import Optional
+from typing import List, Optional
 
 file = Path(__file__).resolve()
 parent, root = file.parent, file.parents[2]
@@ -63,7 +65,45 @@ class ErrorManager:
     def __init__(self, logger, processing_context: ProcessingContext):
         self._conversion_errors = []
         self._logger = logger
-        self.context = processing_context
+        # Context variables so that scope() and recording() blocks running in other
+        # threads or tasks do not see each other's dashboard, panel or recorders
+        self._context = ContextVar(
+            f"error_manager_context_{id(self)}", default=processing_context
+        )
+        self._recorders = ContextVar(f"error_manager_recorders_{id(self)}", default=())
+
+    @property
+    def context(self) -> ProcessingContext:
+        return self._context.get()
+
+    @contextmanager
+    def scope(self):
+        """Runs the block with a copy of the current context, changes made to it inside
+        the block are not visible outside of it."""
+        token = self._context.set(copy(self._context.get()))
+        try:
+            yield self._context.get()
+        finally:
+            self._context.reset(token)
+
+    @contextmanager
+    def recording(self):
+        """Collects the arguments of every add_error() call made inside the block."""
+        records = []
+        token = self._recorders.set(self._recorders.get() + (records,))
+        try:
+            yield records
+        finally:
+            self._recorders.reset(token)
+
+    def pop_errors(self) -> List[ConversionError]:
+        """Returns the errors added so far and forgets them."""
+        errors, self._conversion_errors = self._conversion_errors, []
+        return errors
+
+    def extend_errors(self, errors: List[ConversionError]) -> None:
+        """Adds errors collected by another manager, e.g. in a worker process."""
+        self._conversion_errors.extend(errors)
 
     def errors_csv(self) -> str:
         if self._conversion_errors:
@@ -86,6 +126,8 @@ class ErrorManager:
             return "Cannot-Calculate-Link"
 
     def add_error(self, msg, error_level="INFO", notes=""):
+        for records in self._recorders.get():
+            records.append((msg, error_level, notes))
         self._logger.error(msg)
         msg = msg.replace(",", "-")
         if self.context.dashboard and self.context.panel:
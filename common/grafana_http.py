@@ -0,0 +1,170 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Responses retried after a backoff, 429 and 503 also mean Grafana is overloaded
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+THROTTLE_STATUSES = frozenset({429, 503})
+# A non-idempotent request that failed may still have been applied by Grafana, they
+# are only retried when Grafana throttled them
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveLimiter:
+    """Bounds the requests in flight with additive increase, multiplicative decrease.
+
+    The limit grows by one after a limit's worth of successful requests whose latency
+    stays within `latency_tolerance` times the fastest seen, and halves when Grafana
+    throttles a request sent after the previous decrease, requests already in flight
+    then were sent under the old limit. A Retry-After pauses all requests."""
+
+    def __init__(
+        self,
+        max_limit: int,
+        min_limit: int = 1,
+        latency_tolerance: float = 2.0,
+    ):
+        self.max_limit = max(max_limit, 1)
+        self.min_limit = max(min(min_limit, self.max_limit), 1)
+        self.limit = float(self.min_limit)
+        self._latency_tolerance = latency_tolerance
+        self._best_latency = None
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def slot(self):
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self._in_flight >= int(self.limit):
+                    self._condition.wait()
+                else:
+                    break
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        with self._condition:
+            if self._best_latency is None or latency < self._best_latency:
+                self._best_latency = latency
+            if latency <= self._best_latency * self._latency_tolerance:
+                self.limit = min(self.limit + 1 / int(self.limit), self.max_limit)
+                self._condition.notify_all()
+
+    def on_throttle(self, sent: float, retry_after: Optional[float] = None) -> None:
+        """`sent` is the time.monotonic() the throttled request was sent at"""
+        with self._condition:
+            now = time.monotonic()
+            if sent >= self._last_decrease:
+                self.limit = max(self.limit / 2, self.min_limit)
+                self._last_decrease = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+
+def retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Retry-After given as seconds or as an HTTP date"""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class GrafanaHttpClient:
+    """Pooled session for the Grafana API that retries throttled and failed requests
+    with exponential backoff and adapts its concurrency with an AdaptiveLimiter.
+
+    It has the get/post/request methods of requests.Session, responses that are
+    still failing after the retries are returned to the caller as before. POSTs are
+    only retried on 429 and 503."""
+
+    def __init__(
+        self,
+        concurrency: int = 1,
+        retries: int = 5,
+        backoff: float = 0.1,
+        max_backoff: float = 60.0,
+    ):
+        self.session = requests.Session()
+        # One extra connection for requests sent alongside the workers
+        adapter = HTTPAdapter(pool_maxsize=max(concurrency, 1) + 1)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.limiter = AdaptiveLimiter(concurrency)
+        self._retries = retries
+        self._backoff = backoff
+        self._max_backoff = max_backoff
+
+    def get(self, url, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def request(self, method, url, **kwargs) -> requests.Response:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        attempt = 0
+        while True:
+            error = None
+            response = None
+            with self.limiter.slot():
+                start = time.monotonic()
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except (requests.ConnectionError, requests.Timeout) as e:
+                    error = e
+                latency = time.monotonic() - start
+
+            retry_after = None
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                self.limiter.on_success(latency)
+                return response
+            if response is None or response.status_code in THROTTLE_STATUSES:
+                if response is not None:
+                    retry_after = retry_after_seconds(response)
+                self.limiter.on_throttle(start, retry_after)
+            retryable = idempotent or (
+                response is not None and response.status_code in THROTTLE_STATUSES
+            )
+            if attempt >= self._retries or not retryable:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = min(
+                self._backoff * 2**attempt * random.uniform(0.5, 1.0),
+                self._max_backoff,
+            )
+            delay = max(delay, min(retry_after or 0.0, self._max_backoff))
+            logger.debug(
+                f"{method} {url} failed with "
+                f"{error or response.status_code}, retrying in {delay:.1f}s"
+            )
+            time.sleep(delay)
+            attempt += 1
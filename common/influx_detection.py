@@ -1,3 +1,6 @@
+from typing import Dict, NamedTuple, Optional
+
+
 def normalize_target_uid(target):
     if not target:
         return ""
@@ -12,17 +15,103 @@ def normalize_target_uid(target):
     return uid_normalized
 
 
+def _datasource_key(datasource):
+    """Hashable form of everything detection reads from a datasource reference,
+    None when the reference can't be memoized."""
+    if isinstance(datasource, dict):
+        uid = datasource.get("uid")
+        if not isinstance(uid, (str, type(None))):
+            return None
+        return ("dict", "uid" in datasource, uid, datasource.get("type"))
+    if isinstance(datasource, str):
+        return ("str", datasource)
+    return None
+
+
+class DatasourceIndex(NamedTuple):
+    # The grafana_datasources dict the index was built from
+    datasources: dict
+    # Names of InfluxQL (not Flux) datasources, by uid and by name
+    influx_uids: frozenset
+    influx_names: frozenset
+
+
+class TemplatingIndex(NamedTuple):
+    # The dashboard templating and the datasources the index was built from
+    templating: Optional[dict]
+    datasources: dict
+    # Datasource variable name -> whether it points to InfluxDB
+    variables: Dict[str, bool]
+    # _datasource_key() of target, panel and dsType -> verdict
+    verdicts: dict
+
+
+def _is_influxql(datasource: dict) -> bool:
+    return (
+        datasource.get("type") == "influxdb"
+        and datasource.get("jsonData", {}).get("version", "") != "Flux"
+    )
+
+
 class AdvancedInfluxDetection:
+    """Decides whether a panel target queries InfluxDB with InfluxQL.
+
+    The datasources are indexed once per grafana_datasources dict and the templating
+    once per dashboard, verdicts are memoized per datasource reference."""
 
     def __init__(self, global_shared_state):
         self.global_shared_state = global_shared_state
+        self._datasource_index = None
+        self._templating_index = None
 
     @property
     def datasources(self):
         return self.global_shared_state.get("grafana_datasources", {})
 
-    def _ds_list_by_name(self):
-        return {v["name"]: v for _, v in self.datasources.items()}
+    def _datasources_indexed(self) -> DatasourceIndex:
+        index = self._datasource_index
+        datasources = self.datasources
+        if index is None or index.datasources is not datasources:
+            # Later datasources win on duplicate names
+            by_name = {v["name"]: v for _, v in datasources.items()}
+            index = self._datasource_index = DatasourceIndex(
+                datasources,
+                frozenset(u for u, v in datasources.items() if _is_influxql(v)),
+                frozenset(n for n, v in by_name.items() if _is_influxql(v)),
+            )
+        return index
+
+    def _templating_indexed(self, templating) -> TemplatingIndex:
+        index = self._templating_index
+        datasources = self.datasources
+        if (
+            index is None
+            or index.templating is not templating
+            or index.datasources is not datasources
+        ):
+            index = self._templating_index = TemplatingIndex(
+                templating, datasources, self._index_templating(templating), {}
+            )
+        return index
+
+    @staticmethod
+    def _index_templating(templating) -> Dict[str, bool]:
+        # The first variable with a name decides for it. A variable without a name
+        # ends the search, as do malformed templating lists
+        variables = {}
+        try:
+            for item in templating["list"]:
+                name = item["name"]
+                if not isinstance(name, str) or name in variables:
+                    continue
+                try:
+                    if item["type"] == "datasource" and item["query"] == "influxdb":
+                        variables[name] = True
+                except (IndexError, KeyError, TypeError):
+                    variables[name] = False
+        except (IndexError, KeyError, TypeError):
+            pass
+        return variables
 
     def _basic_ds_type_check(self, target):
         return "dsType" in target and target["dsType"] == "influxdb"
@@ -37,18 +126,26 @@ class AdvancedInfluxDetection:
     def _uid_matches_influx_templating(self, target, templating):
         try:
             uid_normalized = normalize_target_uid(target)
-            for item in templating["list"]:
-                if (
-                    item["name"] == uid_normalized
-                    and item["type"] == "datasource"
-                    and item["query"] == "influxdb"
-                ):
-                    return True
         except (IndexError, KeyError, TypeError):
             return False
-        return False
+        variables = self._templating_indexed(templating).variables
+        return variables.get(uid_normalized, False)
 
     def is_target_influx(self, target, templating, panel_datasource):
+        key = None
+        target_key = _datasource_key(target.get("datasource", {}))
+        panel_key = _datasource_key(panel_datasource) if panel_datasource else False
+        if target_key is not None and panel_key is not None:
+            key = (target_key, panel_key, self._basic_ds_type_check(target))
+            verdicts = self._templating_indexed(templating).verdicts
+            if (verdict := verdicts.get(key)) is not None:
+                return verdict
+        verdict = self._is_target_influx(target, templating, panel_datasource)
+        if key is not None:
+            verdicts[key] = verdict
+        return verdict
+
+    def _is_target_influx(self, target, templating, panel_datasource):
         uid = normalize_target_uid(target)
         ds = target.get("datasource", {})
         is_ds_str = isinstance(ds, str)
@@ -61,30 +158,21 @@ class AdvancedInfluxDetection:
         )
         if not ret and panel_datasource:
             pd = {"datasource": panel_datasource}
-            pret = self.is_target_influx(pd, templating, None)
+            pret = self._is_target_influx(pd, templating, None)
             if not ret and pret:
                 return pret
         return ret
 
     def _influxdb_like_by_uid(self, uid, typ=None):
-        ds_list = self.datasources
-        if uid in ds_list and ds_list[uid]["type"] == "influxdb":
-            if typ and typ != ds_list[uid]["type"]:
-                self._error_manager.add_error(
-                    "Panel Datasource Type mismatches the Grafana DS type - wrong panel, won't import",
-                    error_level="WARN",
-                )
-                return False
-            if ds_list[uid].get("jsonData", {}).get("version", "") == "Flux":
-                return False
-            return True
-        return False
+        if uid not in self._datasources_indexed().influx_uids:
+            return False
+        if typ and typ != self.datasources[uid]["type"]:
+            self._error_manager.add_error(
+                "Panel Datasource Type mismatches the Grafana DS type - wrong panel, won't import",
+                error_level="WARN",
+            )
+            return False
+        return True
 
     def _influxdb_like_by_ds_name(self, ds):
-        ds_list_by_name = self._ds_list_by_name()
-        if ds in ds_list_by_name and ds_list_by_name[ds]["type"] == "influxdb":
-            if ds_list_by_name[ds].get("jsonData", {}).get("version", "") == "Flux":
-                return False
-            return True
-        else:
-            return False
+        return ds in self._datasources_indexed().influx_names
@@ -0,0 +1,80 @@
+import time
+
+import pytest
+import requests
+
+from .grafana_http import AdaptiveLimiter, GrafanaHttpClient
+
+
+def response(status, **headers):
+    result = requests.Response()
+    result.status_code = status
+    result.headers.update(headers)
+    return result
+
+
+class FakeSession:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        result = self.responses.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_limiter_increases_additively_and_halves_on_throttle():
+    limiter = AdaptiveLimiter(8)
+    for _ in range(1 + 2 + 3):
+        limiter.on_success(0.1)
+    assert int(limiter.limit) == 4
+    # Slow responses don't raise the limit
+    limiter.on_success(0.5)
+    assert int(limiter.limit) == 4
+
+    sent = time.monotonic()
+    limiter.on_throttle(sent)
+    # Sent before the decrease
+    limiter.on_throttle(sent)
+    assert limiter.limit == 2
+    limiter.on_throttle(time.monotonic())
+    assert limiter.limit == 1
+
+
+def test_client_retries_throttled_requests():
+    client = GrafanaHttpClient(concurrency=4, backoff=0)
+    client.session = FakeSession(
+        response(429, **{"Retry-After": "0"}),
+        requests.ConnectionError("reset"),
+        response(503),
+        response(200),
+    )
+
+    assert client.get("http://grafana/api/search").status_code == 200
+    assert client.session.calls == 4
+    # Throttling kept the limit at 1, the success raised it
+    assert client.limiter.limit == 2
+
+
+def test_client_returns_last_response_after_retries():
+    client = GrafanaHttpClient(retries=2, backoff=0)
+    client.session = FakeSession(response(500), response(502), response(500))
+
+    assert client.get("http://grafana/api/search").status_code == 500
+    assert client.session.calls == 3
+
+
+def test_client_retries_posts_only_when_throttled():
+    client = GrafanaHttpClient(backoff=0)
+    client.session = FakeSession(response(429), response(503), response(502))
+    # The folder may have been created before the 502
+    assert client.post("http://grafana/api/folders").status_code == 502
+    assert client.session.calls == 3
+
+    client.session = FakeSession(requests.ConnectionError("reset"))
+    with pytest.raises(requests.ConnectionError):
+        client.post("http://grafana/api/folders")
+    assert client.session.calls == 1
@@ -67,3 +67,47 @@ def templating():
 def test_detection(target, expected, templating, detector):
     breakpoint()
     assert detector.is_target_influx(target, templating, None) is expected
+
+
+@pytest.mark.parametrize(
+    "target,panel_datasource,expected",
+    [
+        ({"datasource": "InfluxDatasource"}, None, True),
+        ({"datasource": "FluxDatasource"}, None, False),
+        ({"datasource": {"uid": "FluxUid"}}, None, False),
+        ({"datasource": {"uid": "${ds}"}}, None, True),
+        ({"datasource": {"uid": "$other"}}, None, False),
+        ({}, "InfluxUid", True),
+        ({}, {"uid": "OtherUid", "type": "prometheus"}, False),
+    ],
+    ids=[
+        "name",
+        "flux-name",
+        "flux-uid",
+        "variable",
+        "other-variable",
+        "panel",
+        "none",
+    ],
+)
+def test_detection_indexes(target, panel_datasource, expected, detector):
+    templating = {
+        "list": [
+            {"name": "ds", "query": "influxdb", "type": "datasource"},
+            {"name": "other", "query": "prometheus", "type": "datasource"},
+        ]
+    }
+    for _ in range(2):  # the second call is answered by the memo
+        assert (
+            detector.is_target_influx(target, templating, panel_datasource) is expected
+        )
+
+
+def test_detection_follows_datasources_changes(detector):
+    target = {"datasource": {"uid": "NewUid"}}
+    templating = {"list": []}
+    assert detector.is_target_influx(target, templating, None) is False
+    detector.global_shared_state["grafana_datasources"] = {
+        "NewUid": {"type": "influxdb", "name": "New"}
+    }
+    assert detector.is_target_influx(target, templating, None) is True
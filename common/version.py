@@ -0,0 +1,2 @@
+# Keep in sync with the Changelog in README.md
+VERSION = "0.0.7"
@@ -0,0 +1,407 @@
+# Tokenizer and recursive descent parser for the subset of InfluxQL SELECT
+# statements found in Grafana dashboards. Every node keeps its [start, end) offsets
+# in the query text so the converter can reuse the original spelling where needed.
+from dataclasses import dataclass
+from functools import lru_cache
+import re
+from typing import List, NamedTuple, Optional, Tuple, Union
+
+KEYWORDS = {
+    "AND",
+    "AS",
+    "ASC",
+    "BY",
+    "DESC",
+    "FILL",
+    "FROM",
+    "GROUP",
+    "LIMIT",
+    "OFFSET",
+    "OR",
+    "ORDER",
+    "SELECT",
+    "SLIMIT",
+    "SOFFSET",
+    "TZ",
+    "WHERE",
+}
+
+TOKEN_REGEX = re.compile(
+    r"""
+    \s*(?:
+    (?P<DURATION>\d+(?:ns|us|µs|ms|u|µ|s|m|h|d|w)(?![\w.]))
+    |(?P<NUMBER>\d+(?:\.\d+)?|\.\d+)
+    |(?P<IDENT>[^\W\d]\w*)
+    |(?P<QIDENT>"(?:[^"\\]|\\.)*")
+    |(?P<STRING>'(?:[^'\\]|\\.)*')
+    |(?P<VAR>\$\{[^}]*\}|\$\w+|\[\[[^\]]*\]\])
+    |(?P<OP>::|=~|!~|!=|<>|<=|>=|[=<>+\-*/%(),.;])
+    )""",
+    re.VERBOSE,
+)
+# Same termination rule the converter always used for /regex/ literals: the first
+# forward slash that is not escaped
+REGEX_LITERAL = re.compile(r"/((?:[^/\\]|\\.)*)/", re.DOTALL)
+
+# After one of these tokens a "/" is a division, anywhere else it opens a regex
+VALUE_TOKENS = {"IDENT", "QIDENT", "NUMBER", "DURATION", "STRING", "REGEX", "VAR"}
+
+COMPARISON_OPERATORS = {"=", "!=", "<>", "<", "<=", ">", ">=", "=~", "!~"}
+TAIL_CLAUSES = {"GROUP", "FILL", "ORDER", "LIMIT", "OFFSET", "SLIMIT", "SOFFSET", "TZ"}
+BINARY_PRECEDENCE = {
+    "OR": 1,
+    "AND": 2,
+    **{operator: 3 for operator in COMPARISON_OPERATORS},
+    "+": 4,
+    "-": 4,
+    "*": 5,
+    "/": 5,
+    "%": 5,
+}
+
+
+class InfluxQLSyntaxError(ValueError):
+    pass
+
+
+class Token(NamedTuple):
+    kind: str
+    text: str
+    start: int
+    end: int
+    # Upper case keyword or operator, None for names and literals
+    value: Optional[str] = None
+
+
+@dataclass(slots=True)
+class Node:
+    start: int
+    end: int
+
+
+@dataclass(slots=True)
+class Literal(Node):
+    kind: str  # NUMBER, DURATION, STRING, REGEX or VAR
+    # Source spelling. Quotes and slashes are stripped from strings and regexes but
+    # escape sequences are kept as written
+    value: str
+
+
+@dataclass(slots=True)
+class Wildcard(Node):
+    pass
+
+
+@dataclass(slots=True)
+class VarRef(Node):
+    name: str
+    quoted: bool
+    cast: Optional[str] = None
+
+
+@dataclass(slots=True)
+class Call(Node):
+    name: str
+    args: Tuple[Node, ...]
+
+
+@dataclass(slots=True)
+class UnaryExpr(Node):
+    op: str
+    expr: Node
+
+
+@dataclass(slots=True)
+class BinaryExpr(Node):
+    op: str
+    lhs: Node
+    rhs: Node
+
+
+@dataclass(slots=True)
+class ParenExpr(Node):
+    expr: Node
+
+
+@dataclass(slots=True)
+class Field(Node):
+    expr: Node
+    alias: Optional[str]
+
+
+@dataclass(slots=True)
+class Measurement(Node):
+    # Names as written, e.g. ("autogen", "mem") for "autogen"."mem"
+    parts: Tuple[str, ...]
+
+
+@dataclass(slots=True)
+class SelectStatement(Node):
+    fields: Tuple[Field, ...]
+    sources: Tuple[Union[Measurement, Literal, "SelectStatement"], ...]
+    condition: Optional[Node]
+    dimensions: Optional[Tuple[Node, ...]]  # None without GROUP BY
+    fill: Optional[Node]
+
+
+def _ends_value(token: Token) -> bool:
+    return (token.kind in VALUE_TOKENS and not token.value) or token.text == ")"
+
+
+def tokenize(query: str) -> List[Token]:
+    tokens = []
+    pos = 0
+    while True:
+        for m in TOKEN_REGEX.finditer(query, pos):
+            if m.start() != pos:
+                break
+            kind = m.lastgroup
+            text = m.group(kind)
+            start = m.start(kind)
+            pos = m.end()
+            if kind == "OP":
+                if text == "/" and not (tokens and _ends_value(tokens[-1])):
+                    pos = start
+                    break
+                tokens.append(Token(kind, text, start, pos, text))
+            elif kind == "IDENT" and text.upper() in KEYWORDS:
+                tokens.append(Token(kind, text, start, pos, text.upper()))
+            else:
+                tokens.append(Token(kind, text, start, pos))
+        rest = query[pos:].lstrip()
+        if not rest:
+            break
+        pos = len(query) - len(rest)
+        if rest[0] != "/":
+            raise InfluxQLSyntaxError(
+                f"Unexpected character {rest[0]!r} at position {pos} in {query!r}"
+            )
+        m = REGEX_LITERAL.match(query, pos)
+        if m is None:
+            raise InfluxQLSyntaxError(
+                f"Unterminated regex at position {pos} in {query!r}"
+            )
+        tokens.append(Token("REGEX", m.group(), pos, m.end()))
+        pos = m.end()
+    tokens.append(Token("EOF", "", len(query), len(query)))
+    return tokens
+
+
+class Parser:
+    def __init__(self, query: str):
+        self.query = query
+        self.tokens = tokenize(query)
+        self.pos = 0
+
+    @property
+    def token(self) -> Token:
+        return self.tokens[self.pos]
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.pos].value
+
+    def _error(self, expected: str):
+        token = self.token
+        found = repr(token.text) if token.kind != "EOF" else "end of query"
+        return InfluxQLSyntaxError(
+            f"Expected {expected} but found {found} at position {token.start} in {self.query!r}"
+        )
+
+    def _next(self) -> Token:
+        token = self.token
+        self.pos += 1
+        return token
+
+    def _accept(self, value: str) -> Optional[Token]:
+        token = self.tokens[self.pos]
+        if token.value == value:
+            self.pos += 1
+            return token
+        return None
+
+    def _expect(self, text: str) -> Token:
+        token = self._accept(text)
+        if token is None:
+            raise self._error(text)
+        return token
+
+    def _identifier(self) -> Token:
+        token = self.token
+        if token.kind == "QIDENT" or (token.kind == "IDENT" and not token.value):
+            return self._next()
+        raise self._error("identifier")
+
+    def _literal(self, kind: str) -> Token:
+        if self.token.kind != kind:
+            raise self._error(kind.lower())
+        return self._next()
+
+    @staticmethod
+    def _name(token: Token) -> str:
+        if token.kind == "QIDENT":
+            name = token.text[1:-1]
+            return re.sub(r"\\(.)", r"\1", name) if "\\" in name else name
+        return token.text
+
+    def parse(self) -> SelectStatement:
+        statement = self._select()
+        self._accept(";")
+        if self.token.kind != "EOF":
+            raise self._error("end of query")
+        return statement
+
+    def _select(self) -> SelectStatement:
+        start = self._expect("SELECT").start
+        fields = [self._field()]
+        while self._accept(","):
+            fields.append(self._field())
+        self._expect("FROM")
+        sources = [self._source()]
+        while self._accept(","):
+            sources.append(self._source())
+        condition = self._expr() if self._accept("WHERE") else None
+        dimensions = None
+        fill = None
+        while (clause := self._peek()) in TAIL_CLAUSES:
+            self._next()
+            if clause == "GROUP":
+                self._expect("BY")
+                dimensions = [self._dimension()]
+                while self._accept(","):
+                    dimensions.append(self._dimension())
+            elif clause == "FILL":
+                self._expect("(")
+                fill = self._unary()
+                self._expect(")")
+            elif clause == "ORDER":
+                self._expect("BY")
+                self._identifier()
+                self._accept("ASC") or self._accept("DESC")
+            elif clause == "TZ":
+                self._expect("(")
+                self._literal("STRING")
+                self._expect(")")
+            else:  # LIMIT, OFFSET, SLIMIT or SOFFSET
+                self._literal("NUMBER")
+        return SelectStatement(
+            start,
+            self.tokens[self.pos - 1].end,
+            tuple(fields),
+            tuple(sources),
+            condition,
+            tuple(dimensions) if dimensions is not None else None,
+            fill,
+        )
+
+    def _field(self) -> Field:
+        expr = self._expr()
+        alias = None
+        if self._accept("AS"):
+            alias = self._name(self._identifier())
+        return Field(expr.start, self.tokens[self.pos - 1].end, expr, alias)
+
+    def _source(self):
+        token = self.token
+        if token.kind == "REGEX":
+            self._next()
+            return Literal(token.start, token.end, "REGEX", token.text[1:-1])
+        if self._accept("("):
+            statement = self._select()
+            self._expect(")")
+            return statement
+        parts = [self._identifier()]
+        while self._accept("."):
+            # db..measurement uses the default retention policy
+            if self.token.text == ".":
+                continue
+            parts.append(self._identifier())
+        return Measurement(
+            parts[0].start, parts[-1].end, tuple(self._name(p) for p in parts)
+        )
+
+    def _dimension(self) -> Node:
+        token = self.token
+        if token.kind == "REGEX":
+            self._next()
+            return Literal(token.start, token.end, "REGEX", token.text[1:-1])
+        return self._primary()
+
+    def _expr(self, min_precedence: int = 1) -> Node:
+        lhs = self._unary()
+        while BINARY_PRECEDENCE.get(self._peek(), 0) >= min_precedence:
+            op = self._next().value
+            rhs = self._expr(BINARY_PRECEDENCE[op] + 1)
+            lhs = BinaryExpr(lhs.start, rhs.end, op, lhs, rhs)
+        return lhs
+
+    def _unary(self) -> Node:
+        token = self.token
+        if token.kind == "OP" and token.text in {"-", "+"}:
+            self._next()
+            expr = self._unary()
+            if isinstance(expr, Literal) and expr.kind in {"NUMBER", "DURATION"}:
+                value = self.query[token.start : expr.end]
+                return Literal(token.start, expr.end, expr.kind, value)
+            return UnaryExpr(token.start, expr.end, token.text, expr)
+        return self._primary()
+
+    def _primary(self) -> Node:
+        token = self.token
+        if token.kind in {"NUMBER", "DURATION", "VAR"}:
+            self._next()
+            return Literal(token.start, token.end, token.kind, token.text)
+        if token.kind in {"STRING", "REGEX"}:
+            self._next()
+            return Literal(token.start, token.end, token.kind, token.text[1:-1])
+        if self._accept("*"):
+            return Wildcard(token.start, token.end)
+        if self._accept("("):
+            expr = self._expr()
+            end = self._expect(")").end
+            return ParenExpr(token.start, end, expr)
+        name = self._identifier()
+        if name.kind == "IDENT" and self._accept("("):
+            args = []
+            if not self._accept(")"):
+                args.append(self._expr())
+                while self._accept(","):
+                    args.append(self._expr())
+                self._expect(")")
+            return Call(
+                name.start,
+                self.tokens[self.pos - 1].end,
+                name.text.lower(),
+                tuple(args),
+            )
+        cast = None
+        if self._accept("::"):
+            cast = self._identifier().text.lower()
+        return VarRef(
+            name.start,
+            self.tokens[self.pos - 1].end,
+            self._name(name),
+            name.kind == "QIDENT",
+            cast,
+        )
+
+
+@lru_cache(maxsize=4096)
+def parse(query: str) -> SelectStatement:
+    """Parses a single InfluxQL SELECT statement, raises InfluxQLSyntaxError if the
+    query is not valid (or uses syntax this parser does not know)."""
+    return Parser(query).parse()
+
+
+def walk(node: Optional[Node]):
+    """Yields the node and all its descendants, depth first in source order."""
+    if node is None:
+        return
+    yield node
+    if isinstance(node, Call):
+        for arg in node.args:
+            yield from walk(arg)
+    elif isinstance(node, BinaryExpr):
+        yield from walk(node.lhs)
+        yield from walk(node.rhs)
+    elif isinstance(node, (UnaryExpr, ParenExpr, Field)):
+        yield from walk(node.expr)
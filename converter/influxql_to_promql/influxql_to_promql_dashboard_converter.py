@@ -1,5 +1,7 @@
 # Copyright (c) 2019 Aiven, Helsinki, Finland. https://aiven.io/
+from contextvars import ContextVar
 from copy import deepcopy
+from dataclasses import dataclass, field
 from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
 
 import logging
@@ -9,6 +11,19 @@ from pathlib import Path
 import sys
 
 from ..converter import Converter
+from .influxql_parser import (
+    BinaryExpr,
+    Call,
+    Literal,
+    Measurement,
+    ParenExpr,
+    SelectStatement,
+    UnaryExpr,
+    VarRef,
+    parse,
+    walk,
+)
+from .translation_cache import TranslatedQuery, TranslationCache
 
 file = Path(__file__).resolve()
 parent, root = file.parent, file.parents[1]
@@ -121,6 +136,26 @@ class ConvertError(Exception):
     pass
 
 
+@dataclass
+class DashboardConversion:
+    """Mutable state of one dashboard conversion. Apart from the converted dashboard
+    this is everything a conversion produces, merge_conversion() adds it to
+    metric_to_objects."""
+
+    title: str
+    templating: Optional[dict] = None
+    group_by_labels: Optional[List[str]] = None
+    # (metric, new target) in conversion order
+    metric_refs: List[Tuple[str, dict]] = field(default_factory=list)
+    # (metric, templating item) of label_values() queries which need a metric name
+    # that exists, i.e. label_values(net,host) ---> label_values(net__bytes_recv,host).
+    # Any metric with the same service is acceptable.
+    label_values: List[Tuple[str, dict]] = field(default_factory=list)
+    # Last converted panel, errors added while merging are reported against it
+    panel: Optional[GrafanaPanel] = None
+    completed: bool = False
+
+
 class InfluxQLToM3DashboardConverter(Converter):
 
     def __init__(
@@ -133,6 +168,8 @@ class InfluxQLToM3DashboardConverter(Converter):
         alert_notifications_uid_map: Optional[Dict[str, str]] = None,
         scrape_interval: int = SCRAPE_INTERVAL_SECONDS,
         replacement_datasource: dict = None,
+        translation_cache_size: int = 10000,
+        translation_cache_file: Optional[str] = None,
         log_level=logging.INFO,
     ) -> None:
         super().__init__(__name__, global_shared_state, log_level, error_manager)
@@ -141,22 +178,41 @@ class InfluxQLToM3DashboardConverter(Converter):
         self.alert_notifications_map = alert_notifications_map
         self.alert_notifications_uid_map = alert_notifications_uid_map
         self.scrape_interval = scrape_interval
-        self.group_by_labels = None
         self.metric_to_objects = (
             {}
         )  # dict of: metric -> {panel,dashboard title} to avoid iterating over all panels
-        self._current_dashboard = ""
+        # label_values() metric -> first metric_to_objects key named like it or starting
+        # with it and one more "_" part, i.e. net -> net_bytes_recv
+        self._label_values_metrics = {}
+        # DashboardConversion of the dashboard being converted in the current context
+        self._conversion = ContextVar(f"conversion_{id(self)}", default=None)
         self.replacement_datasource = replacement_datasource
         assert (
             "uid" in self.replacement_datasource
             and "type" in self.replacement_datasource
         ), "Datasource must be dict with uid and title keys"
-        # (Flag, metric and parent json of label_values string) object  to determine if the metric in the label_values requires replacement. i.e:
-        # label_values(net,host) ---> label_values(net__bytes_recv,host). Any metric with the same service
-        # is acceptable.
-        self._get_rep_metric = []
-        self._context_templating = None
         self._influx_detector = AdvancedInfluxDetection(self.global_shared_state)
+        # Identical queries are common across dashboards (copied panels, shared templates)
+        self.translation_cache = TranslationCache(
+            translation_cache_size, translation_cache_file, scrape_interval
+        )
+
+    @property
+    def _state(self) -> DashboardConversion:
+        state = self._conversion.get()
+        if state is None:
+            # Queries translated outside of convert_dashboard()
+            state = DashboardConversion("")
+            self._conversion.set(state)
+        return state
+
+    @property
+    def group_by_labels(self) -> Optional[List[str]]:
+        return self._state.group_by_labels
+
+    @group_by_labels.setter
+    def group_by_labels(self, labels: Optional[List[str]]) -> None:
+        self._state.group_by_labels = labels
 
     def get_metric_field_from_select(self, select):
         field = None
@@ -171,57 +227,18 @@ class InfluxQLToM3DashboardConverter(Converter):
             metric = metric.replace(character, "_")
         return metric
 
-    def add_to_metric_and_object_list(
-        self, old_targets, new_targets, old_panel_datasource
-    ):
-        for i, old_target in enumerate(old_targets):
-            if not self._influx_detector.is_target_influx(
-                old_target, self._context_templating, old_panel_datasource
-            ):
-                self._error_manager.add_error(
-                    "Skipping target - not Influx or is Flux",
-                    error_level="DEBUG",
-                    notes=(
-                        f'target={old_target["refId"]}'
-                        if "refId" in old_target
-                        else "target unknown"
-                    ),
-                )
-                continue
-            if "rawQuery" in old_target and old_target["rawQuery"] is True:
-                metric_name, field_name = self.get_metric_name(old_target["query"])
-                metric_name += field_name
-            else:
-                metric_name = ""
-                try:
-                    metric_name = old_target["measurement"] + "_"
-                except Exception as e:
-                    self._error_manager.add_error(
-                        "Missing measurement field", notes=str(old_target)
-                    )
-                    raise e
-                # replace . and - with _ for the metric names. (promql valid metric name contains _ only)
-                if field_name := self.get_metric_field_from_select(
-                    old_target["select"]
-                ):
-                    metric_name += field_name
-                else:
-                    self._error_manager.add_error(
-                        "Missing field name", notes=str(old_target)
-                    )
-                    raise ValueError("Missing field name")
-            metric_name = self._replace_invalid_metric_characters(metric_name)
-            try:
-                self.metric_to_objects[metric_name][self._current_dashboard].append(
-                    new_targets[i]
-                )
-            except KeyError:
-                if not self.metric_to_objects.get(metric_name):
-                    self.metric_to_objects[metric_name] = {}
-                self.metric_to_objects[metric_name][self._current_dashboard] = []
-            self.metric_to_objects[metric_name][self._current_dashboard].append(
-                new_targets[i]
+    def get_builder_metric_name(self, target: dict) -> str:
+        try:
+            metric_name = target["measurement"] + "_"
+        except Exception as e:
+            self._error_manager.add_error(
+                "Missing measurement field", notes=str(target)
             )
+            raise e
+        if field_name := self.get_metric_field_from_select(target["select"]):
+            return metric_name + field_name
+        self._error_manager.add_error("Missing field name", notes=str(target))
+        raise ValueError("Missing field name")
 
     def get_metric_aggregation(self, metric_name):
         for metric_re, fun in METRIC_AGGREGATION_REGEXPS:
@@ -304,7 +321,7 @@ class InfluxQLToM3DashboardConverter(Converter):
                 if "allValue" in item and item["allValue"] == "*":
                     item["allValue"] = ".*"
                 if metric:
-                    self._get_rep_metric.append((True, metric, item))
+                    self._state.label_values.append((metric, item))
             elif item["type"] in {"custom", "interval", "datasource"}:
                 pass
             else:
@@ -479,25 +496,84 @@ class InfluxQLToM3DashboardConverter(Converter):
         return " or ".join(expressions), over_times, fills, alias_name
 
     def get_metric_name(self, query: str) -> Tuple[str, str]:
-        # udpated_query = query.replace("-", "_")
-        part1 = re.search(r'from "(\S+)" where', query, re.IGNORECASE)
-        if part1 is None:
+        statement = parse(query)
+        source = statement.sources[0]
+        while isinstance(source, SelectStatement):
+            source = source.sources[0]
+        if not isinstance(source, Measurement):
             raise ValueError(f"Unable to find metric name in {query}")
-        # Added |. after word selection for specific dashboard with a . in the metric name
-        part2 = re.search(r'(\("|\(|\")([\w.]+)("\)|\)|")', query, re.IGNORECASE)
-        if part2 is None:
-            raise ValueError(f"Unable to find (single) metric key in {query}")
-        return part1.group(1), (
-            part2.group(1) if part2.group(1) not in {'"', "(", '("'} else part2.group(2)
-        )
+        return ".".join(source.parts), self._get_field(query).name
+
+    def _get_field(self, query: str) -> VarRef:
+        """First field referenced by the select clause."""
+        for select_field in parse(query).fields:
+            for node in walk(select_field):
+                if isinstance(node, VarRef):
+                    return node
+        raise ValueError(f"Unable to find (single) metric key in {query}")
 
     def get_aggregations(self, query: str) -> List[str]:
-        part1 = re.search(r"select (.*) from", query, re.IGNORECASE)
-        if part1 is None:
-            raise ValueError(f"Unable to find aggregations in {query}")
-        part2 = part1.group(1).split("(")
-        part3 = [AGGREGATION_MAP[item] for item in part2 if item in AGGREGATION_MAP]
-        return part3
+        # Functions wrapping the leftmost operand of the first field, outermost first
+        aggregations = []
+        node = parse(query).fields[0].expr
+        while node is not None:
+            if isinstance(node, BinaryExpr):
+                node = node.lhs
+            elif isinstance(node, (ParenExpr, UnaryExpr)):
+                node = node.expr
+            elif isinstance(node, Call):
+                if node.name in AGGREGATION_MAP:
+                    aggregations.append(AGGREGATION_MAP[node.name])
+                node = node.args[0] if node.args else None
+            else:
+                node = None
+        return aggregations
+
+    def _get_comparisons(self, query: str):
+        """Yields (comparison, folded, under_or) for the comparisons of the where clause.
+
+        OR-ed equalities of a single key, e.g. ("code" = '500' OR "code" = '502'),
+        are yielded once with folded set to ("code", "500|502")."""
+
+        def visit(node, under_or):
+            if isinstance(node, ParenExpr):
+                yield from visit(node.expr, under_or)
+            elif isinstance(node, BinaryExpr) and node.op in {"AND", "OR"}:
+                if node.op == "OR":
+                    if folded := self._fold_equalities(node):
+                        yield node, folded, under_or
+                        return
+                    under_or = True
+                yield from visit(node.lhs, under_or)
+                yield from visit(node.rhs, under_or)
+            elif isinstance(node, BinaryExpr) and isinstance(node.lhs, VarRef):
+                yield node, None, under_or
+
+        yield from visit(parse(query).condition, False)
+
+    @staticmethod
+    def _fold_equalities(node) -> Optional[Tuple[str, str]]:
+        equalities = []
+
+        def collect(node):
+            if isinstance(node, ParenExpr):
+                return collect(node.expr)
+            if isinstance(node, BinaryExpr) and node.op == "OR":
+                return collect(node.lhs) and collect(node.rhs)
+            if (
+                isinstance(node, BinaryExpr)
+                and node.op == "="
+                and isinstance(node.lhs, VarRef)
+                and isinstance(node.rhs, Literal)
+                and node.rhs.kind == "STRING"
+            ):
+                equalities.append((node.lhs.name, node.rhs.value))
+                return True
+            return False
+
+        if collect(node) and len({key for key, _ in equalities}) == 1:
+            return equalities[0][0], "|".join(value for _, value in equalities)
+        return None
 
     def get_labels(self, query: str, *, field_name: str) -> Tuple[str, str]:
         """Converts any equals, not equals, like and not like InfluxQL where conditions into corresponding Prometheus conditions.
@@ -505,181 +581,159 @@ class InfluxQLToM3DashboardConverter(Converter):
         E.g. "abc" = def AND foo =~ /bar$/ => abc='def',foo=~'.*bar'
         """
         labels = set()
-
-        # Bit hacky regexp handling trick:
-        #
-        # Replace (within parentheses) set of ORs with equalities with
-        # single regexp
-        single_eq_re = r""""(\S+)"\s*=\s*'(\S+)'"""
-
-        def _replace(m):
-            original_string = m.group(1)
-            results = re.findall(single_eq_re, m.group(1))
-            keys = set(r[0] for r in results)
-            if len(keys) == 1:
-                # only r[1]s differ -> we can create regexp to match them
-                key = next(iter(keys))
-                values = "|".join(r[1] for r in results)
+        for node, folded, _ in self._get_comparisons(query):
+            if folded:
+                key, values = folded
                 labels.add(f'{key}=~"{values}"')
-                return ""
-            return original_string
-
-        query = re.sub(
-            f"(\\({single_eq_re}\\s+(OR\\s+{single_eq_re})*\\))",
-            _replace,
-            query,
-            re.IGNORECASE,
-        )
-
-        for operator in LABEL_COMPARISON_OPERATORS:
+                continue
+            operator, key, value = node.op, node.lhs.name, node.rhs
+            if operator not in LABEL_COMPARISON_OPERATORS:
+                continue
             if operator in {"!~", "=~"}:
-                # Regex matches are of the form "field" =~ /regex/. regex could contain escaped forward
-                # slash so only end when finding / that isn't preceded by uneven number of backslashes.
-                # Actual content matching is non-greedy as there may be forward slashes later in content.
-                # Field name may or may not be double quoted. If it isn't, it should be simple alphanumeric
-                # string.
-                regex = r'(\w+?|"\S+?")\s*{}\s*/(.*?)(?<!\\)(?:\\{{2}})*/'.format(
-                    operator
-                )
-                for key, value in re.findall(regex, query):
-                    key = key.lstrip('"').rstrip('"').replace("-", "_")
-                    if key == field_name:
-                        continue
-                    # InfluxQL regexes are search-like (match anywhere) while Prometheus does exact
-                    # matches. Need to convert patterns accordingly
-                    if value.startswith("^"):
-                        value = value[1:]
-                    elif not value.startswith(".*"):
-                        value = f".*{value}"
-                    if value.endswith("$"):
-                        value = value[:-1]
-                    elif not value.endswith(".*"):
-                        value = f"{value}.*"
-                    # Forward slashes in the query have been escaped, strip the escapes for Prometheus
-                    value = value.replace("\\/", "/")
-                    # Regex escapes need to be escaped themself
-                    value = value.replace("\\", "\\\\")
-                    # Need to escape single quotes
-                    value = value.replace("'", "\\'")
-                    labels.add(f'{key}{operator}"{value}"')
+                if not (isinstance(value, Literal) and value.kind == "REGEX"):
+                    continue
+                key = key.replace("-", "_")
+                if key == field_name:
+                    continue
+                value = value.value
+                # InfluxQL regexes are search-like (match anywhere) while Prometheus does exact
+                # matches. Need to convert patterns accordingly
+                if value.startswith("^"):
+                    value = value[1:]
+                elif not value.startswith(".*"):
+                    value = f".*{value}"
+                if value.endswith("$"):
+                    value = value[:-1]
+                elif not value.endswith(".*"):
+                    value = f"{value}.*"
+                # Forward slashes in the query have been escaped, strip the escapes for Prometheus
+                value = value.replace("\\/", "/")
+                # Regex escapes need to be escaped themself
+                value = value.replace("\\", "\\\\")
+                # Need to escape single quotes
+                value = value.replace("'", "\\'")
             else:
-                # Non regex matches are of the form "field" = foobar or "field" = 'foo-bar'. Look for
-                # both forms separately. Field name may or may not be double quoted. If it isn't, it
-                # should be simple alphanumeric string.
-                regex = r'(\w+?|"\S+?")\s*{}\s*\'(.*?)(?<!\\)(?:\\{{2}})*\''.format(
-                    operator
-                )
-
-                def _escape_backslashes(s):
-                    # There's stuff like "aiven\.prune" floating
-                    # around in exact matches, and m3 doesn't like
-                    # escapes in the normal strings that it does not
-                    # support (it only supports \n\r or something I
-                    # suppose)
-                    return s.replace("\\", "\\\\")
-
-                for key, value in re.findall(regex, query):
-                    key = key.lstrip('"').rstrip('"')
-                    if key == field_name:
-                        continue
-                    value = _escape_backslashes(value)
-                    labels.add(f'{key}{operator}"{value}"')
-                # Non-quoted value variant is terminated either by whitespace or closing parenthesis
-                regex = r'(\w+?|"\S+?")\s*{}\s*([^\s\'~].*?)(?:\)|\s)'.format(operator)
-                for key, value in re.findall(regex, query):
-                    key = key.lstrip('"').rstrip('"')
-                    if key == field_name:
-                        continue
-                    value = _escape_backslashes(value)
-                    labels.add(f'{key}{operator}"{value}"')
+                if key == field_name:
+                    continue
+                if isinstance(value, VarRef):
+                    value = value.name
+                elif isinstance(value, Literal):
+                    # Unquoted values are taken as written, e.g. foobar or $host
+                    value = (
+                        value.value
+                        if value.kind == "STRING"
+                        else query[value.start : value.end]
+                    )
+                else:
+                    continue
+                # There's stuff like "aiven\.prune" floating around in exact
+                # matches, and m3 doesn't like escapes in the normal strings
+                # that it does not support (it only supports \n\r or something I
+                # suppose)
+                value = value.replace("\\", "\\\\")
+            labels.add(f'{key}{operator}"{value}"')
 
         return query, ",".join(sorted(labels))
 
     def get_conditions(self, query: str, *, field_name: str) -> Union[str, List[str]]:
         conditions = []
-        for operator in LABEL_CONDITIONS_OPERATORS:
-            for key, value in re.findall(
-                r'(\w+?|"\S+?")\s*{}\s*(-?\w+(?:\.?\d+)?)'.format(operator), query
-            ):
-                key = key.strip('"')
-                # Prometheus queries don't support filtering by values that are not actually selected
-                if key != field_name:
-                    if operator == "=":
-                        continue
-                    raise ValueError(
-                        f"Query {query!r} has condition that does not match select field, cannot convert"
-                    )
+        has_or = False
+        for node, folded, under_or in self._get_comparisons(query):
+            has_or = has_or or under_or
+            if folded or node.op not in LABEL_CONDITIONS_OPERATORS:
+                continue
+            operator, key, value = node.op, node.lhs.name, node.rhs
+            # Prometheus queries don't support filtering by values that are not actually selected
+            if key != field_name:
                 if operator == "=":
-                    operator = "=="
-                conditions.append(f"{operator} {value}")
-        # To make this work reliably we should actually parse the query but in our case there are only couple
-        # of queries that use OR and all of those are simple queries with nothing but the OR. For Prometheus
-        # queries OR needs to generate multiple different queries, otherwise the conditions are treated as AND
-        if " OR " in query and conditions:
+                    continue
+                raise ValueError(
+                    f"Query {query!r} has condition that does not match select field, cannot convert"
+                )
+            if isinstance(value, Literal) and value.kind in {"NUMBER", "DURATION"}:
+                value = value.value
+            elif isinstance(value, VarRef) and not value.quoted:
+                value = value.name
+            else:
+                continue
+            if operator == "=":
+                operator = "=="
+            conditions.append(
+                (LABEL_CONDITIONS_OPERATORS.index(node.op), operator, value)
+            )
+        conditions = [
+            f"{operator} {value}" for _, operator, value in sorted(conditions)
+        ]
+        # For Prometheus queries OR needs to generate multiple different queries,
+        # otherwise the conditions are treated as AND
+        if has_or and conditions:
             return conditions
         else:
             return " ".join(conditions)
 
     def does_divide_by_self(self, query: str) -> bool:
         """Returns True if the query contains select like 'SELECT max("foo") / max("foo") FROM somwhere'."""
-        return bool(
-            re.search(r"select\s+(\S+?)\s*/\s*\1\s+from ", query, re.IGNORECASE)
+        fields = parse(query).fields
+        if len(fields) != 1:
+            return False
+        expr = fields[0].expr
+        return (
+            isinstance(expr, BinaryExpr)
+            and expr.op == "/"
+            and query[expr.lhs.start : expr.lhs.end]
+            == query[expr.rhs.start : expr.rhs.end]
         )
 
     def get_modifications(self, query: str) -> List[str]:
         modifications = []
         # Basic arithmetic operations where the other side is a number
-        part1 = re.search(
-            r'[")](\s*[*/+\-]\s*-?[\d]+?(?:\.\d+?)?) from', query, re.IGNORECASE
-        )
-        if part1:
-            modifications.append(part1.group(1))
+        expr = parse(query).fields[-1].expr
+        if (
+            isinstance(expr, BinaryExpr)
+            and expr.op in {"*", "/", "+", "-"}
+            and isinstance(expr.rhs, Literal)
+            and expr.rhs.kind == "NUMBER"
+        ):
+            operand = expr.lhs
+            while isinstance(operand, BinaryExpr):
+                operand = operand.rhs
+            if not isinstance(operand, Literal):
+                modifications.append(query[expr.lhs.end : expr.rhs.end])
         return modifications
 
     def get_group_by(self, query: str) -> Optional[GroupBy]:
         self.group_by_labels = None
+        statement = parse(query)
+        if statement.dimensions is None:
+            return None
         fills = []
+        if statement.fill:
+            fills.append(query[statement.fill.start : statement.fill.end].lower())
         group_by = []
         time_val = ""
-        groups = query.lower().split("group by")
-        if len(groups) < 2:
-            return None
-        groups = groups[1].split(" ")
-        for outer_group in groups:
-            inner_groups = outer_group.split(",")
-            for group in inner_groups:
-                if not group:
-                    continue
-                m = re.match(r"(?i)fill\((.*)\)", group)
-                if m is not None:
-                    fills.append(m.group(1))
-                    continue
-                if "time" in group:
-                    m = re.search("\\((.*)\\)", group)
-                    if m is None:
-                        raise ValueError(f"Unparseable group by statement: {group}")
-                    time_val = (
-                        m.group(1)
-                        .replace("$_interval", "$__interval")
-                        .replace("auto", "$__interval")
-                        .replace("$interval", "$__interval")
-                    )
-                    continue
-                group_by.append(group.replace(",", "").replace('"', ""))
+        for dimension in statement.dimensions:
+            if isinstance(dimension, Call) and dimension.name == "time":
+                if not dimension.args:
+                    raise ValueError("Unparseable group by statement: time()")
+                interval = dimension.args[0]
+                time_val = (
+                    query[interval.start : interval.end]
+                    .lower()
+                    .replace("$_interval", "$__interval")
+                    .replace("auto", "$__interval")
+                    .replace("$interval", "$__interval")
+                )
+            elif isinstance(dimension, VarRef):
+                group_by.append(dimension.name.lower())
+            else:
+                group_by.append(query[dimension.start : dimension.end].lower())
         self.group_by_labels = group_by
         group_by_str = " by ({})".format(",".join(group_by)) if group_by else ""
         return GroupBy(group_by=group_by_str, over_time=time_val, fills=fills)
 
     def get_alias_from_query(self, query: str) -> str:
-        # udpated_query = query.replace("-", "_")
-        m = re.search(
-            r'(\("|\(|\")(?P<field>[\w.]+)("\)|\)|")( AS [\'"]?(?P<alias>\w+)[\'"]?)?',
-            query,
-            re.IGNORECASE,
-        )
-        if m is None:
-            raise ValueError(f"Unable to find (single) metric key in {query}")
-        return m.groupdict().get("alias", "")
+        self._get_field(query)
+        return parse(query).fields[0].alias
 
     def convert_expression(self, query: str) -> Tuple[str, List[str], List[str], str]:
         series_name, field_name = self.get_metric_name(query)
@@ -797,19 +851,41 @@ class InfluxQLToM3DashboardConverter(Converter):
 
         return self.convert_expression(query)
 
+    def translate_query(self, query: str) -> Tuple[str, List[str], List[str], str]:
+        """Translates the query to PromQL, memoized by the query text. Legend and result
+        format are applied by the caller so they are not part of the cache key."""
+        return self.translate(query)[:4]
+
+    def translate(self, query: str) -> TranslatedQuery:
+        translated = self.translation_cache.get(query)
+        if translated is None:
+            with self._error_manager.recording() as errors:
+                if "from (" in query.lower():
+                    result = self.convert_subquery(query)
+                else:
+                    result = self.convert_expression(query)
+                metric_name = "".join(self.get_metric_name(query))
+            translated = TranslatedQuery(
+                *result, metric_name, self.group_by_labels, errors
+            )
+            self.translation_cache.put(query, translated)
+        else:
+            self.group_by_labels = translated.group_by_labels
+            for error in translated.errors:
+                self._error_manager.add_error(*error)
+        return translated
+
     def convert_query(
         self, query: str, target: dict, legend: str
-    ) -> Tuple[dict, List[str], List[str]]:
+    ) -> Tuple[dict, List[str], List[str], str]:
         if "<>" in query:
             raise ValueError(
                 f"Unexpected <> found from query {query!r}, use != instead"
             )
         if "(*)" in query:
             raise ValueError("Unsupported (*) query in {query!r}")
-        if "from (" in query.lower():
-            expr, over_times, fills, alias_name = self.convert_subquery(query)
-        else:
-            expr, over_times, fills, alias_name = self.convert_expression(query)
+        translated = self.translate(query)
+        expr, over_times, fills, alias_name = translated[:4]
         fmt = target["resultFormat"]
         if "$col" in legend:
             if alias_name:
@@ -829,7 +905,7 @@ class InfluxQLToM3DashboardConverter(Converter):
 
         if "hide" in target:
             new_target["hide"] = target["hide"]
-        return new_target, over_times, fills
+        return new_target, over_times, fills, translated.metric_name
 
     def convert_to_query(self, target: dict, legend: str) -> str:
         query = "SELECT "
@@ -841,11 +917,12 @@ class InfluxQLToM3DashboardConverter(Converter):
             return "not-influx-target", [], []
         if target.get("select") is None:
             raise ValueError(
-                f"Dashboard {self._current_dashboard} is invalid, missing select field in target"
+                f"Dashboard {self._state.title} is invalid, missing select field in target"
             )
 
         for select in target["select"]:
-            for item in sorted(select, key=lambda x: x["type"].lower()):
+            # The field has to be known before the functions wrapping it
+            for item in sorted(select, key=lambda x: x["type"].lower() != "field"):
                 item_type = item["type"]
                 if item_type == "field":
                     value = item["params"][0].replace("::tag", "")
@@ -860,11 +937,7 @@ class InfluxQLToM3DashboardConverter(Converter):
                     if select_what:
                         select_what = f"{item_type}({select_what}{param_str})"
                     elif item_type not in ("max", "last"):
-                        select_what = (
-                            f'{item_type}("{value}"{param_str}){{alias}}'.format(
-                                alias=f' AS "{alias}"' if alias else ""
-                            )
-                        )
+                        select_what = f'{item_type}("{value}"{param_str})'
                 elif item_type == "alias":
                     # This is only used in the Maps dashboard. This is actually relevant but the map itself is
                     # of questionable value so just ignore the issue for now
@@ -996,12 +1069,13 @@ class InfluxQLToM3DashboardConverter(Converter):
         )
         if not target.get("measurement"):
             raise ValueError(
-                f"Missing measurement field for target, in dashboard: {self._current_dashboard}"
+                f"Missing measurement field for target, in dashboard: {self._state.title}"
             )
 
-        query += '{select_what}{modifications} FROM "{measurement}" WHERE {where}{group_by}'.format(
+        query += '{select_what}{modifications}{alias} FROM "{measurement}" WHERE {where}{group_by}'.format(
             select_what=select_what,
             modifications=" ".join(modifications),
+            alias=f' AS "{alias}"' if alias else "",
             measurement=target["measurement"],
             where=where,
             group_by=group_by,
@@ -1039,10 +1113,12 @@ class InfluxQLToM3DashboardConverter(Converter):
         new_targets = []
         r_over_times = []
         r_fills = []
+        # Recorded once the whole panel converted, a failing target drops them all
+        metric_refs = []
 
         for target in targets:
             if self._influx_detector.is_target_influx(
-                target, self._context_templating, old_panel_datasource
+                target, self._state.templating, old_panel_datasource
             ):
                 legend = self.get_legend_format(target)
                 if legend:
@@ -1052,20 +1128,28 @@ class InfluxQLToM3DashboardConverter(Converter):
                 if target.get("rawQuery"):  # Some panels use raw query instead
                     query = target["query"].replace("\n", " ")
                     query = re.sub("  +", " ", query)
-                    new_target, over_times, fills = self.convert_query(
+                    new_target, over_times, fills, metric_name = self.convert_query(
                         query, target, legend
                     )
                 else:
                     query = self.convert_to_query(target, legend)
-                    new_target, over_times, fills = self.convert_query(
+                    new_target, over_times, fills, _ = self.convert_query(
                         query, target, legend
                     )
+                    metric_name = self.get_builder_metric_name(target)
                 if new_target == "not-influx-target":
                     new_targets.append(target)
                     fills = []
                     over_times = []
                 else:
                     new_targets.append(new_target)
+                # replace . and - with _ for the metric names. (promql valid metric name contains _ only)
+                metric_refs.append(
+                    (
+                        self._replace_invalid_metric_characters(metric_name),
+                        new_targets[-1],
+                    )
+                )
                 r_fills.extend(fills)
                 r_over_times.extend(over_times)
             else:
@@ -1085,10 +1169,11 @@ class InfluxQLToM3DashboardConverter(Converter):
                 new_targets.append(new_target)
                 r_fills.extend([])
                 r_over_times.extend([])
+        self._state.metric_refs.extend(metric_refs)
         return new_targets, r_over_times, r_fills
 
     def convert_panel(self, panel: dict) -> None:
-        self._error_manager.context.panel = GrafanaPanel(
+        self._error_manager.context.panel = self._state.panel = GrafanaPanel(
             id=panel["id"],
             title=panel["title"] if "title" in panel else panel["id"],
         )
@@ -1120,9 +1205,6 @@ class InfluxQLToM3DashboardConverter(Converter):
                     panel["targets"], old_panel_datasource
                 )
 
-                self.add_to_metric_and_object_list(
-                    panel["targets"], targets, old_panel_datasource
-                )
                 panel["targets"] = targets
                 over_times = set(over_times_list)
                 # Assume $__interval and $__rate_interval are covered by scraping interval
@@ -1180,65 +1262,86 @@ class InfluxQLToM3DashboardConverter(Converter):
             self.convert_panel(panel)
 
     def convert_dashboard(self, dashboard: dict, meta: dict) -> dict:
-        self._error_manager.context.meta = meta
-        self._logger.info(f'Started dashboard conversion for: {dashboard.get("title")}')
-        self._context_templating = dashboard["templating"]
-        self._error_manager.context.dashboard = GrafanaDashboard(
-            uid=dashboard["uid"],
-            title=dashboard["title"],
-            folder=meta["folderTitle"],
-            updater=meta["updatedBy"],
-        )
-        self._error_manager.context.folder = meta["folderTitle"]
-        self._current_dashboard = dashboard.get("title")
-        # Reverted order - first Panels, then Templating - DG
-        self.convert_panels(dashboard.get("panels", []))
-        for row in dashboard.get("rows", []):
-            # TBD does this even exist? modern Grafana seems to have just toplevel list of "panels"
-            self.convert_panels(row["panels"])
-        templating = dashboard.get("templating")
-        try:
-            if templating:
-                self.convert_templating(dashboard["templating"])
-        except ValueError as ex:
-            raise ConvertError(ex) from ex
-
-        for r in self._get_rep_metric:
-            if r[0]:
-                self._update_label_values_metric()
+        """Converts the dashboard in place and adds its metrics to metric_to_objects.
 
-        self._logger.info(
-            f'Finished dashboard conversion for: {dashboard.get("title")}'
-        )
+        Dashboards can also be converted concurrently with convert_dashboard_detached()
+        (threads must each run within their own error_manager.scope()), the result is
+        the same as long as merge_conversion() is called in dashboard order."""
+        conversion = DashboardConversion(dashboard.get("title"))
+        try:
+            self.convert_dashboard_detached(dashboard, meta, conversion)
+        finally:
+            self.merge_conversion(conversion)
         return dashboard
 
-    def _update_label_values_metric(self):
-        for r in self._get_rep_metric:
-            if r[0] is not True:
-                continue
-            dashboard_metric = r[1]
-            label_values = r[2]
-            for metric in self.metric_to_objects.keys():
-                splitted_metric = metric.rsplit("_", maxsplit=1)
-                if len(splitted_metric) < 2:
-                    continue
-                if splitted_metric[0] == dashboard_metric or metric == dashboard_metric:
-                    label_values["query"] = label_values["query"].replace(
-                        dashboard_metric, metric
+    def convert_dashboard_detached(
+        self, dashboard: dict, meta: dict, conversion: DashboardConversion
+    ) -> None:
+        """Converts the dashboard in place, collecting its metrics into `conversion`
+        instead of metric_to_objects."""
+        token = self._conversion.set(conversion)
+        try:
+            self._error_manager.context.meta = meta
+            self._logger.info(
+                f'Started dashboard conversion for: {dashboard.get("title")}'
+            )
+            conversion.templating = dashboard["templating"]
+            self._error_manager.context.dashboard = GrafanaDashboard(
+                uid=dashboard["uid"],
+                title=dashboard["title"],
+                folder=meta["folderTitle"],
+                updater=meta["updatedBy"],
+            )
+            self._error_manager.context.folder = meta["folderTitle"]
+            # Don't report errors against the last panel of the previous dashboard
+            self._error_manager.context.panel = None
+            # Reverted order - first Panels, then Templating - DG
+            self.convert_panels(dashboard.get("panels", []))
+            for row in dashboard.get("rows", []):
+                # TBD does this even exist? modern Grafana seems to have just toplevel list of "panels"
+                self.convert_panels(row["panels"])
+            templating = dashboard.get("templating")
+            try:
+                if templating:
+                    self.convert_templating(dashboard["templating"])
+            except ValueError as ex:
+                raise ConvertError(ex) from ex
+            conversion.completed = True
+            self._logger.info(
+                f'Finished dashboard conversion for: {dashboard.get("title")}'
+            )
+        finally:
+            self._conversion.reset(token)
+
+    def merge_conversion(self, conversion: DashboardConversion) -> None:
+        """Adds the metrics of a converted dashboard to metric_to_objects. The
+        label_values() queries of a dashboard that failed to convert are dropped."""
+        title = conversion.title
+        for metric, target in conversion.metric_refs:
+            if metric not in self.metric_to_objects:
+                self.metric_to_objects[metric] = {}
+                if "_" in metric:
+                    self._label_values_metrics.setdefault(
+                        metric.rsplit("_", 1)[0], metric
                     )
-                    try:
-                        self.metric_to_objects[metric][self._current_dashboard].append(
-                            label_values
-                        )
-                    except:
-                        self._error_manager.add_error(
-                            "Invalid dashboard on templating replacement split",
-                            error_level="ERROR",
-                            notes=(
-                                self._current_dashboard
-                                if self._current_dashboard
-                                else "None"
-                            ),
-                        )
-                    break
-        self._get_rep_metric = []
+                    self._label_values_metrics.setdefault(metric, metric)
+            self.metric_to_objects[metric].setdefault(title, []).append(target)
+        if conversion.completed:
+            self._update_label_values_metric(conversion)
+
+    def _update_label_values_metric(self, conversion: DashboardConversion):
+        for dashboard_metric, label_values in conversion.label_values:
+            metric = self._label_values_metrics.get(dashboard_metric)
+            if metric is None:
+                continue
+            label_values["query"] = label_values["query"].replace(
+                dashboard_metric, metric
+            )
+            try:
+                self.metric_to_objects[metric][conversion.title].append(label_values)
+            except:
+                self._error_manager.add_error(
+                    "Invalid dashboard on templating replacement split",
+                    error_level="ERROR",
+                    notes=conversion.title if conversion.title else "None",
+                )
@@ -0,0 +1,124 @@
+import logging
+
+import pytest
+from common.error_manager import ErrorManager, ProcessingContext
+from .influxql_parser import BinaryExpr, InfluxQLSyntaxError, Literal, parse
+from .influxql_to_promql_dashboard_converter import InfluxQLToM3DashboardConverter
+
+
+@pytest.fixture
+def converter():
+    return InfluxQLToM3DashboardConverter(
+        error_manager=ErrorManager(logging.getLogger(__name__), ProcessingContext()),
+        global_shared_state={},
+        replacement_datasource={"uid": "prometheus", "type": "prometheus"},
+        translation_cache_size=0,
+    )
+
+
+@pytest.mark.parametrize(
+    "query,expected",
+    [
+        (
+            'SELECT mean("usage_idle") FROM "cpu" WHERE ("host" =~ /^$host$/) AND $timeFilter GROUP BY time($__interval), "host" fill(null)',
+            (
+                'avg_by_(host)(avg_over_time(cpu_usage_idle{host=~"$host"}[$__interval])) ',
+                ["30s", "$__interval"],
+                ["null"],
+                None,
+            ),
+        ),
+        (
+            'SELECT non_negative_derivative(mean("bytes_recv"), 1s) FROM "net" WHERE "host" = \'abc\' AND $timeFilter GROUP BY time(1m)',
+            (
+                'avg(rate(net_bytes_recv{host="abc"}[$__interval])) ',
+                ["2m", "1m"],
+                [],
+                None,
+            ),
+        ),
+        (
+            'SELECT count("value") FROM "autogen"."mem" WHERE $timeFilter GROUP BY time(5m), "region"',
+            (
+                "sum_by_(region)(count_over_time(mem_value[$__interval])) ",
+                ["30s", "5m"],
+                [],
+                None,
+            ),
+        ),
+        (
+            'SELECT mean("used") * 100 FROM "mem" WHERE "host" =~ /web.*/ AND "dc" != \'x\' AND $timeFilter GROUP BY time(1h) fill(0)',
+            (
+                'avg(avg_over_time(mem_used{dc!="x",host=~".*web.*"}[$__interval]))  * 100',
+                ["30s", "1h"],
+                ["0"],
+                None,
+            ),
+        ),
+        (
+            'SELECT sum("requests") FROM "http" WHERE ("code" = \'500\' OR "code" = \'502\' OR "code" = \'503\') AND $timeFilter GROUP BY time(auto),"service"',
+            (
+                'sum_by_(service)(sum_over_time(http_requests{code=~"500|502|503"}[$__interval])) ',
+                ["30s", "$__interval"],
+                [],
+                None,
+            ),
+        ),
+        (
+            'SELECT last("value") AS "Current" FROM "temp" WHERE "sensor" = foo AND $timeFilter',
+            ('avg(temp_value{sensor="foo"})', [], [], "Current"),
+        ),
+        (
+            'SELECT mean("x") FROM "y" WHERE "x" < 5 OR "x" > 10 AND $timeFilter',
+            ("avg(y_x< 5) or avg(y_x> 10)", [], [], None),
+        ),
+        (
+            'SELECT max("used_percent") / max("used_percent") FROM "disk" WHERE $timeFilter GROUP BY time($interval)',
+            (
+                "max(max_over_time(disk_used_percent[$__interval])!= bool 0) ",
+                ["30s", "$__interval"],
+                [],
+                None,
+            ),
+        ),
+        (
+            'SELECT derivative(mean("io_time"), 1s) FROM "diskio" WHERE "name" !~ /loop\\/.*/ AND $timeFilter GROUP BY time($_interval) fill(none)',
+            (
+                'avg(rate(diskio_io_time{name!~".*loop/.*"}[$__rate_interval])) ',
+                ["$__rate_interval"],
+                ["none"],
+                None,
+            ),
+        ),
+        (
+            'SELECT moving_average(mean("load1"), 5) FROM "system" WHERE $timeFilter GROUP BY time(1m), "host"::tag ORDER BY time DESC LIMIT 10',
+            (
+                "avg_by_(host)(avg_over_time(system_load1[$__interval])) ",
+                ["30s", "1m"],
+                [],
+                None,
+            ),
+        ),
+    ],
+)
+def test_translate_query(converter, query, expected):
+    assert converter.translate_query(query) == expected
+
+
+def test_condition_on_other_field_is_rejected(converter):
+    with pytest.raises(ValueError, match="does not match select field"):
+        converter.translate_query('SELECT mean("x") FROM "y" WHERE time > now() - 1h')
+
+
+def test_slash_is_regex_or_division_by_context():
+    statement = parse(
+        'SELECT mean("a") / 2 FROM "m" WHERE "h" =~ /a\\/b/ AND "v" / 2 > 1'
+    )
+    assert isinstance(statement.fields[0].expr, BinaryExpr)
+    regex = statement.condition.lhs.rhs
+    assert isinstance(regex, Literal) and regex.value == "a\\/b"
+
+
+def test_syntax_error():
+    with pytest.raises(InfluxQLSyntaxError, match="Expected FROM"):
+        parse('SELECT mean("value") AS "al" * 8 FROM "y"')
@@ -0,0 +1,44 @@
+import logging
+
+from benchmarks.fake_grafana import make_dashboard
+from common.error_manager import ErrorManager, ProcessingContext
+from .influxql_to_promql_dashboard_converter import InfluxQLToM3DashboardConverter
+
+
+def dashboard(uid, fields, template_metric=None):
+    result = make_dashboard(uid, len(fields))
+    for panel, field in zip(result["dashboard"]["panels"], fields):
+        panel["targets"][0][
+            "query"
+        ] = f'SELECT mean("{field}") FROM "node_cpu" WHERE $timeFilter GROUP BY time($__interval)'
+    if template_metric:
+        result["dashboard"]["templating"]["list"] = [
+            {
+                "type": "query",
+                "name": "host",
+                "query": f'SHOW TAG VALUES FROM "{template_metric}" WITH KEY = "host"',
+            }
+        ]
+    return result
+
+
+def test_label_values_metric_is_the_first_one_named_like_it():
+    converter = InfluxQLToM3DashboardConverter(
+        error_manager=ErrorManager(logging.getLogger(__name__), ProcessingContext()),
+        global_shared_state={},
+        replacement_datasource={"uid": "prometheus", "type": "prometheus"},
+    )
+    # node_cpuusage_idle comes first, its name without the last "_" part is the name
+    # of node_cpuusage
+    dashboards = [
+        dashboard("a", ["usage_idle"]),
+        dashboard("b", ["usage", "usage_idle"], "node_cpuusage"),
+    ]
+    for item in dashboards:
+        converter.convert_dashboard(item["dashboard"], item["meta"])
+
+    assert list(converter.metric_to_objects) == ["node_cpuusage_idle", "node_cpuusage"]
+    variable = dashboards[1]["dashboard"]["templating"]["list"][0]
+    assert variable["query"] == "label_values(node_cpuusage_idle,host)"
+    assert variable in converter.metric_to_objects["node_cpuusage_idle"]["Dashboard b"]
+    assert variable not in converter.metric_to_objects["node_cpuusage"]["Dashboard b"]
@@ -0,0 +1,47 @@
+from .translation_cache import TranslatedQuery, TranslationCache
+
+
+def translated(expr):
+    return TranslatedQuery(
+        expr, ["1m"], [], "", "cpuusage", ["host"], [("msg", "WARN", "")]
+    )
+
+
+def test_lru_eviction():
+    cache = TranslationCache(maxsize=2)
+    cache.put("a", translated("A"))
+    cache.put("b", translated("B"))
+    assert cache.get("a").expr == "A"
+    cache.put("c", translated("C"))
+    assert cache.get("b") is None
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 2)
+
+
+def test_disabled():
+    cache = TranslationCache(maxsize=0, filepath="unused")
+    cache.put("a", translated("A"))
+    assert cache.get("a") is None
+
+
+def test_persistence(tmp_path):
+    def cache(scrape_interval):
+        return TranslationCache(
+            filepath=tmp_path / "translations", scrape_interval=scrape_interval
+        )
+
+    first = cache(30)
+    first.put("a", translated("A"))
+    first.save()
+
+    assert cache(30).get("a") == translated("A")
+    assert cache(10).get("a") is None
+
+
+def test_pop_added():
+    cache = TranslationCache()
+    cache.put("a", translated("A"))
+    assert cache.pop_added() == []
+    cache.record_added()
+    cache.put("b", translated("B"))
+    assert cache.pop_added() == [("b", translated("B"))]
+    assert cache.pop_added() == []
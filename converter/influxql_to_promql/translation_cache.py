@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from hashlib import sha256
+from pathlib import Path
+from typing import List, NamedTuple, Optional, Tuple
+
+from common.version import VERSION
+from importer.cache import GeneralCache
+
+# Source files whose changes invalidate a persisted cache
+TRANSLATION_MODULES = [
+    "influxql_to_promql_dashboard_converter.py",
+    "influxql_parser.py",
+]
+
+
+class TranslatedQuery(NamedTuple):
+    expr: str
+    over_times: List[str]
+    fills: List[str]
+    alias_name: str
+    # metric_to_objects key of a raw query, before invalid characters are replaced
+    metric_name: str
+    # Side effect of get_group_by() that get_legend_format() relies on
+    group_by_labels: Optional[List[str]]
+    # add_error() arguments recorded during translation, replayed on every hit
+    errors: List[Tuple[str, str, str]]
+
+
+class TranslationCache:
+    """Bounded LRU of InfluxQL query -> TranslatedQuery.
+
+    With `filepath` the entries are persisted with GeneralCache between runs. The
+    cache key covers the tool version, the converter sources and the scrape interval,
+    so a persisted cache is dropped as soon as any of them changes."""
+
+    def __init__(self, maxsize: int = 10000, filepath=None, scrape_interval=None):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._added = None
+        self._file_cache = None
+        if filepath and maxsize > 0:
+            digest = sha256()
+            for module in TRANSLATION_MODULES:
+                digest.update(Path(__file__).with_name(module).read_bytes())
+            key = f"{VERSION}:{digest.hexdigest()}:{scrape_interval}"
+            self._file_cache = GeneralCache(
+                lambda x: isinstance(x, dict) and x, filepath, key=key
+            )
+            if self._file_cache.cache_available():
+                for query, value in self._file_cache.load().items():
+                    self.put(query, TranslatedQuery(*value))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, query: str) -> Optional[TranslatedQuery]:
+        value = self._entries.get(query)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(query)
+        self.hits += 1
+        return value
+
+    def record_added(self) -> None:
+        """Starts keeping the entries put from now on, for pop_added()."""
+        self._added = []
+
+    def pop_added(self) -> List[Tuple[str, TranslatedQuery]]:
+        """Returns the entries put since the previous call, e.g. to pass the
+        translations of a worker process to the cache that gets saved."""
+        if self._added is None:
+            return []
+        added, self._added = self._added, []
+        return added
+
+    def put(self, query: str, value: TranslatedQuery) -> None:
+        if self.maxsize <= 0:
+            return
+        if self._added is not None:
+            self._added.append((query, value))
+        self._entries[query] = value
+        self._entries.move_to_end(query)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def save(self) -> None:
+        if self._file_cache and self._entries:
+            self._file_cache.save(
+                {query: tuple(value) for query, value in self._entries.items()}
+            )
@@ -0,0 +1,44 @@
+import json
+from typing import Iterator, List, NamedTuple, Optional
+
+import requests
+
+from common.concurrency import ordered_map
+from common.grafana_http import GrafanaHttpClient
+
+
+class UploadResult(NamedTuple):
+    title: str
+    uid: str
+    # None when Grafana saved the dashboard
+    error: Optional[str]
+
+
+def post_dashboards(
+    session: GrafanaHttpClient,
+    api_endpoint: str,
+    headers: dict,
+    payloads: List[dict],
+    concurrency: int,
+    verify: bool = True,
+) -> Iterator[UploadResult]:
+    """POSTs /dashboards/db payloads, up to `concurrency` at a time. Results are
+    yielded in payload order, failures don't stop the other uploads."""
+
+    def post(payload: dict) -> UploadResult:
+        dashboard = payload["dashboard"]
+        try:
+            response = session.post(
+                api_endpoint + "/dashboards/db",
+                data=json.dumps(payload),
+                headers=headers,
+                verify=verify,
+            )
+        except requests.RequestException as e:
+            return UploadResult(dashboard["title"], dashboard["uid"], str(e))
+        if response.status_code != 200:
+            error = f"{response.status_code} {response.content}"
+            return UploadResult(dashboard["title"], dashboard["uid"], error)
+        return UploadResult(dashboard["title"], dashboard["uid"], None)
+
+    return ordered_map(post, payloads, concurrency)
@@ -0,0 +1,69 @@
+import json
+import os
+import uuid
+from hashlib import sha256
+from pathlib import Path
+from typing import Collection, List
+
+# Namespace of the dashboard and folder uids derived by the exporters
+UID_NAMESPACE = uuid.UUID("5b0c6f0e-2f4d-4a8e-9a57-8f1d0c2f6a41")
+
+
+def deterministic_uid(org_id, source_uid: str) -> str:
+    """The same target uid for a source uid on every run, uids are unique per org"""
+    return str(uuid.uuid5(UID_NAMESPACE, f"{org_id}/{source_uid}"))
+
+
+def payload_digest(payload: dict) -> str:
+    return sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class ExportLedger:
+    """Digest of the last payload saved for every dashboard uid, kept in a JSON file.
+    Payloads identical to the saved one are not posted again. Entries of a ledger
+    written for another endpoint or org are ignored."""
+
+    VERSION = 1
+
+    def __init__(self, path: str, endpoint: str, org_id):
+        self._path = Path(path)
+        self._key = f"{endpoint}?orgId={org_id}"
+        self.entries = {}
+        # Digests of the payloads being posted, entered once Grafana saved them
+        self._pending = {}
+        if self._path.is_file():
+            ledger = json.loads(self._path.read_text())
+            if ledger.get("version") == self.VERSION and ledger.get("key") == self._key:
+                self.entries = ledger["entries"]
+
+    def changed(
+        self, payloads: List[dict], new_folders: Collection[str] = ()
+    ) -> List[dict]:
+        """The payloads that differ from the last ones saved, and every payload going
+        into one of new_folders: folders created by this run hold no dashboard"""
+        changed = []
+        for payload in payloads:
+            uid = payload["dashboard"]["uid"]
+            digest = payload_digest(payload)
+            if (
+                self.entries.get(uid) != digest
+                or payload.get("folderUid") in new_folders
+            ):
+                self._pending[uid] = digest
+                changed.append(payload)
+        return changed
+
+    def record(self, uid: str) -> None:
+        """Marks the pending payload of uid as saved"""
+        if uid in self._pending:
+            self.entries[uid] = self._pending.pop(uid)
+
+    def save(self) -> None:
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self._path.with_name(f"{self._path.name}.tmp")
+        tmp_file.write_text(
+            json.dumps(
+                {"version": self.VERSION, "key": self._key, "entries": self.entries}
+            )
+        )
+        os.replace(tmp_file, self._path)
@@ -0,0 +1,61 @@
+from typing import Optional, Tuple, Union
+
+from common.grafana_http import GrafanaHttpClient
+
+FOLDERS_PAGE_SIZE = 1000
+
+
+class FolderIndex:
+    """Parent folder uid -> title -> (id, uid) of its child folders. Each parent is
+    listed once, with a paged /folders?parentUid request, and updated as folders are
+    created."""
+
+    def __init__(
+        self,
+        session: GrafanaHttpClient,
+        api_endpoint: str,
+        headers: dict,
+        org_id,
+        verify: bool = True,
+    ):
+        self._session = session
+        self._api_endpoint = api_endpoint
+        self._headers = headers
+        self._org_id = org_id
+        self._verify = verify
+        self._children = {}
+
+    def children(self, parent_folder_uid: Optional[str]) -> dict:
+        if parent_folder_uid in self._children:
+            return self._children[parent_folder_uid]
+        children = {}
+        page = 1
+        while True:
+            res = self._session.get(
+                f"{self._api_endpoint}/folders?orgId={self._org_id}"
+                f"{'&parentUid=' + parent_folder_uid if parent_folder_uid else ''}"
+                f"&limit={FOLDERS_PAGE_SIZE}&page={page}",
+                headers=self._headers,
+                verify=self._verify,
+            )
+            res.raise_for_status()
+            folders = res.json()
+            for f in folders:
+                # The first folder listed with a title is used
+                children.setdefault(f["title"], (f["id"], f["uid"]))
+            if len(folders) < FOLDERS_PAGE_SIZE:
+                break
+            page += 1
+        self._children[parent_folder_uid] = children
+        return children
+
+    def folder_by_name(
+        self, name: str, parent_folder_uid: Optional[str] = None
+    ) -> Union[Tuple[int, str], Tuple[None, None]]:
+        return self.children(parent_folder_uid).get(name, (None, None))
+
+    def add(self, parent_folder_uid: Optional[str], title: str, folder_id, uid: str):
+        """Records a folder created under parent_folder_uid"""
+        self.children(parent_folder_uid)[title] = (folder_id, uid)
+        # A new folder has no children to list
+        self._children.setdefault(uid, {})
@@ -3,12 +3,15 @@ import logging
 import uuid
 from datetime import datetime
 
-import requests
-
+from common.grafana_http import GrafanaHttpClient
+from ..dashboard_upload import post_dashboards
+from ..export_ledger import ExportLedger, deterministic_uid
 from ..exporter import Exporter
+from ..folder_index import FolderIndex
 
 
 class GrafanaExporter(Exporter):
+    MIGRATION_FOLDER_TITLE = "Migrated Dashboards"
 
     def __init__(self, params, global_shared_state, log_level=logging.INFO):
         super().__init__(__name__, global_shared_state, log_level)
@@ -22,52 +25,131 @@ class GrafanaExporter(Exporter):
                 "Cache-Control": "no-cache",
                 "User-Agent": None,
             }
+            self._concurrency = max(int(params.get("concurrency", 1)), 1)
+            self.organization_id = params.get("org_id", 1)
+            self._deterministic_uids = params.get("deterministic_uids", False)
+            self._ledger = None
+            if params.get("export_ledger_file"):
+                if not self._deterministic_uids:
+                    raise ValueError("export_ledger_file requires deterministic_uids")
+                self._ledger = ExportLedger(
+                    params["export_ledger_file"],
+                    self._api_endpoint,
+                    self.organization_id,
+                )
         except KeyError as e:
             raise ValueError(str(e))
+        self._session = GrafanaHttpClient(self._concurrency)
+        # Uids of the folders created by this exporter
+        self._created_folders = set()
+        # UploadResult of every dashboard Grafana did not save
+        self.failed_dashboards = []
 
     def export_dashboards(self, dashboards: list, _folders):
         folder_uid = self._create_migration_folder()
-        for dashboard in dashboards:
-            self.export_dashboard(dashboard, folder_uid)
+        payloads = [
+            self.dashboard_payload(dashboard, folder_uid) for dashboard in dashboards
+        ]
+        if self._ledger:
+            payloads = self._ledger.changed(payloads, self._created_folders)
+            self._logger.info(
+                f"Skipping {len(dashboards) - len(payloads)} unchanged dashboards"
+            )
+        for result in post_dashboards(
+            self._session,
+            self._api_endpoint,
+            self._api_headers,
+            payloads,
+            self._concurrency,
+        ):
+            self._record_upload(result)
+        if self._ledger:
+            self._ledger.save()
+        if self.failed_dashboards:
+            self._logger.error(
+                f"Failed to export {len(self.failed_dashboards)} dashboards"
+            )
 
     # Creates dashboard in grafana
     def export_dashboard(self, dashboard, folder_uid):
+        payload = self.dashboard_payload(dashboard, folder_uid)
+        self._record_upload(
+            next(
+                post_dashboards(
+                    self._session,
+                    self._api_endpoint,
+                    self._api_headers,
+                    [payload],
+                    1,
+                )
+            )
+        )
+
+    def _record_upload(self, result):
+        if result.error:
+            self._logger.error(
+                f"Error creating dashboard {result.title}: {result.error}"
+            )
+            self.failed_dashboards.append(result)
+        else:
+            self._logger.debug(f"Successfully exported dashboard: {result.title}")
+            if self._ledger:
+                self._ledger.record(result.uid)
+
+    def dashboard_payload(self, dashboard, folder_uid) -> dict:
         if "meta" in dashboard:
             dashboard = dashboard["dashboard"]
-        dashboard["id"] = "null"
-        dashboard["uid"] = str(uuid.uuid4())
-        dashboard_json = {
+        # Later exporters get the source dashboard, with its source uid
+        dashboard = {**dashboard, "id": "null"}
+        if self._deterministic_uids:
+            dashboard["uid"] = deterministic_uid(self.organization_id, dashboard["uid"])
+        else:
+            dashboard["uid"] = str(uuid.uuid4())
+        return {
             "dashboard": dashboard,
             "folderUid": str(folder_uid),
             "overwrite": True,
         }
 
-        response = requests.post(
-            self._api_endpoint + "/dashboards/db",
-            data=json.dumps(dashboard_json),
-            headers=self._api_headers,
-        )
-        if response.status_code != 200:
-            self._logger.error(
-                f"Error creating dashboard {dashboard['title']}: {response.content}"
-            )
-        else:
-            self._logger.debug(f"Successfully exported dashboard: {dashboard['title']}")
-
     def _create_migration_folder(self):
         create_folder_url = self._api_endpoint + "/folders"
-        current_datetime = datetime.now()
-        dt_string = current_datetime.strftime("%d/%m/%Y %H:%M:%S")
-        folder_uid = uuid.uuid4()
+        if self._deterministic_uids:
+            # The same folder is used by every run
+            folder_uid = deterministic_uid(
+                self.organization_id, self.MIGRATION_FOLDER_TITLE
+            )
+            response = self._session.get(
+                f"{create_folder_url}/{folder_uid}", headers=self._api_headers
+            )
+            if response.status_code == 200:
+                return folder_uid
+            # A folder with the title but another uid, Grafana would refuse a new one
+            _id, existing_uid = FolderIndex(
+                self._session,
+                self._api_endpoint,
+                self._api_headers,
+                self.organization_id,
+            ).folder_by_name(self.MIGRATION_FOLDER_TITLE)
+            if existing_uid is not None:
+                return existing_uid
+            folder_name = self.MIGRATION_FOLDER_TITLE
+        else:
+            current_datetime = datetime.now()
+            dt_string = current_datetime.strftime("%d/%m/%Y %H:%M:%S")
+            folder_uid = uuid.uuid4()
+            folder_name = f"{self.MIGRATION_FOLDER_TITLE} - {dt_string}"
         folder_uid_string = str(folder_uid)
-        folder_name = f"Migrated Dashboards - {dt_string}"
         request_json = {"title": folder_name, "uid": folder_uid_string}
-        response = requests.post(
+        response = self._session.post(
             create_folder_url, data=json.dumps(request_json), headers=self._api_headers
         )
         if response.status_code != 200:
             self._logger.error(f"Error creating dashboards folder: {response.content}")
+            if self._deterministic_uids:
+                # Every dashboard would be posted to a folder that does not exist
+                response.raise_for_status()
         else:
+            self._created_folders.add(folder_uid_string)
             self._logger.debug(
                 f"Successfully created migration folder in grafana, with name: {folder_name}"
             )
@@ -1,11 +1,27 @@
 import builtins
 import json
 import types
-from typing import Tuple, Union
+from typing import List, Optional, Tuple, Union
 import uuid
-import requests
 
+from common.concurrency import ordered_map
+from common.grafana_http import GrafanaHttpClient
 from ..exporter import Exporter
+from ..folder_index import FolderIndex
+
+
+class _FolderNode:
+    """A folder of the configured structure, uid is set once it is found or created"""
+
+    def __init__(self, title: str, parent: Optional["_FolderNode"]):
+        self.title = title
+        self.parent = parent
+        self.children: List["_FolderNode"] = []
+        self.uid = None
+
+    @property
+    def parent_uid(self):
+        return self.parent.uid if self.parent else None
 
 
 class GrafanaFoldersExporter(Exporter):
@@ -25,9 +41,19 @@ class GrafanaFoldersExporter(Exporter):
                 "Cache-Control": "no-cache",
                 "User-Agent": None,
             }
+            self.organization_id = params.get("org_id", 1)
+            self._concurrency = max(int(params.get("concurrency", 1)), 1)
             self._last_folder = None
         except KeyError as e:
             raise ValueError(str(e))
+        self._session = GrafanaHttpClient(self._concurrency)
+        self._folder_index = FolderIndex(
+            self._session,
+            self._api_endpoint,
+            self._api_headers,
+            self.organization_id,
+            verify=False,
+        )
 
     def create_folder(self, folder_uid, folder_title, parent_uid=None):
         create_folder_url = self._api_endpoint + "/folders"
@@ -39,7 +65,7 @@ class GrafanaFoldersExporter(Exporter):
             "parentUid": parent_uid,
         }
 
-        response = requests.post(
+        response = self._session.post(
             create_folder_url,
             data=json.dumps(request_json),
             headers=self._api_headers,
@@ -47,44 +73,17 @@ class GrafanaFoldersExporter(Exporter):
         )
 
         response.raise_for_status()
+        return response.json().get("id")
 
     def folder_by_name(
         self, name, parent_folder_uid=None
     ) -> Union[Tuple[int, str], Tuple[None, None]]:
-        res = requests.get(
-            f"{self._api_endpoint}/folders?orgId={self.organization_id}{'&parentUid=' + parent_folder_uid if parent_folder_uid else ''}",
-            headers=self._api_headers,
-            verify=False,
-        )
-        res.raise_for_status()
-
-        folders = res.json()
+        return self._folder_index.folder_by_name(name, parent_folder_uid)
 
-        for f in folders:
-            if f["title"] == name:
-                return f["id"], f["uid"]
-        return None, None
-
-    def process_folder_structure(self, structure=None, prev_id=None):
-        if structure is None:
-            structure = self._folder_structure
-        elif structure is {}:
-            return
+    def _structure_nodes(self, structure, parent=None) -> List[_FolderNode]:
+        nodes = []
         for folder_title, children in structure.items():
-            _id, uid = self.folder_by_name(folder_title, prev_id)
-            if uid is None and not folder_title == "General":
-                _id, uid = self.folder_by_name(folder_title, prev_id)
-                if uid is None:
-                    uid = str(uuid.uuid4())
-                    self.create_folder(uid, folder_title, prev_id)
-                    self._logger.info(f"Created folder {folder_title} - {uid}")
-            else:
-                self._logger.info(
-                    f"Skipping creation of {folder_title} - {uid} - already exists"
-                )
-
-            self._last_folder = uid
-
+            node = _FolderNode(folder_title, parent)
             match type(children):
                 case builtins.str:
                     children = {children: {}}
@@ -92,12 +91,55 @@ class GrafanaFoldersExporter(Exporter):
                     # valid case
                     pass
                 case types.NoneType:
-                    continue
+                    children = {}
                 case _:
                     raise ValueError(
                         f"Invalid structure object {str(children)} of type {type(children)}"
                     )
-            self.process_folder_structure(structure=children, prev_id=uid)
+            node.children = self._structure_nodes(children, node)
+            nodes.append(node)
+        return nodes
+
+    def process_folder_structure(self):
+        """Creates the missing folders of the structure one level at a time. The
+        existing folders of every parent are listed once, siblings are created in
+        parallel."""
+        # The structure is validated before any folder is created
+        nodes = self._structure_nodes(self._folder_structure)
+        level = nodes
+        while level:
+            parent_uids = list(dict.fromkeys(node.parent_uid for node in level))
+            for _ in ordered_map(
+                self._folder_index.children, parent_uids, self._concurrency
+            ):
+                pass
+
+            missing = []
+            for node in level:
+                _id, node.uid = self.folder_by_name(node.title, node.parent_uid)
+                if node.uid is None and not node.title == "General":
+                    node.uid = str(uuid.uuid4())
+                    missing.append(node)
+                else:
+                    self._logger.info(
+                        f"Skipping creation of {node.title} - {node.uid} - already exists"
+                    )
+
+            created = ordered_map(
+                lambda node: self.create_folder(node.uid, node.title, node.parent_uid),
+                missing,
+                self._concurrency,
+            )
+            for node, folder_id in zip(missing, created):
+                self._folder_index.add(node.parent_uid, node.title, folder_id, node.uid)
+                self._logger.info(f"Created folder {node.title} - {node.uid}")
+
+            level = [child for node in level for child in node.children]
+
+        # The last folder of the structure, in the order it is written
+        while nodes:
+            self._last_folder = nodes[-1].uid
+            nodes = nodes[-1].children
 
     # Creates dashboard in grafana
     def export_dashboards(self, _dashboards, folders):
@@ -0,0 +1,62 @@
+import logging
+
+import pytest
+
+from benchmarks.fake_grafana import FakeGrafana
+from .grafana_folders_exporter import GrafanaFoldersExporter
+
+STRUCTURE = {
+    "Team A": {"Services": {"api": None, "db": "replicas"}, "Infra": None},
+    "General": {"Shared": None},
+    "Team B": "Alerts",
+}
+
+
+def export(grafana, structure, concurrency=4):
+    shared_state = {"EXPORTERS_SHARED_STATE": {}}
+    exporter = GrafanaFoldersExporter(
+        {
+            "endpoint": f"{grafana.endpoint}/api",
+            "auth_header": {"key": "Authorization", "value": "Bearer b"},
+            "folder_structure": structure,
+            "last_folder_into_shared_state": True,
+            "concurrency": concurrency,
+        },
+        shared_state,
+        logging.WARNING,
+    )
+    exporter.export_dashboards([], {})
+    return shared_state["EXPORTERS_SHARED_STATE"]["last_parent_uid"]
+
+
+def test_creates_missing_folders_once():
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+        last_parent_uid = export(grafana, STRUCTURE)
+        titles = {f["uid"]: f["title"] for f in grafana.folders}
+        tree = {(f["title"], titles.get(f["parentUid"])) for f in grafana.folders}
+        assert tree == {
+            ("Team A", None),
+            ("Services", "Team A"),
+            ("api", "Services"),
+            ("db", "Services"),
+            ("replicas", "db"),
+            ("Infra", "Team A"),
+            # Children of a missing General folder go to the root
+            ("Shared", None),
+            ("Team B", None),
+            ("Alerts", "Team B"),
+        }
+        assert titles[last_parent_uid] == "Alerts"
+
+        # Existing folders are listed, not created again
+        grafana.requests_by_path.clear()
+        assert export(grafana, STRUCTURE) == last_parent_uid
+        assert len(grafana.folders) == 9
+        assert grafana.requests_by_path == {"GET /api/folders": 5}
+
+
+def test_invalid_structure_creates_nothing():
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+        with pytest.raises(ValueError):
+            export(grafana, {"Team A": None, "Team B": {"Services": 1}})
+        assert grafana.folders == []
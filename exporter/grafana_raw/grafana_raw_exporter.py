@@ -2,9 +2,12 @@ import json
 import logging
 from typing import Tuple, Union
 import uuid
-import requests
 
+from common.grafana_http import GrafanaHttpClient
+from ..dashboard_upload import post_dashboards
+from ..export_ledger import ExportLedger, deterministic_uid
 from ..exporter import Exporter
+from ..folder_index import FolderIndex
 
 
 class GrafanaRawExporter(Exporter):
@@ -34,8 +37,31 @@ class GrafanaRawExporter(Exporter):
             }
             self.organization_id = params.get("org_id", 1)
             self.folder_suffix = params["folder_suffix"]
+            self._concurrency = max(int(params.get("concurrency", 1)), 1)
+            self._deterministic_uids = params.get("deterministic_uids", False)
+            self._ledger = None
+            if params.get("export_ledger_file"):
+                if not self._deterministic_uids:
+                    raise ValueError("export_ledger_file requires deterministic_uids")
+                self._ledger = ExportLedger(
+                    params["export_ledger_file"],
+                    self._api_endpoint,
+                    self.organization_id,
+                )
         except KeyError as e:
             raise ValueError(str(e))
+        self._session = GrafanaHttpClient(self._concurrency)
+        # Uids of the folders created by this exporter
+        self._created_folders = set()
+        self._folder_index = FolderIndex(
+            self._session,
+            self._api_endpoint,
+            self._api_headers,
+            self.organization_id,
+            verify=False,
+        )
+        # UploadResult of every dashboard Grafana did not save
+        self.failed_dashboards = []
 
     def create_folder(self, folder_uid, folders):
         create_folder_url = self._api_endpoint + "/folders"
@@ -48,7 +74,7 @@ class GrafanaRawExporter(Exporter):
         if self._parent_folder_uid():
             request_json["parentUid"] = self._parent_folder_uid()
 
-        response = requests.post(
+        response = self._session.post(
             create_folder_url,
             data=json.dumps(request_json),
             headers=self._api_headers,
@@ -56,62 +82,79 @@ class GrafanaRawExporter(Exporter):
         )
 
         response.raise_for_status()
+        self._created_folders.add(folder_uid_string)
+        self._folder_index.add(
+            self._parent_folder_uid(),
+            request_json["title"],
+            response.json().get("id"),
+            folder_uid_string,
+        )
 
     def folder_by_name(
         self, name, parent_folder_uid=None
     ) -> Union[Tuple[int, str], Tuple[None, None]]:
-        res = requests.get(
-            f"{self._api_endpoint}/folders?orgId={self.organization_id}{'&parentUid=' + parent_folder_uid if parent_folder_uid else ''}",
-            headers=self._api_headers,
-            verify=False,
-        )
-        res.raise_for_status()
-
-        folders = res.json()
-
-        for f in folders:
-            if f["title"] == name:
-                return f["id"], f["uid"]
-        return None, None
+        return self._folder_index.folder_by_name(name, parent_folder_uid)
 
     # Creates dashboard in grafana
     def export_dashboards(self, dashboards, _folders):
-        for dashboard in dashboards:
-            folder_title = ""
-            if "meta" in dashboard:
-                folder_title = dashboard["meta"]["folderTitle"]
-                dashboard = dashboard["dashboard"]
-            dashboard["id"] = "null"
-            dashboard["uid"] = str(uuid.uuid4())
-
-            _id, uid = self.folder_by_name(
-                f"{folder_title}{self.folder_suffix}", self._parent_folder_uid()
+        # Folders are resolved, and created, before any dashboard is posted
+        payloads = [self.dashboard_payload(dashboard) for dashboard in dashboards]
+        if self._ledger:
+            payloads = self._ledger.changed(payloads, self._created_folders)
+            self._logger.info(
+                f"Skipping {len(dashboards) - len(payloads)} unchanged dashboards"
             )
-            if uid is None and not f"{folder_title}{self.folder_suffix}" == "General":
-                _id, uid = self.folder_by_name(
-                    f"{folder_title}{self.folder_suffix}", self._parent_folder_uid()
+        for result in post_dashboards(
+            self._session,
+            self._api_endpoint,
+            self._api_headers,
+            payloads,
+            self._concurrency,
+            verify=False,
+        ):
+            if result.error:
+                self._logger.error(
+                    f"Error creating dashboard {result.title}: {result.error}"
                 )
-                if uid is None:
-                    uid = str(uuid.uuid4())
-                    self.create_folder(uid, {uid: folder_title})
+                self.failed_dashboards.append(result)
+            else:
+                self._logger.debug(f"Successfully exported dashboard: {result.title}")
+                if self._ledger:
+                    self._ledger.record(result.uid)
+        if self._ledger:
+            self._ledger.save()
+        if self.failed_dashboards:
+            self._logger.error(
+                f"Failed to export {len(self.failed_dashboards)} dashboards"
+            )
 
-            dashboard_json = {
-                "dashboard": dashboard,
-                "folderUid": str(uid) if uid is not None else self._parent_folder_uid(),
-                "overwrite": True,
-            }
+    def dashboard_payload(self, dashboard) -> dict:
+        folder_title = ""
+        if "meta" in dashboard:
+            folder_title = dashboard["meta"]["folderTitle"]
+            dashboard = dashboard["dashboard"]
+        # Later exporters get the source dashboard, with its source uid
+        dashboard = {**dashboard, "id": "null"}
+        if self._deterministic_uids:
+            dashboard["uid"] = deterministic_uid(self.organization_id, dashboard["uid"])
+        else:
+            dashboard["uid"] = str(uuid.uuid4())
 
-            response = requests.post(
-                self._api_endpoint + "/dashboards/db",
-                data=json.dumps(dashboard_json),
-                headers=self._api_headers,
-                verify=False,
-            )
-            if response.status_code != 200:
-                self._logger.error(
-                    f"Error creating dashboard {dashboard['title']}: {response.content}"
+        _id, uid = self.folder_by_name(
+            f"{folder_title}{self.folder_suffix}", self._parent_folder_uid()
+        )
+        if uid is None and not f"{folder_title}{self.folder_suffix}" == "General":
+            if self._deterministic_uids:
+                uid = deterministic_uid(
+                    self.organization_id,
+                    f"{self._parent_folder_uid()}/{folder_title}{self.folder_suffix}",
                 )
             else:
-                self._logger.debug(
-                    f"Successfully exported dashboard: {dashboard['title']}"
-                )
+                uid = str(uuid.uuid4())
+            self.create_folder(uid, {uid: folder_title})
+
+        return {
+            "dashboard": dashboard,
+            "folderUid": str(uid) if uid is not None else self._parent_folder_uid(),
+            "overwrite": True,
+        }
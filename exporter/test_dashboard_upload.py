@@ -0,0 +1,61 @@
+import logging
+
+from benchmarks.fake_grafana import FakeGrafana, make_dashboard
+from common.grafana_http import GrafanaHttpClient
+from exporter.grafana.grafana_exporter import GrafanaExporter
+from .dashboard_upload import post_dashboards
+from .export_ledger import deterministic_uid
+
+
+def payload(uid):
+    return {"dashboard": {"uid": uid, "title": f"Dashboard {uid}"}, "overwrite": True}
+
+
+def test_post_dashboards_reports_failures_in_order():
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+        grafana.failing_uids = {"b", "d"}
+        results = list(
+            post_dashboards(
+                GrafanaHttpClient(4),
+                f"{grafana.endpoint}/api",
+                {},
+                [payload(uid) for uid in "abcde"],
+                4,
+            )
+        )
+
+        assert [result.uid for result in results] == list("abcde")
+        assert [result.uid for result in results if result.error] == ["b", "d"]
+        assert set(grafana.saved_dashboards) == {"a", "c", "e"}
+
+
+def test_post_dashboards_reports_connection_errors():
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+        endpoint = f"{grafana.endpoint}/api"
+    # The server is gone
+    client = GrafanaHttpClient(retries=0)
+    (result,) = post_dashboards(client, endpoint, {}, [payload("a")], 1)
+
+    assert result.uid == "a"
+    assert result.error
+
+
+def test_exporter_keeps_failed_dashboards():
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+        grafana.failing_uids = {deterministic_uid(1, "b")}
+        exporter = GrafanaExporter(
+            {
+                "endpoint": f"{grafana.endpoint}/api",
+                "auth_header": {"key": "Authorization", "value": "Bearer b"},
+                "deterministic_uids": True,
+                "concurrency": 4,
+            },
+            {},
+            logging.CRITICAL,
+        )
+        exporter.export_dashboards([make_dashboard(uid) for uid in "abc"], {})
+
+        assert [result.title for result in exporter.failed_dashboards] == [
+            "Dashboard b"
+        ]
+        assert len(grafana.saved_dashboards) == 2
@@ -0,0 +1,134 @@
+import logging
+
+import pytest
+
+from benchmarks.fake_grafana import FakeGrafana, make_dashboard
+from exporter.grafana.grafana_exporter import GrafanaExporter
+from exporter.grafana_raw.grafana_raw_exporter import GrafanaRawExporter
+from .export_ledger import ExportLedger, deterministic_uid
+
+
+def payload(uid, title):
+    return {"dashboard": {"uid": uid, "title": title}, "overwrite": True}
+
+
+def test_ledger_skips_saved_payloads(tmp_path):
+    path = tmp_path / "ledger.json"
+    ledger = ExportLedger(path, "http://grafana/api", 1)
+    assert len(ledger.changed([payload("a", "A"), payload("b", "B")])) == 2
+    # Only a was saved
+    ledger.record("a")
+    ledger.save()
+
+    ledger = ExportLedger(path, "http://grafana/api", 1)
+    changed = ledger.changed([payload("a", "A"), payload("b", "B")])
+    assert [p["dashboard"]["uid"] for p in changed] == ["b"]
+    assert ledger.changed([payload("a", "A2")]) == [payload("a", "A2")]
+    # Ledgers of another org are ignored
+    assert len(ExportLedger(path, "http://grafana/api", 2).changed([payload("a", "A")]))
+    # Payloads going into a folder created by the run are posted again
+    created = {**payload("a", "A"), "folderUid": "f"}
+    ledger.changed([created])
+    ledger.record("a")
+    assert ledger.changed([created]) == []
+    assert ledger.changed([created], {"f"}) == [created]
+
+
+def test_deterministic_uid():
+    assert deterministic_uid(1, "abc") == deterministic_uid(1, "abc")
+    assert deterministic_uid(1, "abc") != deterministic_uid(2, "abc")
+
+
+def test_grafana_exporter_reruns_upload_changed_dashboards(tmp_path):
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+
+        def export(dashboards):
+            grafana.requests_by_path.clear()
+            exporter = GrafanaExporter(
+                {
+                    "endpoint": f"{grafana.endpoint}/api",
+                    "auth_header": {"key": "Authorization", "value": "Bearer b"},
+                    "deterministic_uids": True,
+                    "export_ledger_file": str(tmp_path / "ledger.json"),
+                },
+                {},
+                logging.WARNING,
+            )
+            exporter.export_dashboards(dashboards, {})
+            return grafana.requests_by_path["POST /api/dashboards/db"]
+
+        dashboards = [make_dashboard("a"), make_dashboard("b")]
+        assert export(dashboards) == 2
+        # The source dashboards keep their uids for the next exporters and runs
+        assert [d["dashboard"]["uid"] for d in dashboards] == ["a", "b"]
+        assert export(dashboards) == 0
+        changed = make_dashboard("b")
+        changed["dashboard"]["title"] = "Renamed"
+        assert export([make_dashboard("a"), changed]) == 1
+
+        # Every run wrote to the same dashboards and migration folder
+        assert set(grafana.saved_dashboards) == {
+            deterministic_uid(1, "a"),
+            deterministic_uid(1, "b"),
+        }
+        assert len(grafana.folders) == 1
+
+
+def test_grafana_exporter_reuses_migration_folder_with_another_uid():
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+        grafana.folders.append(
+            {
+                "id": 1,
+                "uid": "manual",
+                "title": "Migrated Dashboards",
+                "parentUid": None,
+            }
+        )
+        exporter = GrafanaExporter(
+            {
+                "endpoint": f"{grafana.endpoint}/api",
+                "auth_header": {"key": "Authorization", "value": "Bearer b"},
+                "deterministic_uids": True,
+            },
+            {},
+            logging.WARNING,
+        )
+        exporter.export_dashboards([make_dashboard("a")], {})
+
+        assert len(grafana.folders) == 1
+        assert (
+            grafana.saved_dashboards[deterministic_uid(1, "a")]["folderUid"] == "manual"
+        )
+
+
+@pytest.mark.parametrize(
+    "exporter_class, params",
+    [(GrafanaExporter, {}), (GrafanaRawExporter, {"folder_suffix": " Migrated"})],
+)
+def test_rerun_uploads_into_deleted_folder(tmp_path, exporter_class, params):
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+
+        def export():
+            grafana.requests_by_path.clear()
+            exporter = exporter_class(
+                {
+                    "endpoint": f"{grafana.endpoint}/api",
+                    "auth_header": {"key": "Authorization", "value": "Bearer b"},
+                    "deterministic_uids": True,
+                    "export_ledger_file": str(tmp_path / "ledger.json"),
+                    **params,
+                },
+                {"EXPORTERS_SHARED_STATE": {}},
+                logging.WARNING,
+            )
+            exporter.export_dashboards([make_dashboard("a"), make_dashboard("b")], {})
+            return grafana.requests_by_path["POST /api/dashboards/db"]
+
+        assert export() == 2
+        assert export() == 0
+        # The folder, and its dashboards, were deleted in Grafana
+        grafana.folders.clear()
+        grafana.saved_dashboards.clear()
+        assert export() == 2
+        assert len(grafana.saved_dashboards) == 2
+        assert len(grafana.folders) == 1
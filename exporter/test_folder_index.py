@@ -0,0 +1,52 @@
+import pytest
+import requests
+
+from benchmarks.fake_grafana import FakeGrafana
+from common.grafana_http import GrafanaHttpClient
+from .folder_index import FOLDERS_PAGE_SIZE, FolderIndex
+
+
+@pytest.mark.parametrize("count", [FOLDERS_PAGE_SIZE, FOLDERS_PAGE_SIZE + 1])
+def test_children_are_listed_once_across_pages(count):
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+        grafana.folders = [
+            {"id": i, "uid": f"uid-{i}", "title": f"Folder {i}", "parentUid": None}
+            for i in range(count)
+        ]
+        index = FolderIndex(GrafanaHttpClient(), f"{grafana.endpoint}/api", {}, 1)
+
+        assert len(index.children(None)) == count
+        assert index.folder_by_name(f"Folder {count - 1}") == (
+            count - 1,
+            f"uid-{count - 1}",
+        )
+        index.add(None, "New", 5000, "new")
+        assert index.folder_by_name("New") == (5000, "new")
+        assert index.children("new") == {}
+        # A full page is followed by an empty or partial one
+        assert grafana.requests_by_path["GET /api/folders"] == 2
+
+
+def test_unknown_folder():
+    with FakeGrafana(dashboards=0, latency=0) as grafana:
+        index = FolderIndex(GrafanaHttpClient(), f"{grafana.endpoint}/api", {}, 1)
+        assert index.folder_by_name("Missing", "parent") == (None, None)
+
+
+class RecordingSession:
+    def __init__(self):
+        self.verify = []
+
+    def get(self, url, **kwargs):
+        self.verify.append(kwargs["verify"])
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b"[]"
+        return response
+
+
+@pytest.mark.parametrize("params, verify", [({}, True), ({"verify": False}, False)])
+def test_tls_verification(params, verify):
+    session = RecordingSession()
+    FolderIndex(session, "http://grafana/api", {}, 1, **params).children(None)
+    assert session.verify == [verify]
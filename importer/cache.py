@@ -1,17 +1,53 @@
+from hashlib import sha256
+import json
+import logging
+import lzma
+import os
 from pathlib import Path
-from pickle import Pickler, Unpickler
+import pickle
 import sys
+import threading
+import time
+import zlib
+
+from common.cache_codecs import get_codec
+
+CORRUPTED_CACHE_ERRORS = (
+    ValueError,
+    TypeError,
+    EOFError,
+    OSError,
+    pickle.UnpicklingError,
+    zlib.error,
+    lzma.LZMAError,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def _is_expired(created, max_age) -> bool:
+    return max_age is not None and time.time() - created > max_age
 
 
 class GeneralCache:
-    PROTOCOL_VERSION = 4
+    # Every cache file starts with MAGIC followed by a JSON header line with the codec,
+    # the cache key and the creation time. Files without it were written by older
+    # versions and are ignored
+    MAGIC = b"influxql-to-promql-cache 2\n"
 
-    def __init__(self, correctness_check, filepath=".cache"):
+    def __init__(
+        self, correctness_check, filepath=".cache", codec="pickle", key="", max_age=None
+    ):
         self._cache_file = Path(filepath).resolve()
         p = self._cache_file.parent
         if p.exists() is False:
             p.mkdir(parents=True)
         self._check = correctness_check
+        self._codec = get_codec(codec)
+        self._key = key
+        self._max_age = max_age
+        self._objects = None
 
     def _valid_objects(self, objects: list):
         return self._check(objects)
@@ -19,35 +55,189 @@ class GeneralCache:
     def cache_available(self) -> bool:
         if self._cache_file.is_file():
             try:
-                objects = self._unpickle()
-            except (TypeError, EOFError):
+                self._objects = self._read()
+            except CORRUPTED_CACHE_ERRORS:
                 return False
-            return self._valid_objects(objects)
+            return self._objects is not None and self._valid_objects(self._objects)
         return False
 
-    def _unpickle(self) -> list:
-        unpickler = Unpickler(self._cache_file.open("rb"))
-        return unpickler.load()
+    def _read(self):
+        """Returns the cached objects or None when the key differs or the cache expired."""
+        with self._cache_file.open("rb") as f:
+            if f.readline() != self.MAGIC:
+                raise ValueError(f"{self._cache_file} has no cache header")
+            header = json.loads(f.readline())
+            if header["key"] != self._key:
+                logger.warning(
+                    f"{self._cache_file} was built for a different source or version, refreshing"
+                )
+                return None
+            if _is_expired(header["created"], self._max_age):
+                logger.info(f"{self._cache_file} is older than max age, refreshing")
+                return None
+            return get_codec(header["codec"]).decode(f.read())
 
     def load(self) -> list:
         sys.stderr.write(
             f"!!!! Using {self.__class__.__name__} from {self._cache_file.resolve()} !!!!\n"
         )
         sys.stderr.flush()
-        return self._unpickle()
+        # Reuse objects already decoded by cache_available()
+        objects, self._objects = self._objects, None
+        return objects if objects is not None else self._read()
 
     def save(self, objects: list) -> bool:
-        pickler = Pickler(self._cache_file.open("wb"), self.PROTOCOL_VERSION)
         if self._valid_objects(objects):
-            pickler.dump(objects)
+            header = {
+                "codec": self._codec.name,
+                "key": self._key,
+                "created": time.time(),
+            }
+            with self._cache_file.open("wb") as f:
+                f.write(self.MAGIC)
+                f.write(json.dumps(header).encode() + b"\n")
+                f.write(self._codec.encode(objects))
             return True
         else:
             raise ValueError("Invalid objects passed to cache")
 
 
-class DashboardsCache(GeneralCache):
-    def __init__(self, filepath=".dashboards-cache"):
-        super().__init__(self._valid_dashboards, filepath=filepath)
+class DashboardsCache:
+    """Directory backed dashboards cache.
+
+    Every dashboard is kept as an object named after the sha256 of its content and
+    encoded with the configured codec. manifest.json maps dashboard uid to that digest
+    and codec together with the version/updated fields and the time it was fetched, so
+    the cache can be validated and diffed against Grafana without reading any dashboard
+    payload. The manifest also records the cache key, see GeneralCache."""
+
+    MANIFEST_VERSION = 3
+
+    def __init__(
+        self, filepath=".dashboards-cache", codec="json+zlib", key="", max_age=None
+    ):
+        self._path = Path(filepath).resolve()
+        self._codec = get_codec(codec)
+        self._key = key
+        self._max_age = max_age
+        self._objects_dir = self._path / "objects"
+        self._manifest_file = self._path / "manifest.json"
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest(self) -> dict:
+        if self._manifest is None:
+            self._manifest = self._read_manifest()
+        return self._manifest
+
+    def _read_manifest(self) -> dict:
+        try:
+            manifest = json.loads(self._manifest_file.read_text())
+        except (OSError, ValueError):
+            return {}
+        if manifest.get("version") != self.MANIFEST_VERSION:
+            return {}
+        if manifest["key"] != self._key:
+            logger.warning(
+                f"{self._path} was built for a different source or version, refreshing"
+            )
+            return {}
+        return manifest["entries"]
+
+    def _object_file(self, entry) -> Path:
+        return self._objects_dir / f"{entry['digest']}.{entry['codec']}"
+
+    def cache_available(self, allow_stale=False) -> bool:
+        """With `allow_stale` entries older than max age do not invalidate the cache,
+        the caller is expected to refresh them one by one (see is_stale())."""
+        try:
+            if not self.manifest or not all(
+                get_codec(entry["codec"]) and self._object_file(entry).is_file()
+                for entry in self.manifest.values()
+            ):
+                return False
+        except (KeyError, ValueError):
+            return False
+        if not allow_stale and any(map(self.is_stale, self.manifest)):
+            logger.info(f"{self._path} has entries older than max age, refreshing")
+            return False
+        return True
+
+    def is_stale(self, uid) -> bool:
+        return _is_expired(self.manifest[uid]["fetched"], self._max_age)
+
+    def get(self, uid) -> dict:
+        entry = self.manifest[uid]
+        return get_codec(entry["codec"]).decode(self._object_file(entry).read_bytes())
+
+    def load(self, uids=None) -> list:
+        """Loads cached dashboards, only the ones listed in `uids` if given."""
+        sys.stderr.write(
+            f"!!!! Using {self.__class__.__name__} from {self._path} !!!!\n"
+        )
+        sys.stderr.flush()
+        return [self.get(uid) for uid in self.manifest if not uids or uid in uids]
+
+    def put(self, dashboard: dict) -> None:
+        """Stores a single dashboard, call flush() to persist the manifest."""
+        digest = sha256(json.dumps(dashboard, sort_keys=True).encode()).hexdigest()
+        entry = {"digest": digest, "codec": self._codec.name}
+        object_file = self._object_file(entry)
+        if not object_file.is_file():
+            self._prepare_directory()
+            tmp_file = object_file.with_name(
+                f"{object_file.name}.{threading.get_ident()}"
+            )
+            tmp_file.write_bytes(self._codec.encode(dashboard))
+            os.replace(tmp_file, object_file)
+        with self._lock:
+            self.manifest[dashboard["dashboard"]["uid"]] = {
+                **entry,
+                "title": dashboard["dashboard"].get("title"),
+                "version": dashboard["dashboard"].get("version"),
+                "updated": dashboard.get("meta", {}).get("updated"),
+                "fetched": time.time(),
+            }
+
+    def remove(self, uid) -> None:
+        with self._lock:
+            self.manifest.pop(uid, None)
+
+    def flush(self) -> None:
+        """Writes the manifest and deletes objects no longer referenced by it."""
+        self._prepare_directory()
+        tmp_file = self._manifest_file.with_suffix(".tmp")
+        tmp_file.write_text(
+            json.dumps(
+                {
+                    "version": self.MANIFEST_VERSION,
+                    "key": self._key,
+                    "entries": self.manifest,
+                }
+            )
+        )
+        os.replace(tmp_file, self._manifest_file)
+
+        referenced = {self._object_file(e) for e in self.manifest.values()}
+        for object_file in self._objects_dir.iterdir():
+            if object_file not in referenced:
+                object_file.unlink()
+
+    def save(self, dashboards: list) -> bool:
+        if not self._valid_dashboards(dashboards):
+            raise ValueError("Invalid objects passed to cache")
+        self._manifest = {}
+        for dashboard in dashboards:
+            self.put(dashboard)
+        self.flush()
+        return True
+
+    def _prepare_directory(self):
+        if self._path.is_file():
+            # Monolithic pickle written by older versions
+            self._path.unlink(missing_ok=True)
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
 
     def _valid_dashboards(self, dashboards: list):
         return isinstance(dashboards, list) and dashboards
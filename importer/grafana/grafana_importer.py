@@ -1,12 +1,18 @@
+from hashlib import sha256
+import json
 import logging
 
 from ..importer import Importer
-from ..cache import DashboardsCache, GeneralCache
-import json
+from ..cache import CORRUPTED_CACHE_ERRORS, DashboardsCache, GeneralCache
 import requests
 
+from common.concurrency import ordered_map
+from common.grafana_http import GrafanaHttpClient
+from common.version import VERSION
+
 
 class GrafanaImporter(Importer):
+    SEARCH_PAGE_SIZE = 1000
     API_HEADERS = {
         "Authorization": "",
         "Content-Type": "application/json",
@@ -30,33 +36,80 @@ class GrafanaImporter(Importer):
                 )
 
             self._use_switch_org_api = params.get("use_switch_org_api", True)
+            self._concurrency = max(int(params.get("concurrency", 1)), 1)
+            self._incremental_cache = params.get("incremental_cache", False)
 
             if cache_file := params.get("cache_file", None):
-                self._cache = DashboardsCache(cache_file)
+                cache_params = {
+                    "key": self._cache_key(),
+                    "max_age": self._max_age_seconds(params.get("cache_max_age")),
+                }
+                if cache_codec := params.get("cache_codec"):
+                    cache_params["codec"] = cache_codec
+                self._cache = DashboardsCache(cache_file, **cache_params)
                 self._folders_cache = GeneralCache(
-                    lambda x: isinstance(x, dict) and x, f"{cache_file}.folders"
+                    lambda x: isinstance(x, dict) and x,
+                    f"{cache_file}.folders",
+                    **cache_params,
                 )
                 self._datasources_cache = GeneralCache(
-                    lambda x: isinstance(x, dict) and x, f"{cache_file}.datasources"
+                    lambda x: isinstance(x, dict) and x,
+                    f"{cache_file}.datasources",
+                    **cache_params,
                 )
             else:
                 self._cache = None
                 self._folders_cache = None
                 self._datasources_cache = None
 
-            self.requests = requests.Session()
+            # Retries throttled requests, the search pagination runs alongside the workers
+            self.requests = GrafanaHttpClient(self._concurrency + 1)
         except KeyError as e:
             raise ValueError(str(e))
 
     def fetch_dashboards(self):
         raise NotImplementedError
 
+    def _cache_key(self) -> str:
+        """Caches built for another endpoint, org, filter or converter version are not reused"""
+        return sha256(
+            json.dumps(
+                [
+                    self._grafana_endpoint,
+                    str(self._organization_id),
+                    sorted(self.uid_filter_list or []),
+                    VERSION,
+                ]
+            ).encode()
+        ).hexdigest()
+
+    @staticmethod
+    def _max_age_seconds(max_age) -> int:
+        """Accepts plain seconds or a number with s/m/h/d/w suffix"""
+        if max_age is None or isinstance(max_age, (int, float)):
+            return max_age
+        units = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+        try:
+            if max_age[-1] in units:
+                return int(max_age[:-1]) * units[max_age[-1]]
+            return int(max_age)
+        except (ValueError, IndexError):
+            raise ValueError(f"Invalid cache_max_age {max_age!r}")
+
     def should_be_filtered_out(self, uid):
         return self.uid_filter_list and uid not in self.uid_filter_list
 
     def fetch_dashboards_and_folders(self, no_cache: bool = False):
-        if not no_cache and self._cache and self._cache.cache_available():
-            dashboards = self._cache.load()
+        if (
+            not no_cache
+            and self._cache
+            and self._cache.cache_available(allow_stale=self._incremental_cache)
+        ):
+            if self._incremental_cache:
+                dashboards = self._build_dashboards_list(cache=self._cache)
+                self._cache.flush()
+            else:
+                dashboards = self._cache.load(self.uid_filter_list)
         else:
             dashboards = self._build_dashboards_list()
             self._cache and self._cache.save(dashboards)
@@ -116,13 +169,46 @@ class GrafanaImporter(Importer):
 
         return datasources
 
-    def _extract_dashboard_uids(self, response):
-        response_json = json.loads(response.content)
-        uid_list = []
-        for dashboard in response_json:
-            if dashboard["type"] == "dash-db":
-                uid_list.append(dashboard.get("uid"))
-        return uid_list
+    def _search(self, **params):
+        """Yields /api/search hits page by page, so only one page is held in memory."""
+        page = 1
+        while True:
+            response = self.requests.get(
+                f"{self._grafana_endpoint}/api/search",
+                params={
+                    **params,
+                    "limit": self.SEARCH_PAGE_SIZE,
+                    "page": page,
+                    "orgId": self._organization_id,
+                },
+                headers=self.API_HEADERS,
+                verify=False,
+            )
+            response.raise_for_status()
+            hits = response.json()
+            yield from hits
+            if len(hits) < self.SEARCH_PAGE_SIZE:
+                return
+            page += 1
+
+    def _dashboard_hits(self):
+        for hit in self._search(type="dash-db"):
+            if hit["type"] == "dash-db" and not self.should_be_filtered_out(
+                hit.get("uid")
+            ):
+                yield hit
+
+    @staticmethod
+    def _is_unchanged(hit, cache_entry) -> bool:
+        """Compares the version/updated fields of a search hit with the cache manifest entry.
+        Hits carrying neither cannot be verified and count as changed."""
+        verified = False
+        for field in ("version", "updated"):
+            if field in hit:
+                if hit[field] != cache_entry.get(field):
+                    return False
+                verified = True
+        return verified
 
     def _switch_org(self):
         if not self._use_switch_org_api:
@@ -144,44 +230,77 @@ class GrafanaImporter(Importer):
             raise RuntimeError(f"Cannot switch organization to {self._organization_id}")
 
     # Builds list of dashboards from logzio grafana grafana
-    def _build_dashboards_list(self) -> list:
+    # When a `cache` is given, only new or changed dashboards are downloaded and stored
+    # into it, and dashboards no longer listed by the search are removed from it
+    def _build_dashboards_list(self, cache: DashboardsCache = None) -> list:
         self._switch_org()
 
-        response = self.requests.get(
-            f"{self._grafana_endpoint}/api/search?limit=5000&orgId={self._organization_id}",
-            headers=self.API_HEADERS,
-            verify=False,
-        )
+        manifest = dict(cache.manifest) if cache else {}
+
+        def fetch(hit):
+            uid = hit.get("uid")
+            if (
+                uid in manifest
+                and self._is_unchanged(hit, manifest[uid])
+                and not cache.is_stale(uid)
+            ):
+                try:
+                    return uid, cache.get(uid), True
+                except CORRUPTED_CACHE_ERRORS as e:
+                    self._logger.warning(
+                        f"Cached dashboard {uid} is unreadable, fetching it: {e}"
+                    )
+            dashboard = self._fetch_dashboard(uid)
+            if cache and dashboard and "meta" in dashboard:
+                cache.put(dashboard)
+            return uid, dashboard, False
 
-        dashboards_uids = self._extract_dashboard_uids(response)
         dashboards = []
-        base_url = f'{self._grafana_endpoint}/api/dashboards/uid/{{uid}}?orgId={self._organization_id}"'
-        for i, uid in enumerate(dashboards_uids):
-            if self.should_be_filtered_out(uid):
+        listed = set()
+        failed = 0
+        reused = 0
+        for uid, dashboard, from_cache in ordered_map(
+            fetch, self._dashboard_hits(), self._concurrency
+        ):
+            listed.add(uid)
+            reused += from_cache
+            if dashboard is None:
+                failed += 1
                 continue
-            response = self.requests.get(
-                base_url.format(uid=uid),
-                headers=self.API_HEADERS,
-                verify=False,
-            )
-            dashboard = response.json()
             # Skip already migrated to allow conversion inside same grafana - DG
             if "meta" not in dashboard:
                 self._logger.critical(f"No meta in dashboard {uid}")
                 continue
             dashboards.append(dashboard)
+        if failed:
+            self._logger.error(f"Failed to fetch {failed} dashboards, skipped them")
+        if cache:
+            # Dashboards that failed to be fetched again keep their cache entry
+            dropped = manifest.keys() - listed
+            for uid in dropped:
+                cache.remove(uid)
+            self._logger.info(
+                f"Incremental cache: {reused} dashboards unchanged, "
+                f"{len(dashboards) - reused} fetched, {len(dropped)} dropped"
+            )
         return dashboards
 
+    def _fetch_dashboard(self, uid):
+        try:
+            response = self.requests.get(
+                f"{self._grafana_endpoint}/api/dashboards/uid/{uid}?orgId={self._organization_id}",
+                headers=self.API_HEADERS,
+                verify=False,
+            )
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            self._logger.error(f"Error fetching dashboard {uid}: {e}")
+            return None
+
     def _build_folder_list(self) -> dict:
         self._switch_org()
 
-        res = self.requests.get(
-            f"{self._grafana_endpoint}/api/search?type=folder-db&orgId={self._organization_id}",
-            headers=self.API_HEADERS,
-            verify=False,
-        )
-        res.raise_for_status()
-
-        folders = res.json()
-
-        return {folder["uid"]: folder["title"] for folder in folders}
+        return {
+            folder["uid"]: folder["title"] for folder in self._search(type="folder-db")
+        }
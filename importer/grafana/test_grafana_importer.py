@@ -0,0 +1,119 @@
+import logging
+import random
+import time
+
+import pytest
+
+from benchmarks.fake_grafana import FakeGrafana
+from common.grafana_http import GrafanaHttpClient
+from .grafana_importer import GrafanaImporter
+
+
+@pytest.fixture
+def grafana():
+    with FakeGrafana(dashboards=5, latency=0) as grafana:
+        yield grafana
+
+
+def importer(grafana, **params):
+    result = GrafanaImporter(
+        {
+            "endpoint": grafana.endpoint,
+            "api_token": "token",
+            "orgId": 1,
+            **params,
+        },
+        {},
+        logging.CRITICAL,
+    )
+    # Failing fetches are not waited for
+    result.requests = GrafanaHttpClient(result._concurrency + 1, backoff=0)
+    return result
+
+
+def fetched_uids(grafana) -> list:
+    prefix = "GET /api/dashboards/uid/"
+    return sorted(
+        path[len(prefix) :]
+        for path, count in grafana.requests_by_path.items()
+        for _ in range(count)
+        if path.startswith(prefix)
+    )
+
+
+def uids(dashboards) -> list:
+    return [d["dashboard"]["uid"] for d in dashboards]
+
+
+def test_incremental_cache(grafana, tmp_path):
+    params = {
+        "cache_file": str(tmp_path / "cache"),
+        "incremental_cache": True,
+        "concurrency": 2,
+    }
+    dashboards, _folders = importer(grafana, **params).fetch_dashboards_and_folders()
+    assert len(dashboards) == 5
+
+    grafana.requests_by_path.clear()
+    grafana.dashboards["uid-000001"]["dashboard"]["version"] = 2
+    del grafana.dashboards["uid-000002"]
+    grafana.dashboards["uid-000003"]["dashboard"]["version"] = 2
+    grafana.failing_uids.add("uid-000003")
+    dashboards, _folders = importer(grafana, **params).fetch_dashboards_and_folders()
+
+    # Unchanged dashboards come from the cache, the failed one is skipped
+    assert set(fetched_uids(grafana)) == {"uid-000001", "uid-000003"}
+    assert uids(dashboards) == ["uid-000000", "uid-000001", "uid-000004"]
+    assert dashboards[1]["dashboard"]["version"] == 2
+    # The deleted dashboard is dropped, the one that failed keeps its entry
+    cache = importer(grafana, **params)._cache
+    assert list(cache.manifest) == [
+        "uid-000000",
+        "uid-000001",
+        "uid-000003",
+        "uid-000004",
+    ]
+
+    # An unreadable cached object is fetched again, as is the changed dashboard whose
+    # fetch failed
+    cache._object_file(cache.manifest["uid-000000"]).write_bytes(b"corrupt")
+    grafana.failing_uids.clear()
+    grafana.requests_by_path.clear()
+    dashboards, _folders = importer(grafana, **params).fetch_dashboards_and_folders()
+    assert uids(dashboards) == [
+        "uid-000000",
+        "uid-000001",
+        "uid-000003",
+        "uid-000004",
+    ]
+    assert fetched_uids(grafana) == ["uid-000000", "uid-000003"]
+
+
+@pytest.mark.parametrize(
+    "count", [GrafanaImporter.SEARCH_PAGE_SIZE, GrafanaImporter.SEARCH_PAGE_SIZE + 1]
+)
+def test_search_pages(count):
+    with FakeGrafana(dashboards=count, latency=0) as grafana:
+        hits = list(importer(grafana)._dashboard_hits())
+
+        assert [hit["uid"] for hit in hits] == list(grafana.dashboards)
+        # A full page is followed by an empty or partial one
+        assert grafana.requests_by_path["GET /api/search"] == 2
+
+
+def test_concurrent_fetch_keeps_search_order():
+    with FakeGrafana(dashboards=30, latency=0) as grafana:
+        handle = grafana._handle
+
+        def slow_handle(method, path, query, body=None):
+            # Dashboards are fetched in random order
+            if path.startswith("/api/dashboards/uid/"):
+                time.sleep(random.uniform(0, 0.01))
+            return handle(method, path, query, body)
+
+        grafana._handle = slow_handle
+        dashboards, _folders = importer(
+            grafana, concurrency=8
+        ).fetch_dashboards_and_folders()
+
+        assert uids(dashboards) == list(grafana.dashboards)
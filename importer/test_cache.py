@@ -0,0 +1,83 @@
+import pickle
+
+import pytest
+from common.cache_codecs import available_codecs
+from .cache import DashboardsCache, GeneralCache
+
+
+def dashboard(uid, version=1):
+    return {
+        "dashboard": {"uid": uid, "title": f"Dashboard {uid}", "version": version},
+        "meta": {"updated": "2024-01-01T00:00:00Z"},
+    }
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = DashboardsCache(tmp_path / "dashboards")
+    c.save([dashboard("a"), dashboard("b"), dashboard("c")])
+    return DashboardsCache(tmp_path / "dashboards")
+
+
+def test_roundtrip(cache):
+    assert cache.cache_available()
+    assert [d["dashboard"]["uid"] for d in cache.load()] == ["a", "b", "c"]
+    assert [d["dashboard"]["uid"] for d in cache.load(["c", "a"])] == ["a", "c"]
+    assert cache.manifest["b"]["version"] == 1
+
+
+def test_single_entry_update(cache, tmp_path):
+    cache.put(dashboard("b", version=2))
+    cache.remove("c")
+    cache.flush()
+
+    reloaded = DashboardsCache(tmp_path / "dashboards")
+    assert list(reloaded.manifest) == ["a", "b"]
+    assert reloaded.get("b")["dashboard"]["version"] == 2
+    assert len(list((tmp_path / "dashboards" / "objects").iterdir())) == 2
+
+
+def test_legacy_pickle_is_replaced(tmp_path):
+    legacy = tmp_path / "dashboards"
+    legacy.write_bytes(b"pickled list")
+    c = DashboardsCache(legacy)
+    assert not c.cache_available()
+    c.save([dashboard("a")])
+    assert DashboardsCache(legacy).cache_available()
+
+
+@pytest.mark.parametrize("codec", available_codecs())
+def test_general_cache_codecs(codec, tmp_path):
+    objects = {"uid": {"title": "Folder", "nested": [1, 2.5, None, True]}}
+    GeneralCache(lambda x: bool(x), tmp_path / "cache", codec=codec).save(objects)
+
+    # Reader does not need to know the codec, it is taken from the header
+    cache = GeneralCache(lambda x: bool(x), tmp_path / "cache")
+    assert cache.cache_available()
+    assert cache.load() == objects
+
+
+def test_general_cache_ignores_headerless_files(tmp_path):
+    (tmp_path / "cache").write_bytes(pickle.dumps({"uid": "Folder"}, protocol=4))
+    assert not GeneralCache(lambda x: bool(x), tmp_path / "cache").cache_available()
+
+
+def test_key_mismatch_and_expiry(tmp_path, monkeypatch):
+    GeneralCache(lambda x: bool(x), tmp_path / "cache", key="a").save({"uid": 1})
+    assert GeneralCache(
+        lambda x: bool(x), tmp_path / "cache", key="a"
+    ).cache_available()
+    assert not GeneralCache(
+        lambda x: bool(x), tmp_path / "cache", key="b"
+    ).cache_available()
+
+    DashboardsCache(tmp_path / "dashboards", key="a").save([dashboard("a")])
+    assert not DashboardsCache(tmp_path / "dashboards", key="b").cache_available()
+
+    monkeypatch.setattr("importer.cache.time.time", lambda: 2e10)
+    assert not GeneralCache(
+        lambda x: bool(x), tmp_path / "cache", key="a", max_age=3600
+    ).cache_available()
+    cache = DashboardsCache(tmp_path / "dashboards", key="a", max_age=3600)
+    assert not cache.cache_available()
+    assert cache.cache_available(allow_stale=True) and cache.is_stale("a")
@@ -1,4 +1,5 @@
 from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
 from datetime import timedelta
 import importlib
 import logging
@@ -19,6 +20,7 @@ import sys
 from converter.influxql_to_promql.influxql_to_promql_dashboard_converter import (
     InfluxQLToM3DashboardConverter,
     ConvertError,
+    DashboardConversion,
 )
 
 from shared_state.global_shared_state import GLOBAL_SHARED_STATE
@@ -74,6 +76,12 @@ def parse_args():
         dest="exporting",
         help="Skip exporters, usefull for debugging processing",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of processes converting dashboards, default 1",
+    )
     return parser.parse_args()
 
 
@@ -125,7 +133,14 @@ def run():
                 influx_dashboards,
                 invalid_dashboards,
                 error_manager,
+                workers=args.workers,
+                run_config=run_config,
+            )
+            translation_cache = converter.translation_cache
+            logger.info(
+                f"Query translation cache: {translation_cache.hits} hits, {translation_cache.misses} misses"
             )
+            translation_cache.save()
             if len(modules[1]) > 0:
                 metric_to_objects = converter.metric_to_objects
                 metric_to_objects = process_dashboards(
@@ -164,11 +179,16 @@ def load_run_configs_from_template(config: str):
 
 def get_converter_from_config(config, error_manager, global_shared_state):
     if config.get("converter"):
-        if config["converter"].get("influxql", {}).get("enabled", False):
+        influxql_config = config["converter"].get("influxql", {})
+        if influxql_config.get("enabled", False):
             return InfluxQLToM3DashboardConverter(
                 replacement_datasource=config.get("datasource"),
                 error_manager=error_manager,
                 global_shared_state=global_shared_state,
+                translation_cache_size=influxql_config.get(
+                    "translation_cache_size", 10000
+                ),
+                translation_cache_file=influxql_config.get("translation_cache_file"),
                 log_level=get_log_level_descriptor(config.get("log_level")),
             )
         else:
@@ -261,28 +281,137 @@ def convert_dashboards(
     influx_dashboards,
     invalid_dashboards,
     error_manager: ErrorManager,
+    workers=1,
+    run_config=None,
 ):
     logger.info(f"Starting dashboards conversion")
-    for dashboard in dashboards:
-        error_manager.context.dashboard = GrafanaDashboard(
-            uid=dashboard["dashboard"]["uid"],
-            title=dashboard["dashboard"]["title"],
-            folder=dashboard["meta"]["folderTitle"],
-            updater=dashboard["meta"]["updatedBy"],
+    if workers > 1:
+        converted = convert_dashboards_in_pool(
+            converter, dashboards, error_manager, workers, run_config
+        )
+    else:
+        converted = (
+            convert_dashboard(converter, dashboard, error_manager)
+            for dashboard in dashboards
         )
-        try:
-            converter.convert_dashboard(dashboard["dashboard"], dashboard["meta"])
+    for dashboard, error in converted:
+        if error is None:
             influx_dashboards.append(dashboard)
-        except ConvertError as e:
+        else:
             error_manager.add_error(
-                f"Error converting dashboard, skipping - error:{e}", error_level="ERROR"
+                f"Error converting dashboard, skipping - error:{error}",
+                error_level="ERROR",
             )
             invalid_dashboards.append(dashboard["dashboard"]["title"])
-        except Exception as e:
-            logger.error(
-                f"Unhandled error on dashboard processing: {e}\nError Context: {error_manager.context}\nTraceback:{traceback.format_exc()}"
-            )
-            exit(1)
+
+
+def grafana_dashboard(dashboard) -> GrafanaDashboard:
+    return GrafanaDashboard(
+        uid=dashboard["dashboard"]["uid"],
+        title=dashboard["dashboard"]["title"],
+        folder=dashboard["meta"]["folderTitle"],
+        updater=dashboard["meta"]["updatedBy"],
+    )
+
+
+def exit_on_unhandled_error(error: str):
+    logger.error(f"Unhandled error on dashboard processing: {error}")
+    exit(1)
+
+
+def convert_dashboard(converter, dashboard, error_manager: ErrorManager):
+    error_manager.context.dashboard = grafana_dashboard(dashboard)
+    try:
+        converter.convert_dashboard(dashboard["dashboard"], dashboard["meta"])
+    except ConvertError as e:
+        return dashboard, str(e)
+    except Exception as e:
+        exit_on_unhandled_error(
+            f"{e}\nError Context: {error_manager.context}\nTraceback:{traceback.format_exc()}"
+        )
+    return dashboard, None
+
+
+def convert_dashboards_in_pool(
+    converter, dashboards, error_manager: ErrorManager, workers, run_config
+):
+    """Converts the dashboards in worker processes. The results are merged in input
+    order, so metric_to_objects, the errors and the translation cache end up the same
+    as with serial conversion."""
+    context = error_manager.context
+    translation_cache = converter.translation_cache
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=init_conversion_worker,
+        initargs=(
+            run_config,
+            converter.global_shared_state,
+            context.grafana_url,
+            context.grafana_organization_id,
+        ),
+    ) as pool:
+        chunksize = max(1, min(64, len(dashboards) // (workers * 4)))
+        results = pool.map(convert_in_worker, dashboards, chunksize=chunksize)
+        for dashboard, conversion, errors, translations, error, fatal in results:
+            context.dashboard = grafana_dashboard(dashboard)
+            context.panel = conversion.panel
+            error_manager.extend_errors(errors)
+            converter.merge_conversion(conversion)
+            hits, misses, added = translations
+            translation_cache.hits += hits
+            translation_cache.misses += misses
+            for query, translated in added:
+                translation_cache.put(query, translated)
+            if fatal:
+                pool.shutdown(wait=False, cancel_futures=True)
+                exit_on_unhandled_error(fatal)
+            yield dashboard, error
+
+
+# Converter and error manager of a worker process, set by init_conversion_worker()
+_conversion_worker = None
+
+
+def init_conversion_worker(
+    run_config, global_shared_state, grafana_url, grafana_organization_id
+):
+    global _conversion_worker
+    error_manager = ErrorManager(
+        logger=logger,
+        processing_context=ProcessingContext(
+            grafana_url=grafana_url, grafana_organization_id=grafana_organization_id
+        ),
+    )
+    converter = get_converter_from_config(
+        run_config, error_manager, global_shared_state
+    )
+    converter.translation_cache.record_added()
+    _conversion_worker = (converter, error_manager)
+
+
+def convert_in_worker(dashboard):
+    converter, error_manager = _conversion_worker
+    translation_cache = converter.translation_cache
+    hits, misses = translation_cache.hits, translation_cache.misses
+    conversion = DashboardConversion(dashboard["dashboard"].get("title"))
+    error = fatal = None
+    error_manager.context.dashboard = grafana_dashboard(dashboard)
+    try:
+        converter.convert_dashboard_detached(
+            dashboard["dashboard"], dashboard["meta"], conversion
+        )
+    except ConvertError as e:
+        error = str(e)
+    except Exception as e:
+        fatal = f"{e}\nError Context: {error_manager.context}\nTraceback:{traceback.format_exc()}"
+    translations = (
+        translation_cache.hits - hits,
+        translation_cache.misses - misses,
+        translation_cache.pop_added(),
+    )
+    # The dashboard and the conversion are pickled together, so the metric references
+    # of the conversion still point into the dashboard the parent receives
+    return dashboard, conversion, error_manager.pop_errors(), translations, error, fatal
 
 
 def add_unreplaced_metrics_to_report(metric_to_objects, report):
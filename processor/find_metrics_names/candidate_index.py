@@ -0,0 +1,73 @@
+# Inverted index that narrows the dashboard metrics worth scoring with fuzz.WRatio
+# against a sent metric.
+#
+# Metrics are indexed by their adjacent character pairs, plus the first and last
+# character of every word paired with a space to cover the word orders of the token
+# based ratios. Two strings with no key in common have no adjacent characters in
+# common, so at least one unmatched character sits between any two matched ones and
+# their indel similarity is at most 80. The other ratios WRatio takes the maximum of
+# are scaled by at most 0.95, so any pair scoring above 80 shares a key.
+#
+# A one character word has no adjacent pair, partial_ratio can match it on its own
+# (WRatio("p", "cpu tx x") is 90), so metrics with one are scored against every
+# metric.
+from typing import Dict, List, Set
+
+from thefuzz.utils import full_process
+
+# Lowest min_filter_percent the index is exact for, below it every metric is scored
+MIN_BLOCKING_PERCENT = 81
+
+
+def process_metric(metric: str) -> str:
+    """The string fuzz.WRatio compares for a metric name, words separated by spaces."""
+    return full_process(metric.replace("_", " "), force_ascii=True)
+
+
+def index_keys(processed: str) -> Set[str]:
+    keys = {processed[i : i + 2] for i in range(len(processed) - 1)}
+    for word in processed.split():
+        keys.add(" " + word[0])
+        keys.add(word[-1] + " ")
+    return keys
+
+
+def has_short_word(processed: str) -> bool:
+    return any(len(word) < 2 for word in processed.split())
+
+
+class CandidateIndex:
+    def __init__(self, metrics: List[str], blocking: bool = True):
+        self.metrics = list(metrics)
+        self.processed = [process_metric(metric) for metric in self.metrics]
+        self._blocking = blocking
+        self._positions = {metric: i for i, metric in enumerate(self.metrics)}
+        self._removed = set()
+        self._postings: Dict[str, List[int]] = {}
+        # Positions of the metrics with a one character word, candidates of any metric
+        self._unblocked: List[int] = []
+        if blocking:
+            for position, processed in enumerate(self.processed):
+                if has_short_word(processed):
+                    self._unblocked.append(position)
+                    continue
+                for key in index_keys(processed):
+                    self._postings.setdefault(key, []).append(position)
+
+    def remove(self, metric: str) -> None:
+        self._removed.add(self._positions[metric])
+
+    def candidates(self, processed: str) -> Dict[int, str]:
+        """Position -> processed name of the metrics that may score above 80 against
+        `processed`, in the order the metrics were given."""
+        if self._blocking and not has_short_word(processed):
+            positions = set(self._unblocked)
+            for key in index_keys(processed):
+                positions.update(self._postings.get(key, ()))
+        else:
+            positions = range(len(self.metrics))
+        return {
+            position: self.processed[position]
+            for position in sorted(positions)
+            if position not in self._removed
+        }
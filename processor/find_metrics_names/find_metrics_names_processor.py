@@ -6,16 +6,53 @@ import logging
 from datetime import datetime, timedelta
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from common.concurrency import ordered_map
 from ..processor import Processor
-from collections import Counter
-from thefuzz import fuzz
-from thefuzz import process
+from . import vectorized_matcher
+from .candidate_index import MIN_BLOCKING_PERCENT, CandidateIndex, process_metric
+from .mapping_store import MappingStore, MetricMapping
+from .metric_catalog import MetricCatalog
+from collections import deque
+from rapidfuzz import fuzz as rfuzz
+from rapidfuzz import process as rprocess
+from thefuzz.utils import full_process
 import urllib.parse
+from typing import Iterator
+
+
+class WordCombinations:
+    """All combinations of the words of a sent metric, processed once for matching
+    dashboard metrics against them like process.extractOne() would."""
+
+    def __init__(self, sent_metric: str):
+        sent_metric_words = sent_metric.split("_")
+        # get all possible combinations, starting with list length of 1
+        self.combinations = [
+            combination
+            for i in range(1, len(sent_metric_words) + 1)
+            for combination in itertools.combinations(sent_metric_words, i)
+        ]
+        self._processed = [
+            full_process(combination, force_ascii=True)
+            for combination in self.combinations
+        ]
+
+    def extract_one(self, query: str):
+        match = rprocess.extractOne(
+            full_process(full_process(query), force_ascii=True),
+            self._processed,
+            scorer=rfuzz.WRatio,
+        )
+        if match is None:
+            return None
+        return self.combinations[match[2]], int(round(match[1]))
 
 
 class FindMetricsNamesProcessor(Processor):
     PROMETHEUS_METRICS_URL = "/label/__name__/values?match[]="
+    PROMETHEUS_METRIC_NAMES_URL = "/label/__name__/values?"
     PROMETHEUS_METRICS_QUERY_PREFIX = '{__name__=~"'
     PROMETHEUS_METRICS_QUERY_SUFFIX = '.*"}'
     MAX_MATCH_NEW_METRIC = 0
@@ -26,7 +63,13 @@ class FindMetricsNamesProcessor(Processor):
 
     def __init__(self, params: dict, global_shared_state, log_level=logging.INFO):
         super().__init__(__name__, global_shared_state, log_level)
-        self._metrics_db_endpoint = params["metrics_auth"]["metrics_db_endpoint"]
+        # A local catalog file replaces the metrics db
+        self._metrics_catalog_file = params.get("metrics_catalog_file")
+        self._metric_catalog = None
+        if self._metrics_catalog_file:
+            self._metrics_db_endpoint = None
+        else:
+            self._metrics_db_endpoint = params["metrics_auth"]["metrics_db_endpoint"]
         self._replace_strategies = self.order_repalce_strategies(
             params["replace_strategy"]["strategies"]
         )
@@ -36,12 +79,35 @@ class FindMetricsNamesProcessor(Processor):
         self._statistic_replace_min_filter_percent = params["replace_strategy"].get(
             "min_filter_percent"
         )
-        self._get_metrics_auth(params)
-
-    def _get_metrics_auth(self, params: dict):
+        self._vectorized_candidates = params["replace_strategy"].get(
+            "vectorized_candidates", 10
+        )
+        if (
+            "vectorized" in self._replace_strategies
+            and not vectorized_matcher.available()
+        ):
+            raise ValueError(
+                "The vectorized replace strategy requires numpy and scipy, install them "
+                "with: pip install numpy scipy"
+            )
         self._metrics_oauth_header = None
         self._metrics_basic_auth_username = None
         self._metrics_basic_auth_password = None
+        # Fetching the names per service prefix makes the db match them, otherwise all
+        # names are fetched once and grouped here
+        self._scoped_metrics_fetch = params.get("scoped_metrics_fetch", False)
+        self._concurrency = max(int(params.get("concurrency", 1)), 1)
+        # Replacements chosen in earlier runs are applied without matching again
+        self._mapping_store_file = params.get("mapping_store_file")
+        self._new_mappings = []
+        if self._metrics_db_endpoint:
+            self._get_metrics_auth(params)
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_maxsize=self._concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+
+    def _get_metrics_auth(self, params: dict):
         try:
             metrics_auth = params["metrics_auth"]
             oauth_header = metrics_auth.get("metrics_oauth_header")
@@ -98,8 +164,7 @@ class FindMetricsNamesProcessor(Processor):
     def process(self, metric_to_objects):
         service_to_metrics = self.group_tuples_by_service(metric_to_objects)
         all_sent_metrics = []
-        for service, metrics in service_to_metrics.items():
-            sent_metrics_for_service = self.get_sent_metrics_for_service(service)
+        for sent_metrics_for_service in self.get_sent_metrics(service_to_metrics):
             updated_sent_metrics_and_objects = self.drop_matching_metrics(
                 sent_metrics_for_service, metric_to_objects
             )
@@ -107,6 +172,31 @@ class FindMetricsNamesProcessor(Processor):
             metric_to_objects = updated_sent_metrics_and_objects[1]
         # Remove duplicated metrics and sort - required for permutation method
         all_dashboards_metrics = list(metric_to_objects.keys())
+        if not self._mapping_store_file:
+            metric_to_objects = self.replace_with_strategies(
+                all_sent_metrics, all_dashboards_metrics, metric_to_objects
+            )
+            self.apply_renames()
+            return metric_to_objects
+        self._new_mappings = []
+        with MappingStore(self._mapping_store_file) as store:
+            if len(all_sent_metrics) > 0:
+                all_sent_metrics, metric_to_objects = self.known_mappings_replace(
+                    store, all_sent_metrics, all_dashboards_metrics, metric_to_objects
+                )
+            metric_to_objects = self.replace_with_strategies(
+                all_sent_metrics, all_dashboards_metrics, metric_to_objects
+            )
+            store.put_many(self._new_mappings)
+        self._logger.info(
+            f"Stored {len(self._new_mappings)} new metric mappings in {self._mapping_store_file}"
+        )
+        self.apply_renames()
+        return metric_to_objects
+
+    def replace_with_strategies(
+        self, all_sent_metrics, all_dashboards_metrics, metric_to_objects
+    ):
         for strategy in self._replace_strategies:
             if len(all_sent_metrics) > 0:
                 process_method = getattr(self, strategy + "_replace")
@@ -123,44 +213,109 @@ class FindMetricsNamesProcessor(Processor):
                 )
         return metric_to_objects
 
+    def known_mappings_replace(
+        self, store, all_sent_metrics, all_dashboards_metrics, metric_to_objects
+    ) -> (list, list):
+        # A stored mapping is applied while the db still sends its new metric
+        sent_metrics = set(all_sent_metrics)
+        replaced_sent_metrics = set()
+        replaced_dashboard_metrics = set()
+        mappings = store.get_many(all_dashboards_metrics)
+        for dashboard_metric in all_dashboards_metrics:
+            mapping = mappings.get(dashboard_metric)
+            if (
+                mapping is None
+                or mapping.new_metric not in sent_metrics
+                or mapping.new_metric in replaced_sent_metrics
+                or not metric_to_objects[dashboard_metric]
+            ):
+                continue
+            report_args = ()
+            if mapping.strategy != "permutation":
+                report_args = (
+                    mapping.filter_percent,
+                    mapping.match_percent,
+                    mapping.matched_combination,
+                )
+            self.replace_and_report(
+                dashboard_metric, mapping.new_metric, metric_to_objects, *report_args
+            )
+            replaced_sent_metrics.add(mapping.new_metric)
+            replaced_dashboard_metrics.add(dashboard_metric)
+        all_dashboards_metrics[:] = [
+            metric
+            for metric in all_dashboards_metrics
+            if metric not in replaced_dashboard_metrics
+        ]
+        self._logger.info(
+            f"Applied {len(replaced_dashboard_metrics)} known metric mappings"
+        )
+        filtered_sent_metrics = [
+            metric for metric in all_sent_metrics if metric not in replaced_sent_metrics
+        ]
+        return filtered_sent_metrics, metric_to_objects
+
+    def replace_and_report(
+        self, old_metric, new_metric, metric_to_objects, *report_args
+    ):
+        dashboards_to_remove = self.replace_metric(
+            old_metric,
+            new_metric,
+            metric_to_objects[old_metric],
+        )
+        for dashboard in metric_to_objects[old_metric].keys():
+            self.add_to_report(
+                dashboard,
+                __name__,
+                self.create_report_object(old_metric, new_metric, *report_args),
+            )
+        self.remove_updated_dashboards_from_metric_to_object(
+            dashboards_to_remove, metric_to_objects[old_metric]
+        )
+
+    def _remember_mapping(self, mapping: MetricMapping):
+        if self._mapping_store_file:
+            self._new_mappings.append(mapping)
+
     # Metric sent contains the same characters as the metric in the dashboard, but in a different order
     def permutation_replace(
         self, sent_metrics, current_dashboards_metrics, metric_to_objects
     ) -> (list, list):
-        filtered_dashboard_metrics = copy.deepcopy(current_dashboards_metrics)
-        filtered_sent_metrics = sent_metrics.copy()
+        # Permutations share the signature (sorted characters) of the name, each sent
+        # metric replaces the first dashboard metric it is a permutation of
+        candidates = {}
+        for sent_metric in dict.fromkeys(sent_metrics):
+            signature = "".join(sorted(sent_metric))
+            candidates.setdefault(signature, deque()).append(sent_metric)
+        replaced_sent_metrics = set()
 
         for dashboard_metric in current_dashboards_metrics:
-            for sent_metric in sent_metrics:
-                if len(sent_metric) == len(dashboard_metric):
-                    if Counter(sent_metric) == Counter(dashboard_metric):
-                        dashboards_to_remove = self.replace_metric(
-                            dashboard_metric,
-                            sent_metric,
-                            metric_to_objects[dashboard_metric],
-                        )
-                        for dashboard in metric_to_objects[dashboard_metric].keys():
-                            self.add_to_report(
-                                dashboard,
-                                __name__,
-                                self.create_report_object(
-                                    dashboard_metric, sent_metric
-                                ),
-                            )
-                        self.remove_updated_dashboards_from_metric_to_object(
-                            dashboards_to_remove, metric_to_objects[dashboard_metric]
-                        )
-                        filtered_sent_metrics.remove(sent_metric)
-                        filtered_dashboard_metrics.remove(dashboard_metric)
-        current_dashboards_metrics = filtered_dashboard_metrics
+            matches = candidates.get("".join(sorted(dashboard_metric)))
+            if not matches:
+                continue
+            sent_metric = matches.popleft()
+            self.replace_and_report(dashboard_metric, sent_metric, metric_to_objects)
+            self._remember_mapping(
+                MetricMapping(dashboard_metric, sent_metric, "permutation")
+            )
+            replaced_sent_metrics.add(sent_metric)
+        filtered_sent_metrics = [
+            metric for metric in sent_metrics if metric not in replaced_sent_metrics
+        ]
         return filtered_sent_metrics, metric_to_objects
 
     def statistic_combination_replace(
         self, all_sent_metrics, all_dashboards_metrics, metric_to_objects
     ) -> (list, list):
-        filtered_sent_metrics = all_sent_metrics.copy()
+        min_filter_percent = self._statistic_replace_min_filter_percent
+        # Only dashboard metrics sharing characters with the sent metric can pass the
+        # filter, see candidate_index
+        index = CandidateIndex(
+            all_dashboards_metrics, min_filter_percent >= MIN_BLOCKING_PERCENT
+        )
+        replaced_sent_metrics = set()
         for sent_metric in all_sent_metrics:
-            combinations = []
+            combinations = None
             max_match = (
                 "",
                 "",
@@ -168,48 +323,125 @@ class FindMetricsNamesProcessor(Processor):
                 0,
                 0,
             )  # new metric, old_metric, match name, filter percent, match percent
-            for dashboard_metric in all_dashboards_metrics:
-                filter_ratio = fuzz.WRatio(
-                    sent_metric.replace("_", " "), dashboard_metric.replace("_", " ")
+            # Same scores as fuzz.WRatio() on the names with spaces, cut off early
+            filtered = rprocess.extract(
+                process_metric(sent_metric),
+                index.candidates(process_metric(sent_metric)),
+                scorer=rfuzz.WRatio,
+                score_cutoff=max(0, min_filter_percent - 1),
+                limit=None,
+            )
+            for _, score, position in sorted(filtered, key=lambda x: x[2]):
+                filter_ratio = int(round(score))
+                if filter_ratio < min_filter_percent:
+                    continue
+                dashboard_metric = index.metrics[position]
+                if combinations is None:
+                    combinations = WordCombinations(sent_metric)
+                top_ranked_match = combinations.extract_one(
+                    dashboard_metric.replace("_", " ")
                 )
-                if filter_ratio >= self._statistic_replace_min_filter_percent:
-                    if len(combinations) == 0:
-                        sent_metric_words = sent_metric.split("_")
-                        # get all possible combinations, starting with list length of 1
-                        for i in range(1, len(sent_metric_words) + 1):
-                            combinations += list(
-                                itertools.combinations(sent_metric_words, i)
-                            )
-                    metric_with_spaces = dashboard_metric.replace("_", " ")
-                    top_ranked_match = process.extractOne(
-                        metric_with_spaces, combinations
-                    )
+                if (
+                    top_ranked_match
+                    and top_ranked_match[1] >= self._statistic_replace_min_match_percent
+                ):
                     if (
-                        top_ranked_match
+                        filter_ratio >= max_match[self.MAX_MATCH_FILTER_PERCENT]
                         and top_ranked_match[1]
-                        >= self._statistic_replace_min_match_percent
+                        >= max_match[self.MAX_MATCH_MATCH_PERCENT]
                     ):
-                        if (
-                            filter_ratio >= max_match[self.MAX_MATCH_FILTER_PERCENT]
-                            and top_ranked_match[1]
-                            >= max_match[self.MAX_MATCH_MATCH_PERCENT]
-                        ):
-                            max_match = (
-                                sent_metric,
-                                dashboard_metric,
-                                top_ranked_match[0],
-                                filter_ratio,
-                                top_ranked_match[1],
-                            )
+                        max_match = (
+                            sent_metric,
+                            dashboard_metric,
+                            top_ranked_match[0],
+                            filter_ratio,
+                            top_ranked_match[1],
+                        )
             if max_match[self.MAX_MATCH_MATCH_PERCENT] > 0:  # new metric was found
                 self.replace_and_report_new_match(
                     max_match, metric_to_objects, all_dashboards_metrics
                 )
-                filtered_sent_metrics.remove(sent_metric)
+                index.remove(max_match[self.MAX_MATCH_OLD_METRIC])
+                replaced_sent_metrics.add(sent_metric)
+        filtered_sent_metrics = [
+            metric for metric in all_sent_metrics if metric not in replaced_sent_metrics
+        ]
+        return filtered_sent_metrics, metric_to_objects
+
+    # Compares all names at once by their TF-IDF character n-grams, the most similar
+    # dashboard metrics of every sent metric are scored like statistic_combination
+    def vectorized_replace(
+        self, all_sent_metrics, all_dashboards_metrics, metric_to_objects
+    ) -> (list, list):
+        sent_metrics = list(dict.fromkeys(all_sent_metrics))
+        dashboard_metrics = list(all_dashboards_metrics)
+        processed_sent = [process_metric(metric) for metric in sent_metrics]
+        processed_dashboard = [process_metric(metric) for metric in dashboard_metrics]
+        candidates = vectorized_matcher.most_similar(
+            processed_sent, processed_dashboard, self._vectorized_candidates
+        )
+        matches = []  # filter percent, match percent, positions, max_match
+        for sent_position, positions in enumerate(candidates):
+            sent_metric = sent_metrics[sent_position]
+            combinations = None
+            for position in positions:
+                filter_ratio = int(
+                    round(
+                        rfuzz.WRatio(
+                            processed_sent[sent_position], processed_dashboard[position]
+                        )
+                    )
+                )
+                if filter_ratio < self._statistic_replace_min_filter_percent:
+                    continue
+                dashboard_metric = dashboard_metrics[position]
+                if combinations is None:
+                    combinations = WordCombinations(sent_metric)
+                top_ranked_match = combinations.extract_one(
+                    dashboard_metric.replace("_", " ")
+                )
+                if (
+                    top_ranked_match
+                    and top_ranked_match[1] >= self._statistic_replace_min_match_percent
+                ):
+                    max_match = (
+                        sent_metric,
+                        dashboard_metric,
+                        top_ranked_match[0],
+                        filter_ratio,
+                        top_ranked_match[1],
+                    )
+                    matches.append(
+                        (filter_ratio, top_ranked_match[1], sent_position, position)
+                        + (max_match,)
+                    )
+
+        # Best pairs first, every sent and dashboard metric is used at most once
+        matches.sort(key=lambda match: (-match[0], -match[1], match[2], match[3]))
+        replaced_sent_metrics = set()
+        replaced_dashboard_metrics = set()
+        for *_, max_match in matches:
+            if (
+                max_match[self.MAX_MATCH_NEW_METRIC] in replaced_sent_metrics
+                or max_match[self.MAX_MATCH_OLD_METRIC] in replaced_dashboard_metrics
+            ):
+                continue
+            self.replace_and_report_new_match(
+                max_match, metric_to_objects, all_dashboards_metrics, "vectorized"
+            )
+            replaced_sent_metrics.add(max_match[self.MAX_MATCH_NEW_METRIC])
+            replaced_dashboard_metrics.add(max_match[self.MAX_MATCH_OLD_METRIC])
+        filtered_sent_metrics = [
+            metric for metric in all_sent_metrics if metric not in replaced_sent_metrics
+        ]
         return filtered_sent_metrics, metric_to_objects
 
     def replace_and_report_new_match(
-        self, max_match, metric_to_objects, all_dashboard_metrics
+        self,
+        max_match,
+        metric_to_objects,
+        all_dashboard_metrics,
+        strategy="statistic_combination",
     ):
         dashboards_to_remove = []
         for dashboard in metric_to_objects[max_match[self.MAX_MATCH_OLD_METRIC]]:
@@ -234,10 +466,47 @@ class FindMetricsNamesProcessor(Processor):
             metric_to_objects[max_match[self.MAX_MATCH_OLD_METRIC]],
         )
         all_dashboard_metrics.remove(max_match[self.MAX_MATCH_OLD_METRIC])
+        self._remember_mapping(
+            MetricMapping(
+                max_match[self.MAX_MATCH_OLD_METRIC],
+                max_match[self.MAX_MATCH_NEW_METRIC],
+                strategy,
+                max_match[self.MAX_MATCH_FILTER_PERCENT],
+                max_match[self.MAX_MATCH_MATCH_PERCENT],
+                list(max_match[self.MAX_MATCH_COMBINATIONS]),
+            )
+        )
+
+    def get_sent_metrics(self, services) -> Iterator[list]:
+        """The sent metrics of every service prefix, in the order of services"""
+        if self._scoped_metrics_fetch and not self._metrics_catalog_file:
+            return ordered_map(
+                self.get_sent_metrics_for_service, services, self._concurrency
+            )
+        catalog = self.get_metric_catalog()
+        return (catalog.with_prefix(service) for service in services)
+
+    def get_metric_catalog(self) -> MetricCatalog:
+        if self._metrics_catalog_file:
+            if self._metric_catalog is None:
+                self._metric_catalog = MetricCatalog.from_file(
+                    self._metrics_catalog_file
+                )
+                self._logger.info(
+                    f"Loaded {len(self._metric_catalog)} metric names from {self._metrics_catalog_file}"
+                )
+            return self._metric_catalog
+        catalog = MetricCatalog(
+            self._fetch_metric_names(
+                self._metrics_db_endpoint
+                + self.PROMETHEUS_METRIC_NAMES_URL
+                + self._time_range()
+            )
+        )
+        self._logger.info(f"Fetched {len(catalog)} metric names from db")
+        return catalog
 
     def get_sent_metrics_for_service(self, service_prefix) -> list:
-        epoch_time = datetime.utcnow()
-        five_min_time = datetime.utcnow() - timedelta(minutes=5)
         query = (
             self._metrics_db_endpoint
             + self.PROMETHEUS_METRICS_URL
@@ -247,16 +516,27 @@ class FindMetricsNamesProcessor(Processor):
                 + self.PROMETHEUS_METRICS_QUERY_SUFFIX,
                 safe="*",
             )
-            + "&start="
+            + "&"
+            + self._time_range()
+        )
+        return self._fetch_metric_names(query)
+
+    @staticmethod
+    def _time_range() -> str:
+        epoch_time = datetime.utcnow()
+        five_min_time = epoch_time - timedelta(minutes=5)
+        return (
+            "start="
             + str(calendar.timegm(five_min_time.timetuple()))
             + "&end="
             + str(calendar.timegm(epoch_time.timetuple()))
         )
 
+    def _fetch_metric_names(self, query) -> list:
         if self._metrics_oauth_header:
-            response = requests.get(query, headers=self._metrics_oauth_header)
+            response = self._session.get(query, headers=self._metrics_oauth_header)
         elif self._metrics_basic_auth_username:
-            response = requests.get(
+            response = self._session.get(
                 query,
                 auth=(
                     self._metrics_basic_auth_username,
@@ -264,7 +544,7 @@ class FindMetricsNamesProcessor(Processor):
                 ),
             )
         else:
-            response = requests.get(query)
+            response = self._session.get(query)
 
         metrics = []
         if response.status_code == 200:
@@ -276,11 +556,8 @@ class FindMetricsNamesProcessor(Processor):
         return metrics
 
     def order_repalce_strategies(self, strategies):
-        if len(strategies) > 1:
-            if strategies[0] == "statistic_combination":
-                strategies[0] = "permutation"
-                strategies[1] = "statistic_combination"
-        return strategies
+        # Permutations are exact, they run before the statistic strategies
+        return sorted(strategies, key=lambda strategy: strategy != "permutation")
 
     def create_report_object(self, old_metric, new_metric=None, *args) -> dict:
         if len(args) > 0:  # statistic match
@@ -0,0 +1,81 @@
+import json
+import sqlite3
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+# SQLite limits the number of parameters of a statement
+LOOKUP_BATCH_SIZE = 500
+
+
+class MetricMapping(NamedTuple):
+    old_metric: str
+    new_metric: str
+    strategy: str
+    filter_percent: Optional[int] = None
+    match_percent: Optional[int] = None
+    matched_combination: Optional[list] = None
+
+
+class MappingStore:
+    """Dashboard metric replacements chosen in earlier runs, kept in a SQLite file"""
+
+    def __init__(self, path: str):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute("""CREATE TABLE IF NOT EXISTS metric_mappings (
+                old_metric TEXT PRIMARY KEY,
+                new_metric TEXT NOT NULL,
+                strategy TEXT NOT NULL,
+                filter_percent INTEGER,
+                match_percent INTEGER,
+                matched_combination TEXT,
+                updated_at INTEGER NOT NULL
+            )""")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self._connection.commit()
+        self._connection.close()
+
+    def get_many(self, old_metrics: Iterable[str]) -> Dict[str, MetricMapping]:
+        old_metrics = list(old_metrics)
+        mappings = {}
+        for first in range(0, len(old_metrics), LOOKUP_BATCH_SIZE):
+            batch = old_metrics[first : first + LOOKUP_BATCH_SIZE]
+            rows = self._connection.execute(
+                "SELECT old_metric, new_metric, strategy, filter_percent, "
+                "match_percent, matched_combination FROM metric_mappings "
+                f"WHERE old_metric IN ({','.join('?' * len(batch))})",
+                batch,
+            )
+            for row in rows:
+                combination = json.loads(row[5]) if row[5] is not None else None
+                mappings[row[0]] = MetricMapping(*row[:5], combination)
+        return mappings
+
+    def put_many(self, mappings: List[MetricMapping]) -> None:
+        now = int(time.time())
+        self._connection.executemany(
+            """INSERT INTO metric_mappings VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(old_metric) DO UPDATE SET
+                new_metric = excluded.new_metric,
+                strategy = excluded.strategy,
+                filter_percent = excluded.filter_percent,
+                match_percent = excluded.match_percent,
+                matched_combination = excluded.matched_combination,
+                updated_at = excluded.updated_at""",
+            [
+                (
+                    *mapping[:5],
+                    (
+                        json.dumps(list(mapping.matched_combination))
+                        if mapping.matched_combination is not None
+                        else None
+                    ),
+                    now,
+                )
+                for mapping in mappings
+            ],
+        )
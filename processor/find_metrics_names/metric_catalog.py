@@ -0,0 +1,40 @@
+import json
+from bisect import bisect_left
+from typing import Iterable, List
+
+
+class MetricCatalog:
+    """The metric names known to the metrics db, sorted for prefix lookups"""
+
+    def __init__(self, names: Iterable[str]):
+        self.names = sorted(set(names))
+
+    @classmethod
+    def from_file(cls, path: str) -> "MetricCatalog":
+        """Loads the output of /api/v1/label/__name__/values or /api/v1/metadata, a JSON
+        list of names, or a text file with a name per line"""
+        with open(path, encoding="utf-8") as f:
+            content = f.read()
+        try:
+            catalog = json.loads(content)
+        except ValueError:
+            return cls(
+                line.strip()
+                for line in content.splitlines()
+                if line.strip() and not line.lstrip().startswith("#")
+            )
+        if isinstance(catalog, dict):
+            # API responses wrap the names, metadata is keyed by metric name
+            catalog = catalog.get("data", catalog)
+        if isinstance(catalog, (dict, list)):
+            return cls(catalog)
+        raise ValueError(f"Invalid metrics catalog file {path}")
+
+    def __len__(self):
+        return len(self.names)
+
+    def with_prefix(self, prefix: str) -> List[str]:
+        """Names starting with prefix, as a {__name__=~"prefix.*"} match returns them"""
+        start = bisect_left(self.names, prefix)
+        end = bisect_left(self.names, prefix + "\U0010ffff", start)
+        return self.names[start:end]
@@ -0,0 +1,292 @@
+import itertools
+import json
+import logging
+import random
+
+import pytest
+from thefuzz import fuzz, process
+
+from . import vectorized_matcher
+from .candidate_index import CandidateIndex, process_metric
+from .find_metrics_names_processor import FindMetricsNamesProcessor
+
+
+@pytest.fixture
+def processor():
+    return FindMetricsNamesProcessor(
+        {
+            "metrics_auth": {"metrics_db_endpoint": "http://localhost/api/v1"},
+            "replace_strategy": {
+                "strategies": ["permutation", "statistic_combination"],
+                "min_match_percent": 90,
+                "min_filter_percent": 90,
+            },
+        },
+        {},
+        logging.INFO,
+    )
+
+
+def test_permutation_replace(processor):
+    targets = {
+        "usage_cpu": {"expr": "avg(usage_cpu)"},
+        "cpu_usage_idle": {"expr": "avg(cpu_usage_idle)"},
+        "mem_free": {"expr": "avg(mem_free)"},
+    }
+    metric_to_objects = {
+        metric: {"Dashboard": [target]} for metric, target in targets.items()
+    }
+    sent_metrics = ["cpu_usage", "idle_usage_cpu", "usage_idle_cpu", "disk_free"]
+
+    remaining, metric_to_objects = processor.permutation_replace(
+        sent_metrics, list(metric_to_objects), metric_to_objects
+    )
+    processor.apply_renames()
+
+    assert remaining == ["usage_idle_cpu", "disk_free"]
+    assert targets["usage_cpu"]["expr"] == "avg(cpu_usage)"
+    assert targets["cpu_usage_idle"]["expr"] == "avg(idle_usage_cpu)"
+    assert metric_to_objects["usage_cpu"] == {}
+    assert metric_to_objects["mem_free"] == {"Dashboard": [targets["mem_free"]]}
+    assert processor.get_json_report()["Dashboard"]["find_metrics_names_processor"] == [
+        {"permutation_match": {"converted": "usage_cpu --> cpu_usage"}},
+        {"permutation_match": {"converted": "cpu_usage_idle --> idle_usage_cpu"}},
+    ]
+
+
+def brute_force_matches(sent_metrics, dashboard_metrics, filter_percent, match_percent):
+    # statistic_combination_replace scoring every pair with thefuzz
+    matches = []
+    dashboard_metrics = list(dashboard_metrics)
+    for sent_metric in sent_metrics:
+        words = sent_metric.split("_")
+        combinations = [
+            c
+            for i in range(1, len(words) + 1)
+            for c in itertools.combinations(words, i)
+        ]
+        max_match = ("", "", [], 0, 0)
+        for dashboard_metric in dashboard_metrics:
+            filter_ratio = fuzz.WRatio(
+                sent_metric.replace("_", " "), dashboard_metric.replace("_", " ")
+            )
+            if filter_ratio < filter_percent:
+                continue
+            match = process.extractOne(dashboard_metric.replace("_", " "), combinations)
+            if (
+                match[1] >= match_percent
+                and filter_ratio >= max_match[3]
+                and match[1] >= max_match[4]
+            ):
+                max_match = (
+                    sent_metric,
+                    dashboard_metric,
+                    match[0],
+                    filter_ratio,
+                    match[1],
+                )
+        if max_match[4] > 0:
+            matches.append(max_match)
+            dashboard_metrics.remove(max_match[1])
+    return matches
+
+
+@pytest.mark.parametrize("percent", [50, 85, 90, 95])
+def test_statistic_combination_replace_candidates(processor, percent):
+    words = ["cpu", "usage", "idle", "mem", "free", "disk", "io", "bytes", "total"]
+    rnd = random.Random(percent)
+    names = [
+        "_".join(rnd.choice(words) for _ in range(rnd.randint(1, 4)))
+        + rnd.choice(["", "s", "_total", "2"])
+        for _ in range(200)
+    ]
+    sent_metrics = list(dict.fromkeys(names[:100]))
+    dashboard_metrics = list(dict.fromkeys(names[100:]))
+    processor._statistic_replace_min_filter_percent = percent
+    processor._statistic_replace_min_match_percent = percent
+    matches = []
+
+    def replace_and_report_new_match(max_match, metric_to_objects, all_metrics):
+        matches.append(max_match)
+        all_metrics.remove(max_match[1])
+
+    processor.replace_and_report_new_match = replace_and_report_new_match
+    remaining, _ = processor.statistic_combination_replace(
+        sent_metrics, list(dashboard_metrics), {}
+    )
+
+    expected = brute_force_matches(sent_metrics, dashboard_metrics, percent, percent)
+    assert matches == expected
+    assert remaining == [m for m in sent_metrics if m not in {e[0] for e in expected}]
+
+
+@pytest.mark.parametrize(
+    "sent_metric, dashboard_metric", [("aba", "b_b_b"), ("p", "cpu_tx_x")]
+)
+def test_candidates_with_one_character_words(sent_metric, dashboard_metric):
+    # No adjacent characters in common, one character words still score above 80
+    assert (
+        fuzz.WRatio(process_metric(sent_metric), process_metric(dashboard_metric)) > 80
+    )
+    for query, metric in [
+        (sent_metric, dashboard_metric),
+        (dashboard_metric, sent_metric),
+    ]:
+        index = CandidateIndex(["mem_free", metric])
+        assert 1 in index.candidates(process_metric(query))
+
+
+def test_vectorized_replace(processor):
+    pytest.importorskip("scipy")
+    targets = {
+        "cpu_usage": {"expr": "avg(cpu_usage)"},
+        "mem_free_bytes": {"expr": "avg(mem_free_bytes)"},
+        "disk_io": {"expr": "avg(disk_io)"},
+    }
+    metric_to_objects = {
+        metric: {"Dashboard": [target]} for metric, target in targets.items()
+    }
+    sent_metrics = ["system_cpu_usage", "node_mem_free_bytes", "http_requests"]
+
+    remaining, _ = processor.vectorized_replace(
+        sent_metrics, list(metric_to_objects), metric_to_objects
+    )
+    processor.apply_renames()
+
+    assert remaining == ["http_requests"]
+    assert targets["cpu_usage"]["expr"] == "avg(system_cpu_usage)"
+    assert targets["mem_free_bytes"]["expr"] == "avg(node_mem_free_bytes)"
+    assert targets["disk_io"]["expr"] == "avg(disk_io)"
+
+
+def test_vectorized_replace_requires_scipy(monkeypatch):
+    monkeypatch.setattr(vectorized_matcher, "sparse", None)
+    with pytest.raises(ValueError, match="numpy and scipy"):
+        FindMetricsNamesProcessor(
+            {
+                "metrics_auth": {"metrics_db_endpoint": "http://localhost/api/v1"},
+                "replace_strategy": {"strategies": ["vectorized"]},
+            },
+            {},
+            logging.INFO,
+        )
+
+
+class FakeMetricsDb:
+    def __init__(self, names):
+        self.names = names
+        self.queries = []
+
+    def get(self, query, **kwargs):
+        self.queries.append(query)
+        return type(
+            "Response", (), {"status_code": 200, "content": json.dumps(self.names)}
+        )
+
+
+def test_process_fetches_metric_catalog_once(processor):
+    db = FakeMetricsDb(
+        {"data": ["mem_free", "cpu_usage_total", "cpu_idle", "cpus", "disk_io"]}
+    )
+    processor._session = db
+    metric_to_objects = {
+        "cpu_idle": {"Dashboard": [{"expr": "avg(cpu_idle)"}]},
+        "mem_free": {"Dashboard": [{"expr": "avg(mem_free)"}]},
+        "net_rx": {"Dashboard": [{"expr": "avg(net_rx)"}]},
+    }
+
+    assert processor.get_metric_catalog().with_prefix("cpu") == [
+        "cpu_idle",
+        "cpu_usage_total",
+        "cpus",
+    ]
+    db.queries.clear()
+    metric_to_objects = processor.process(metric_to_objects)
+
+    assert len(db.queries) == 1
+    assert "match[]" not in db.queries[0]
+    assert list(metric_to_objects) == ["net_rx"]
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "# exported names\ncpu_idle\n\nmem_free\ncpu_usage_total\n",
+        json.dumps(["cpu_idle", "mem_free", "cpu_usage_total"]),
+        json.dumps(
+            {"status": "success", "data": ["cpu_idle", "cpu_usage_total", "mem_free"]}
+        ),
+        json.dumps(
+            {
+                "status": "success",
+                "data": {
+                    "cpu_idle": [{"type": "gauge", "help": "", "unit": ""}],
+                    "cpu_usage_total": [{"type": "counter", "help": "", "unit": ""}],
+                    "mem_free": [{"type": "gauge", "help": "", "unit": ""}],
+                },
+            }
+        ),
+    ],
+)
+def test_metrics_catalog_file(tmp_path, content):
+    catalog_file = tmp_path / "catalog"
+    catalog_file.write_text(content)
+    processor = FindMetricsNamesProcessor(
+        {
+            "metrics_catalog_file": str(catalog_file),
+            "replace_strategy": {"strategies": ["permutation"]},
+        },
+        {},
+        logging.INFO,
+    )
+    metric_to_objects = {
+        "cpu_idle": {"Dashboard": [{"expr": "avg(cpu_idle)"}]},
+        "mem_fere": {"Dashboard": [{"expr": "avg(mem_fere)"}]},
+    }
+
+    assert processor.get_metric_catalog().names == [
+        "cpu_idle",
+        "cpu_usage_total",
+        "mem_free",
+    ]
+    assert processor.get_metric_catalog() is processor.get_metric_catalog()
+    assert processor.process(metric_to_objects) == {"mem_fere": {}}
+
+
+def test_mapping_store(tmp_path, monkeypatch):
+    catalog_file = tmp_path / "catalog"
+    catalog_file.write_text("node_cpu_usage\nnode_mem_free\n")
+    params = {
+        "metrics_catalog_file": str(catalog_file),
+        "mapping_store_file": str(tmp_path / "mappings.db"),
+        "replace_strategy": {
+            "strategies": ["statistic_combination"],
+            "min_match_percent": 90,
+            "min_filter_percent": 90,
+        },
+    }
+
+    def run():
+        target = {"expr": "avg(node_cpu)"}
+        processor = FindMetricsNamesProcessor(params, {}, logging.INFO)
+        processor.process({"node_cpu": {"Dashboard": [target]}})
+        return processor, target
+
+    first, target = run()
+    assert target["expr"] == "avg(node_cpu_usage)"
+
+    matched = []
+
+    def statistic_combination_replace(self, sent_metrics, dashboard_metrics, objects):
+        matched.extend(dashboard_metrics)
+        return sent_metrics, objects
+
+    monkeypatch.setattr(
+        FindMetricsNamesProcessor,
+        "statistic_combination_replace",
+        statistic_combination_replace,
+    )
+    second, target = run()
+    assert matched == []
+    assert target["expr"] == "avg(node_cpu_usage)"
+    assert second.get_json_report() == first.get_json_report()
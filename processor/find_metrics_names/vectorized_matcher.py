@@ -0,0 +1,91 @@
+# TF-IDF character n-gram vectors of metric names, compared with sparse matrix
+# products to find the dashboard metrics most similar to every sent metric at once.
+#
+# numpy and scipy are optional, only the vectorized replace strategy needs them.
+from typing import Dict, List
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = None
+    sparse = None
+
+NGRAM_SIZES = (2, 3)
+# Similarity scores held in memory at once, bounds the rows multiplied per chunk
+MAX_SCORES_PER_CHUNK = 1 << 24
+
+
+def available() -> bool:
+    return sparse is not None
+
+
+def ngrams(processed: str):
+    padded = f" {processed} "
+    for size in NGRAM_SIZES:
+        for i in range(len(padded) - size + 1):
+            yield padded[i : i + size]
+
+
+def _term_counts(documents: List[str], vocabulary: Dict[str, int]):
+    indptr, indices, data = [0], [], []
+    for document in documents:
+        counts = {}
+        for gram in ngrams(document):
+            column = vocabulary.setdefault(gram, len(vocabulary))
+            counts[column] = counts.get(column, 0) + 1
+        indices.extend(counts.keys())
+        data.extend(counts.values())
+        indptr.append(len(indices))
+    return data, indices, indptr
+
+
+def tfidf_matrices(*corpora: List[str]) -> list:
+    """L2 normalized TF-IDF rows of every corpus, over a vocabulary and document
+    frequencies shared by all of them."""
+    vocabulary = {}
+    counts = [_term_counts(documents, vocabulary) for documents in corpora]
+    matrices = [
+        sparse.csr_matrix(
+            (
+                np.asarray(data, dtype=np.float32),
+                np.asarray(indices, dtype=np.int64),
+                np.asarray(indptr, dtype=np.int64),
+            ),
+            shape=(len(indptr) - 1, len(vocabulary)),
+        )
+        for data, indices, indptr in counts
+    ]
+    documents = sum(matrix.shape[0] for matrix in matrices)
+    document_frequency = np.zeros(len(vocabulary), dtype=np.float32)
+    for matrix in matrices:
+        document_frequency += np.bincount(matrix.indices, minlength=len(vocabulary))
+    idf = np.log((1 + documents) / (1 + document_frequency)) + 1
+    weighted = []
+    for matrix in matrices:
+        matrix = matrix @ sparse.diags(idf.astype(np.float32))
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        weighted.append(sparse.diags(1 / norms).astype(np.float32) @ matrix)
+    return weighted
+
+
+def most_similar(queries: List[str], choices: List[str], limit: int) -> List[list]:
+    """Positions of the up to `limit` choices with the highest cosine similarity to
+    every query, best first and ties in choice order. Choices sharing no n-gram with
+    the query are left out."""
+    if not choices or limit < 1:
+        return [[] for _ in queries]
+    query_matrix, choice_matrix = tfidf_matrices(queries, choices)
+    choice_matrix = choice_matrix.T.tocsr()
+    limit = min(limit, len(choices))
+    rows = max(1, MAX_SCORES_PER_CHUNK // len(choices))
+    result = []
+    for first in range(0, len(queries), rows):
+        scores = (query_matrix[first : first + rows] @ choice_matrix).toarray()
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        for row, columns in zip(scores, top):
+            columns = columns[row[columns] > 0]
+            order = np.lexsort((columns, -row[columns]))
+            result.append(columns[order].tolist())
+    return result
@@ -1,32 +1,66 @@
+import re
 from abc import abstractmethod
 from base_module.module import Module
 
+# Characters a metric name token is made of
+METRIC_NAME_CHARACTERS = "A-Za-z0-9_:"
+METRIC_NAME_TOKEN = f"[{METRIC_NAME_CHARACTERS}]+"
+
 
 class Processor(Module):
 
     def __init__(self, module_name, global_shared_state, log_level):
         super().__init__(module_name, global_shared_state, log_level)
         self._json_report = {}
+        # id(target) -> (target, old metric -> new metric), applied by apply_renames()
+        self._pending_renames = {}
 
     @abstractmethod
     def process(self, metric_and_object: list[()]) -> list[()]:
         pass
 
     # Returns list of dashboard-->panels object to be remove from metric to object (Already updated)
+    # The panels are rewritten by apply_renames()
     def replace_metric(self, old_metric, new_metric, dashboard_to_panels) -> list:
         dashboards = []
         for dashboard, panels in dashboard_to_panels.items():
             for panel in panels:
-                if panel.get("expr"):
-                    panel["expr"] = panel["expr"].replace(old_metric, new_metric)
-                elif panel.get("query"):  # Metric name is in label_values
-                    panel["query"] = panel["query"].replace(old_metric, new_metric)
+                _, renames = self._pending_renames.setdefault(id(panel), (panel, {}))
+                # The first rename of a metric wins, as it did when renames were applied
+                # one after the other
+                renames.setdefault(old_metric, new_metric)
             self._logger.debug(
                 f"Replaced metrics: {old_metric} ---> {new_metric} in dashboard {dashboard}"
             )
             dashboards.append(dashboard)
         return dashboards
 
+    def apply_renames(self):
+        """Rewrites every renamed target once. Whole metric names are replaced only, so
+        renaming mem_used leaves mem_used_percent alone."""
+        if not self._pending_renames:
+            return
+        # Metric names are matched as whole tokens, names with other characters too
+        irregular = {
+            old_metric
+            for _, renames in self._pending_renames.values()
+            for old_metric in renames
+            if not re.fullmatch(METRIC_NAME_TOKEN, old_metric)
+        }
+        alternatives = [
+            f"(?<![{METRIC_NAME_CHARACTERS}]){re.escape(old_metric)}(?![{METRIC_NAME_CHARACTERS}])"
+            for old_metric in sorted(irregular, key=len, reverse=True)
+        ]
+        pattern = re.compile("|".join(alternatives + [METRIC_NAME_TOKEN]))
+        for panel, renames in self._pending_renames.values():
+            key = "expr" if panel.get("expr") else "query"
+            if panel.get(key):  # Metric name is in label_values for queries
+                panel[key] = pattern.sub(
+                    lambda match: renames.get(match[0], match[0]), panel[key]
+                )
+        self._logger.debug(f"Renamed metrics in {len(self._pending_renames)} targets")
+        self._pending_renames = {}
+
     def add_to_report(self, dashboard_name, module_name, report_object):
         short_module_name = module_name.split(".")[len(module_name.split(".")) - 1]
         try:
@@ -0,0 +1,122 @@
+import csv
+import json
+import re
+from typing import Dict, List, Optional
+
+RULE_TYPES = ("exact", "glob", "regex")
+# What a glob * or ? matches within a metric name
+GLOB_CHARACTERS = "[A-Za-z0-9_:]"
+REGEX_SPECIAL_CHARACTERS = ".^$*+?{}[]\\|()"
+
+
+def glob_to_regex(pattern: str) -> str:
+    """Every * and ? becomes a group, filled in order into the * of the glob value"""
+    parts = []
+    for character in pattern:
+        if character == "*":
+            parts.append(f"({GLOB_CHARACTERS}*)")
+        elif character == "?":
+            parts.append(f"({GLOB_CHARACTERS})")
+        else:
+            parts.append(re.escape(character))
+    return "".join(parts)
+
+
+def literal_prefix(pattern: str, rule_type: str) -> str:
+    """The characters every name matched by the pattern starts with"""
+    special = "*?" if rule_type == "glob" else REGEX_SPECIAL_CHARACTERS
+    if rule_type == "regex" and "|" in pattern:
+        return ""
+    prefix = []
+    for character in pattern:
+        if character in special:
+            # A quantified character is optional
+            if rule_type == "regex" and character in "*?{" and prefix:
+                prefix.pop()
+            break
+        prefix.append(character)
+    return "".join(prefix)
+
+
+class RenameRules:
+    """Old metric name -> new name rules. Exact names are looked up in a dict, glob and
+    regex rules are indexed by their literal prefix so that a name is only matched
+    against the patterns it can match, the first of them in rule order wins."""
+
+    def __init__(self, rules: List[dict]):
+        self._exact: Dict[str, str] = {}
+        self._patterns = []  # (compiled pattern, value, type)
+        self._by_prefix: Dict[str, List[int]] = {}
+        for rule in rules:
+            rule_type = rule.get("type") or "exact"
+            if rule_type not in RULE_TYPES:
+                raise ValueError(f"Invalid rename rule type {rule_type!r}")
+            try:
+                name, value = rule["name"], rule["value"]
+            except KeyError as e:
+                raise ValueError(f"Rename rule {rule} misses {e}")
+            if rule_type == "exact":
+                # The first rule for a name wins
+                self._exact.setdefault(name, value)
+                continue
+            pattern = glob_to_regex(name) if rule_type == "glob" else name
+            try:
+                self._patterns.append((re.compile(pattern), value, rule_type))
+            except re.error as e:
+                raise ValueError(f"Invalid rename rule pattern {name!r}: {e}")
+            self._by_prefix.setdefault(literal_prefix(name, rule_type), []).append(
+                len(self._patterns) - 1
+            )
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._by_prefix})
+
+    @classmethod
+    def from_params(cls, params) -> "RenameRules":
+        """A list of rules, or a dict of inline rules and rule_files"""
+        if isinstance(params, list):
+            return cls(params)
+        rules = list(params.get("rules") or [])
+        for rule_file in params.get("rule_files") or []:
+            rules.extend(load_rule_file(rule_file))
+        return cls(rules)
+
+    def __len__(self):
+        return len(self._exact) + len(self._patterns)
+
+    def rename(self, metric: str) -> Optional[str]:
+        """The new name of metric, None when no rule matches"""
+        if metric in self._exact:
+            return self._exact[metric]
+        candidates = []
+        for length in self._prefix_lengths:
+            if length > len(metric):
+                break
+            candidates.extend(self._by_prefix.get(metric[:length], ()))
+        for index in sorted(candidates):
+            pattern, value, rule_type = self._patterns[index]
+            match = pattern.fullmatch(metric)
+            if match is None:
+                continue
+            if rule_type == "regex":
+                return match.expand(value)
+            groups = iter(match.groups())
+            return re.sub(r"\*", lambda _: next(groups, ""), value)
+        return None
+
+
+def load_rule_file(path: str) -> List[dict]:
+    """CSV with name,value[,type] columns, or JSON with a list of rules or a dict of
+    exact names"""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith(".json"):
+            rules = json.load(f)
+            if isinstance(rules, dict):
+                return [{"name": k, "value": v} for k, v in rules.items()]
+            return rules
+        rules = []
+        for row in csv.reader(f):
+            row = [column.strip() for column in row]
+            # Skips blank lines, comments and the header
+            if not row or not row[0] or row[0].startswith("#") or row[0] == "name":
+                continue
+            rules.append(dict(zip(("name", "value", "type"), row)))
+        return rules
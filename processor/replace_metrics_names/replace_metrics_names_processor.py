@@ -1,31 +1,36 @@
 import logging
-import copy
 from ..processor import Processor
+from .rename_rules import RenameRules
 
 
 class ReplaceMetricsNamesProcessor(Processor):
 
     def __init__(self, params, global_shared_state, log_level=logging.INFO):
         super().__init__(__name__, global_shared_state, log_level)
-        self._replace_map = params
+        try:
+            self._rules = RenameRules.from_params(params)
+        except OSError as e:
+            raise ValueError(f"Can't read rename rule file: {e}")
+        self._logger.info(f"Loaded {len(self._rules)} metric rename rules")
 
     def process(self, metrics_to_objects) -> list[()]:
-        dashboards_to_remove = []
-        for item in self._replace_map:
-            if metrics_to_objects.get(item["name"]):
-                for dashboard in metrics_to_objects[item["name"]]:
-                    dashboards_to_remove += self.replace_metric(
-                        item["name"], item["value"], metrics_to_objects[item["name"]]
-                    )
-
-                    self.add_to_report(
-                        dashboard,
-                        __name__,
-                        self.create_report_object(item["name"], item["value"]),
-                    )
+        for metric in list(metrics_to_objects):
+            new_metric = self._rules.rename(metric)
+            if new_metric is None or not metrics_to_objects[metric]:
+                continue
+            dashboards_to_remove = self.replace_metric(
+                metric, new_metric, metrics_to_objects[metric]
+            )
+            for dashboard in dashboards_to_remove:
+                self.add_to_report(
+                    dashboard,
+                    __name__,
+                    self.create_report_object(metric, new_metric),
+                )
             self.remove_updated_dashboards_from_metric_to_object(
-                dashboards_to_remove, metrics_to_objects[item["name"]]
+                dashboards_to_remove, metrics_to_objects[metric]
             )
+        self.apply_renames()
         return metrics_to_objects
 
     def create_report_object(self, old_metric, new_metric, *args) -> dict:
@@ -0,0 +1,64 @@
+import json
+import logging
+
+import pytest
+
+from .rename_rules import RenameRules
+from .replace_metrics_names_processor import ReplaceMetricsNamesProcessor
+
+
+def test_rename_rules_from_files(tmp_path):
+    csv_file = tmp_path / "renames.csv"
+    csv_file.write_text(
+        "name,value,type\n"
+        "# platform renames\n"
+        "mem_used,mem_used_bytes\n"
+        "node_*_seconds,node_*_seconds_total,glob\n"
+        "kafka_(\\w+)_lag,kafka_consumer_\\1_lag,regex\n"
+        "node_cpu_seconds,never_used,glob\n"
+    )
+    json_file = tmp_path / "renames.json"
+    json_file.write_text(
+        json.dumps({"mem_used": "ignored", "disk_io": "disk_io_total"})
+    )
+
+    rules = RenameRules.from_params(
+        {
+            "rules": [{"name": "up", "value": "target_up"}],
+            "rule_files": [str(csv_file), str(json_file)],
+        }
+    )
+
+    assert rules.rename("up") == "target_up"
+    assert rules.rename("mem_used") == "mem_used_bytes"
+    assert rules.rename("disk_io") == "disk_io_total"
+    assert rules.rename("node_cpu_seconds") == "node_cpu_seconds_total"
+    assert rules.rename("kafka_topic_lag") == "kafka_consumer_topic_lag"
+    assert rules.rename("mem_used_percent") is None
+
+
+def test_rename_rules_validation():
+    with pytest.raises(ValueError, match="type"):
+        RenameRules([{"name": "a", "value": "b", "type": "fuzzy"}])
+    with pytest.raises(ValueError, match="pattern"):
+        RenameRules([{"name": "a(", "value": "b", "type": "regex"}])
+
+
+def test_process_renames_each_metric_once():
+    targets = {"expr": "rate(http_requests[5m]) / http_requests_errors"}
+    metric_to_objects = {
+        "http_requests": {"Dashboard": [targets]},
+        "http_requests_errors": {"Dashboard": [targets]},
+    }
+    processor = ReplaceMetricsNamesProcessor(
+        [{"name": "http_*", "value": "nginx_http_*_total", "type": "glob"}],
+        {},
+        logging.INFO,
+    )
+
+    processor.process(metric_to_objects)
+
+    assert targets["expr"] == (
+        "rate(nginx_http_requests_total[5m]) / nginx_http_requests_errors_total"
+    )
+    assert metric_to_objects == {"http_requests": {}, "http_requests_errors": {}}
@@ -0,0 +1,32 @@
+import logging
+
+from .replace_metrics_names.replace_metrics_names_processor import (
+    ReplaceMetricsNamesProcessor,
+)
+
+
+def test_renames_whole_metric_names_once():
+    used = {"expr": "mem_used / (mem_used + mem_used_percent)"}
+    swapped = {"expr": "sum(cpu_a) - sum(cpu_b)"}
+    template = {"query": 'label_values(mem_used{host=~"$host"}, host)'}
+    metric_to_objects = {
+        "mem_used": {"Dashboard": [used], "Templating": [template]},
+        "cpu_a": {"Dashboard": [swapped]},
+        "cpu_b": {"Dashboard": [swapped]},
+        "mem_used_percent": {"Dashboard": [used]},
+    }
+    processor = ReplaceMetricsNamesProcessor(
+        [
+            {"name": "mem_used", "value": "mem_used_bytes"},
+            {"name": "cpu_a", "value": "cpu_b"},
+            {"name": "cpu_b", "value": "cpu_a"},
+        ],
+        {},
+        logging.INFO,
+    )
+
+    processor.process(metric_to_objects)
+
+    assert used["expr"] == "mem_used_bytes / (mem_used_bytes + mem_used_percent)"
+    assert swapped["expr"] == "sum(cpu_b) - sum(cpu_a)"
+    assert template["query"] == 'label_values(mem_used_bytes{host=~"$host"}, host)'
@@ -0,0 +1,87 @@
+import json
+import logging
+
+from benchmarks.fake_grafana import make_dashboard
+from common.error_manager import ErrorManager, ProcessingContext
+import main as cli
+
+RUN_CONFIG = {
+    "converter": {"influxql": {"enabled": True}},
+    "datasource": {"uid": "prometheus", "type": "prometheus"},
+}
+QUERIES = [
+    'SELECT mean("usage_idle") FROM "cpu" WHERE "host" =~ /^$host$/ AND $timeFilter GROUP BY time($__interval), "host"',
+    'SELECT max("used") FROM "mem" WHERE $timeFilter GROUP BY time(1m)',
+    'SELECT non_negative_derivative(mean("bytes_recv"), 1s) FROM "net" WHERE $timeFilter GROUP BY time($__interval)',
+    # Panel errors
+    "SELECT foo FROM",
+    'SELECT mean("usage_idle") FROM "cpu" WHERE $timeFilter GROUP BY time($__interval)',
+]
+TEMPLATE_QUERIES = [
+    'SHOW TAG VALUES FROM "cpu" WITH KEY = "host"',
+    # Fails the dashboard
+    "SHOW MEASUREMENTS",
+    'SHOW TAG VALUES FROM "mem" WITH KEY = "region"',
+]
+
+
+def dashboards() -> list:
+    result = []
+    for i in range(12):
+        dashboard = make_dashboard(f"uid-{i:06d}", 3)
+        for j, panel in enumerate(dashboard["dashboard"]["panels"]):
+            panel["targets"][0]["query"] = QUERIES[(i + j) % len(QUERIES)]
+        dashboard["dashboard"]["templating"]["list"].append(
+            {
+                "name": "host",
+                "type": "query",
+                "datasource": "influx",
+                "query": TEMPLATE_QUERIES[i % len(TEMPLATE_QUERIES)],
+            }
+        )
+        result.append(dashboard)
+    return result
+
+
+def convert(workers: int):
+    error_manager = ErrorManager(
+        logging.getLogger(__name__),
+        ProcessingContext(grafana_url="http://grafana", grafana_organization_id=1),
+    )
+    converter = cli.get_converter_from_config(RUN_CONFIG, error_manager, {})
+    converted, invalid = [], []
+    cli.convert_dashboards(
+        converter,
+        dashboards(),
+        converted,
+        invalid,
+        error_manager,
+        workers=workers,
+        run_config=RUN_CONFIG,
+    )
+    return converted, invalid, converter.metric_to_objects, error_manager.errors_csv()
+
+
+def test_worker_pool_matches_serial_conversion():
+    serial = convert(1)
+    pooled = convert(2)
+
+    converted, invalid, metric_to_objects, errors_csv = pooled
+    assert json.dumps(converted) == json.dumps(serial[0])
+    assert invalid == serial[1] and invalid
+    assert json.dumps(metric_to_objects) == json.dumps(serial[2])
+    assert errors_csv == serial[3] and errors_csv
+    # Processors rewrite the objects of metric_to_objects in place, they must be the
+    # targets and variables of the converted dashboards
+    objects = set()
+    for dashboard in converted:
+        for panel in dashboard["dashboard"]["panels"]:
+            objects.update(map(id, panel.get("targets", [])))
+        objects.update(map(id, dashboard["dashboard"]["templating"]["list"]))
+    assert all(
+        id(target) in objects
+        for dashboards_targets in metric_to_objects.values()
+        for dashboard, targets in dashboards_targets.items()
+        if dashboard not in invalid
+        for target in targets
+    )